@@ -14,6 +14,7 @@
     "website": "https://github.com/OCA/storage",
     "data": [
         "security/fs_file_gc.xml",
+        "security/fs_image_rendition.xml",
         "views/fs_storage.xml",
     ],
     "external_dependencies": {"python": ["python_slugify", "fsspec>=2025.3.0"]},
@@ -1,4 +1,5 @@
 from . import fs_file_gc
+from . import fs_image_rendition
 from . import fs_storage
 from . import ir_attachment
 from . import ir_binary
@@ -0,0 +1,275 @@
+# Copyright 2026 Royal Estate Team
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+import hashlib
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# the last access of a rendition is only written when older than this, to
+# avoid a write on each hit
+ACCESS_GRANULARITY = timedelta(hours=1)
+# once over its maximum size, the cache is evicted down to this share of it
+EVICTION_TARGET = 0.9
+# the counters are logged every this many lookups
+STATS_LOG_INTERVAL = 1000
+
+_stats = Counter()
+# bytes stored by this process per storage since the size of the cache was
+# last checked, see _evict_needed()
+_stored_since_check = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+        lookups = _stats["hits"] + _stats["misses"]
+        if name in ("hits", "misses") and lookups % STATS_LOG_INTERVAL == 0:
+            _logger.info(
+                "Image rendition cache: %d lookups, hit ratio %.1f%%, "
+                "%d stored, %d evicted, %d errors",
+                lookups,
+                100 * _stats["hits"] / lookups,
+                _stats["stores"],
+                _stats["evictions"],
+                _stats["errors"],
+            )
+
+
+class FsImageRendition(models.Model):
+    """Resized images served by ir.binary, stored into the filesystem storage
+    configured as image rendition cache.
+
+    A rendition is addressed by the checksum of the original and the
+    resizing parameters, so it never has to be invalidated: a new original
+    gets a new checksum. The least recently used renditions are removed once
+    the cache exceeds the maximum size configured on the storage.
+    """
+
+    _name = "fs.image.rendition"
+    _description = "Filesystem storage image rendition cache"
+    _log_access = False
+
+    key = fields.Char(required=True, index=True)
+    fs_storage_code = fields.Char("Storage Code", required=True)
+    path = fields.Char(required=True)
+    file_size = fields.Integer()
+    last_access = fields.Datetime(index=True)
+
+    # the conflict target of _store()
+    _key_uniq = models.UniqueIndex(
+        "(fs_storage_code, key)", "The rendition key must be unique per storage!"
+    )
+
+    @api.model
+    def _make_key(
+        self, checksum: str, width: int, height: int, crop: bool, quality: int
+    ) -> str:
+        """Return the key of the rendition of the original ``checksum``"""
+        return hashlib.sha1(
+            f"{checksum}-{width}x{height}-{bool(crop)}-{quality}".encode()
+        ).hexdigest()
+
+    @api.model
+    def _get_storage_code(self) -> str | None:
+        return self.env["fs.storage"].get_storage_code_for_image_renditions()
+
+    @api.model
+    def _lookup(self, key: str) -> bytes | None:
+        """Return the content of the rendition ``key`` if cached"""
+        code = self._get_storage_code()
+        if not code:
+            return None
+        self.env.cr.execute(
+            """
+            SELECT id, path, last_access
+            FROM fs_image_rendition
+            WHERE fs_storage_code = %s AND key = %s
+            """,
+            (code, key),
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            _count("misses")
+            return None
+        rendition_id, path, last_access = row
+        fs = self.env["fs.storage"].get_fs_by_code(code)
+        try:
+            with fs.open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            _logger.info("Error reading rendition %s on storage %s", path, code)
+            _count("errors")
+            _count("misses")
+            # requests are served with a readonly cursor
+            with self.env["fs.file.gc"]._in_new_cursor() as cr:
+                cr.execute(
+                    "DELETE FROM fs_image_rendition WHERE id = %s", (rendition_id,)
+                )
+            return None
+        _count("hits")
+        now = fields.Datetime.now()
+        if not last_access or last_access < now - ACCESS_GRANULARITY:
+            with self.env["fs.file.gc"]._in_new_cursor() as cr:
+                cr.execute(
+                    "UPDATE fs_image_rendition SET last_access = %s WHERE id = %s",
+                    (now, rendition_id),
+                )
+        return data
+
+    @api.model
+    def _store(self, key: str, data: bytes) -> None:
+        """Store ``data`` as the rendition ``key``"""
+        code = self._get_storage_code()
+        if not code:
+            return
+        fs = self.env["fs.storage"].get_fs_by_code(code)
+        path = f"image_renditions/{key[:2]}/{key}"
+        try:
+            if not fs.exists(f"image_renditions/{key[:2]}"):
+                fs.makedirs(f"image_renditions/{key[:2]}")
+            with fs.open(path, "wb") as f:
+                f.write(data)
+        except OSError:
+            _logger.info(
+                "Error writing rendition %s on storage %s", path, code, exc_info=True
+            )
+            _count("errors")
+            return
+        _count("stores")
+        with self.env["fs.file.gc"]._in_new_cursor() as cr:
+            cr.execute(
+                """
+                INSERT INTO
+                    fs_image_rendition (
+                        key,
+                        fs_storage_code,
+                        path,
+                        file_size,
+                        last_access
+                    )
+                    VALUES (%s, %s, %s, %s, now() at time zone 'UTC')
+                ON CONFLICT (fs_storage_code, key) DO UPDATE
+                    SET file_size = EXCLUDED.file_size,
+                        last_access = EXCLUDED.last_access
+                """,
+                (key, code, path, len(data)),
+            )
+        if self._evict_needed(code, len(data)):
+            self._evict(code)
+
+    @api.model
+    def _evict_needed(self, code: str, size: int) -> bool:
+        """Return whether the size of the cache of the storage ``code`` must
+        be checked after storing ``size`` bytes into it.
+
+        The cache is only checked once this process stored the share of its
+        maximum size left free by an eviction, instead of summing the size of
+        all the renditions on each store.
+        """
+        max_size = self.env["fs.storage"]._get_image_rendition_cache_max_size(code)
+        if not max_size:
+            return False
+        with _stats_lock:
+            _stored_since_check[code] += size
+            if _stored_since_check[code] < max_size * (1 - EVICTION_TARGET):
+                return False
+            del _stored_since_check[code]
+        return True
+
+    @api.model
+    def _evict(self, code: str) -> None:
+        """Remove the least recently used renditions of the storage ``code``
+        once their total size exceeds the maximum size of the cache.
+
+        Their files are marked for garbage collection in the same
+        transaction, and removed by the autovacuum of ``fs.file.gc``.
+        """
+        max_size = self.env["fs.storage"]._get_image_rendition_cache_max_size(code)
+        if not max_size:
+            return
+        with self.env["fs.file.gc"]._in_new_cursor() as cr:
+            cr.execute(
+                "SELECT COALESCE(sum(file_size), 0) FROM fs_image_rendition "
+                "WHERE fs_storage_code = %s",
+                (code,),
+            )
+            if cr.fetchone()[0] <= max_size:
+                return
+            # only one worker evicts at a time, the others go on serving
+            cr.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (self._table,))
+            if not cr.fetchone()[0]:
+                return
+            cr.execute(
+                """
+                DELETE FROM fs_image_rendition
+                WHERE id IN (
+                    SELECT id
+                    FROM (
+                        SELECT
+                            id,
+                            sum(file_size) OVER (
+                                ORDER BY last_access DESC NULLS LAST, id DESC
+                            ) AS kept_size
+                        FROM fs_image_rendition
+                        WHERE fs_storage_code = %s
+                    ) renditions
+                    WHERE kept_size > %s
+                )
+                RETURNING path
+                """,
+                (code, int(max_size * EVICTION_TARGET)),
+            )
+            paths = [path for (path,) in cr.fetchall()]
+            # a rendition stored again before the garbage collection loses
+            # its file, it is then removed on its next lookup
+            cr.execute(
+                """
+                INSERT INTO
+                    fs_file_gc (
+                        store_fname,
+                        fs_storage_code,
+                        create_date,
+                        write_date,
+                        create_uid,
+                        write_uid
+                    )
+                    SELECT
+                        %s || '://' || path,
+                        %s,
+                        now() at time zone 'UTC',
+                        now() at time zone 'UTC',
+                        %s,
+                        %s
+                    FROM unnest(%s::varchar[]) AS path
+                ON CONFLICT DO NOTHING
+                """,
+                (code, code, self.env.uid, self.env.uid, paths),
+            )
+        with _stats_lock:
+            _stats["evictions"] += len(paths)
+        _logger.info("Image rendition cache: %d renditions evicted", len(paths))
+
+    @api.model
+    def get_stats(self) -> dict:
+        """Return the counters of the cache in this process, and the size of
+        the cache in the configured storage"""
+        with _stats_lock:
+            stats = dict(_stats)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_ratio"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        self.env.cr.execute(
+            """
+            SELECT count(*), COALESCE(sum(file_size), 0)
+            FROM fs_image_rendition
+            WHERE fs_storage_code = %s
+            """,
+            (self._get_storage_code(),),
+        )
+        stats["count"], stats["size"] = self.env.cr.fetchone()
+        return stats
@@ -78,6 +78,18 @@ class FsStorage(models.Model):
         "files that are referenced by other systems (like a website) where "
         "the filename is important for SEO.",
     )
+    use_for_image_renditions = fields.Boolean(
+        help="If checked, the images resized to serve them (e.g. thumbnails "
+        "requested with a width and a height) are cached into this storage. "
+        "This way, an image is only resized once for a given size instead of "
+        "on each request.",
+    )
+    image_rendition_cache_max_size = fields.Integer(
+        string="Image Rendition Cache Max Size (MB)",
+        default=1024,
+        help="Beyond this size, the least recently used renditions are removed "
+        "from the cache. 0 means no limit.",
+    )
 
     @api.constrains("use_as_default_for_attachments")
     def _check_use_as_default_for_attachments(self):
@@ -89,6 +101,14 @@ class FsStorage(models.Model):
                 _("Only one storage can be used as default for attachments")
             )
 
+    @api.constrains("use_for_image_renditions")
+    def _check_use_for_image_renditions(self):
+        storages = self.search([]).filtered("use_for_image_renditions")
+        if len(storages) > 1:
+            raise ValidationError(
+                _("Only one storage can be used to cache image renditions")
+            )
+
     @property
     def _server_env_fields(self):
         env_fields = super()._server_env_fields
@@ -102,6 +122,8 @@ class FsStorage(models.Model):
                 "use_as_default_for_attachments": {},
                 "force_db_for_default_attachment_rules": {},
                 "use_filename_obfuscation": {},
+                "use_for_image_renditions": {},
+                "image_rendition_cache_max_size": {},
             }
         )
         return env_fields
@@ -226,6 +248,24 @@ class FsStorage(models.Model):
             return const_eval(storage.force_db_for_default_attachment_rules)
         return {}
 
+    @api.model
+    @tools.ormcache()
+    def get_storage_code_for_image_renditions(self):
+        storages = (
+            self.sudo()
+            .search([])
+            .filtered_domain([("use_for_image_renditions", "=", True)])
+        )
+        if storages:
+            return storages[0].code
+        return None
+
+    @api.model
+    @tools.ormcache("code")
+    def _get_image_rendition_cache_max_size(self, code):
+        """Return the maximum size in bytes of the image rendition cache"""
+        return self.sudo().get_by_code(code).image_rendition_cache_max_size * 1024**2
+
     @api.model
     @tools.ormcache("code")
     def _must_optimize_directory_path(self, code):
@@ -128,6 +128,17 @@ class IrBinary(models.AbstractModel):
             last_modified=stream.last_modified,
         )
         if modified and (initial_width or initial_height or initial_crop):
+            rendition_cache = self.env["fs.image.rendition"].sudo()
+            key = stream.etag and rendition_cache._make_key(
+                stream.etag, initial_width, initial_height, initial_crop, quality
+            )
+            data = key and rendition_cache._lookup(key)
+            if data:
+                stream.type = "data"
+                stream.path = None
+                stream.data = data
+                stream.size = len(data)
+                return stream
             if stream.type == "path":
                 with open(stream.path, "rb") as file:
                     stream.type = "data"
@@ -143,5 +154,7 @@ class IrBinary(models.AbstractModel):
                 quality=quality,
             )
             stream.size = len(stream.data)
+            if key:
+                rendition_cache._store(key, stream.data)
 
         return stream
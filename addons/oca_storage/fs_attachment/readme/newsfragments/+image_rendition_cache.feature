@@ -0,0 +1,4 @@
+Cache the images resized by `/web/image` into a configurable filesystem
+storage. Renditions are keyed by the checksum of the original and the
+resizing parameters, evicted in least recently used order beyond a maximum
+size, and the hit ratio of the cache is logged.
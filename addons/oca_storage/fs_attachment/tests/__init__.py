@@ -2,4 +2,5 @@ from . import test_fs_attachment
 from . import test_fs_attachment_file_like_adapter
 from . import test_fs_attachment_internal_url
 from . import test_fs_storage
+from . import test_image_rendition
 from . import test_stream
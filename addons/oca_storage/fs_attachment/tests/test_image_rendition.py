@@ -0,0 +1,90 @@
+# Copyright 2026 Royal Estate Team
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import os
+
+from .common import TestFSAttachmentCommon
+
+
+class TestImageRendition(TestFSAttachmentCommon):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.rendition_model = cls.env["fs.image.rendition"]
+
+    def setUp(self):
+        super().setUp()
+        self.temp_backend.write(
+            {"use_for_image_renditions": True, "image_rendition_cache_max_size": 1}
+        )
+
+    def _key(self, checksum):
+        return self.rendition_model._make_key(checksum, 64, 64, False, 0)
+
+    def test_make_key(self):
+        self.assertEqual(self._key("abc"), self._key("abc"))
+        self.assertNotEqual(self._key("abc"), self._key("abd"))
+        self.assertNotEqual(
+            self._key("abc"), self.rendition_model._make_key("abc", 64, 64, True, 0)
+        )
+
+    def test_store_and_lookup(self):
+        key = self._key("abc")
+        stats = self.rendition_model.get_stats()
+        self.assertIsNone(self.rendition_model._lookup(key))
+        self.rendition_model._store(key, b"rendition")
+        self.assertEqual(self.rendition_model._lookup(key), b"rendition")
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.temp_dir, "image_renditions", key[:2], key)
+            )
+        )
+        new_stats = self.rendition_model.get_stats()
+        self.assertEqual(new_stats["hits"], stats.get("hits", 0) + 1)
+        self.assertEqual(new_stats["misses"], stats.get("misses", 0) + 1)
+        self.assertEqual(new_stats["count"], 1)
+        self.assertEqual(new_stats["size"], len(b"rendition"))
+
+    def test_store_twice(self):
+        key = self._key("abc")
+        self.rendition_model._store(key, b"rendition")
+        self.rendition_model._store(key, b"new rendition")
+        self.assertEqual(self.rendition_model._lookup(key), b"new rendition")
+        self.assertEqual(self.rendition_model.get_stats()["count"], 1)
+
+    def test_no_storage(self):
+        self.temp_backend.use_for_image_renditions = False
+        key = self._key("abc")
+        self.rendition_model._store(key, b"rendition")
+        self.assertIsNone(self.rendition_model._lookup(key))
+
+    def test_missing_file(self):
+        key = self._key("abc")
+        self.rendition_model._store(key, b"rendition")
+        os.remove(os.path.join(self.temp_dir, "image_renditions", key[:2], key))
+        self.assertIsNone(self.rendition_model._lookup(key))
+        self.assertFalse(self.rendition_model.search([("key", "=", key)]))
+
+    def test_evict_least_recently_used(self):
+        keys = [self._key(checksum) for checksum in ("a", "b", "c")]
+        for key in keys:
+            self.rendition_model._store(key, b"x" * 400_000)
+        # 1.2MB stored for 1MB allowed: evicted down to 0.9MB
+        self.assertIsNone(self.rendition_model._lookup(keys[0]))
+        self.assertTrue(self.rendition_model._lookup(keys[1]))
+        self.assertTrue(self.rendition_model._lookup(keys[2]))
+        # the file is only removed by the garbage collection
+        path = os.path.join(self.temp_dir, "image_renditions", keys[0][:2], keys[0])
+        self.assertTrue(os.path.exists(path))
+        self.env["fs.file.gc"]._gc_files_unsafe()
+        self.assertFalse(os.path.exists(path))
+
+    def test_evict_needed(self):
+        code = self.temp_backend.code
+        # resets the bytes stored since the last check
+        self.assertTrue(self.rendition_model._evict_needed(code, 1024**2))
+        # checked once a tenth of the 1MB allowed is stored
+        self.assertFalse(self.rendition_model._evict_needed(code, 60_000))
+        self.assertTrue(self.rendition_model._evict_needed(code, 60_000))
+        self.assertFalse(self.rendition_model._evict_needed(code, 60_000))
+        self.temp_backend.image_rendition_cache_max_size = 0
+        self.assertFalse(self.rendition_model._evict_needed(code, 1024**2))
@@ -152,6 +152,25 @@ class TestStream(HttpCase):
         )
         self.assertEqual(Image.open(io.BytesIO(res.content)).size, (64, 64))
 
+    def test_image_url_with_size_cached(self):
+        self.temp_backend.use_for_image_renditions = True
+        self.authenticate("admin", "admin")
+        url = f"/web/image/{self.attachment_image.id}?width=32&height=32"
+        rendition_model = self.env["fs.image.rendition"]
+        res = self.assertDownload(
+            url, headers={}, assert_status_code=200, assert_headers={}
+        )
+        self.assertEqual(Image.open(io.BytesIO(res.content)).size, (32, 32))
+        hits = rendition_model.get_stats().get("hits", 0)
+        self.assertDownload(
+            url,
+            headers={},
+            assert_status_code=200,
+            assert_headers={"Content-Type": "image/png"},
+            assert_content=res.content,
+        )
+        self.assertEqual(rendition_model.get_stats()["hits"], hits + 1)
+
     def test_response_csp_header(self):
         self.authenticate("admin", "admin")
         url = f"/web/content/{self.attachment_binary.id}"
@@ -1,6 +1,6 @@
 {
     "name": "Royal Estate",
-    "version": "19.0.1.2.0",
+    "version": "19.0.1.3.0",
     "category": "Real Estate",
     "summary": "Manage real estate properties",
     "description": """
@@ -16,10 +16,12 @@
     "website": "",
     "license": "LGPL-3",
     "depends": ["base", "mail", "crm"],
+    "external_dependencies": {"python": ["numpy"]},
     "data": [
         "security/estate_security.xml",
         "security/ir.model.access.csv",
         "data/ir_config_parameter.xml",
+        "data/ir_cron_data.xml",
         "data/estate_city_data.xml",
         "data/estate_climate_equipment_data.xml",
         "data/estate_appliance_data.xml",
@@ -31,6 +33,10 @@
         "views/estate_appliance_views.xml",
         "views/estate_property_views.xml",
         "views/crm_lead_views.xml",
+        "views/krisha_import_job_views.xml",
+        "views/estate_geocode_cache_views.xml",
+        "views/estate_property_duplicate_views.xml",
+        "views/estate_market_stat_views.xml",
         "views/estate_menus.xml",
         "wizards/krisha_parser_views.xml",
     ],
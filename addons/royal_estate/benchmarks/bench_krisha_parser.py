@@ -0,0 +1,79 @@
+"""Parsing micro-benchmark over the recorded Krisha.kz fixture pages.
+
+Compares the jsdata scan used by ``KrishaParser`` with the former
+BeautifulSoup + regex extraction. Needs no Odoo server::
+
+    python addons/royal_estate/benchmarks/bench_krisha_parser.py [-n 200]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ADDON_DIR, "tests", "fixtures")
+FIXTURES = (
+    "listing_page_1.html",
+    "listing_page_2.html",
+    "listing_page_3.html",
+    "advert_detail.html",
+)
+
+
+def load_services():
+    # the addon package itself imports Odoo, load the plain services only
+    spec = importlib.util.spec_from_file_location(
+        "royal_estate_services",
+        os.path.join(ADDON_DIR, "services", "__init__.py"),
+        submodule_search_locations=[os.path.join(ADDON_DIR, "services")],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return importlib.import_module(f"{spec.name}.krisha_parser")
+
+
+def soup_extract(html):
+    soup = BeautifulSoup(html, "html.parser")
+    script_tag = soup.find("script", {"id": "jsdata"})
+    match = re.search(r"window\.(?:__DATA__|data)\s*=\s*(\{.+\})", script_tag.string)
+    return json.loads(match.group(1).rstrip(";"))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("-n", "--number", type=int, default=200, help="runs per page")
+    args = arg_parser.parse_args()
+
+    krisha_parser = load_services()
+    parser = krisha_parser.KrishaParser()
+    pages = {}
+    for name in FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            pages[name] = f.read()
+
+    print(f"{'page':<24}{'soup, ms':>12}{'jsdata, ms':>12}{'speedup':>10}")
+    for name, html in pages.items():
+        assert krisha_parser.extract_jsdata(html) == soup_extract(html), name
+        soup_time = timeit.timeit(lambda html=html: soup_extract(html), number=args.number)
+        fast_time = timeit.timeit(
+            lambda html=html: krisha_parser.extract_jsdata(html), number=args.number
+        )
+        print(
+            f"{name:<24}{1000 * soup_time / args.number:>12.3f}"
+            f"{1000 * fast_time / args.number:>12.3f}{soup_time / fast_time:>9.1f}x"
+        )
+
+    listing = pages["listing_page_1.html"]
+    total = timeit.timeit(lambda: parser.parse_listing_page(listing), number=args.number)
+    print(f"parse_listing_page: {1000 * total / args.number:.3f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Load benchmark of royal_estate on a database filled by generate_dataset.py.
+
+Times the server side of the main screens: list and kanban loads (with
+the pager count), searches, read_group of the dashboards, photo
+thumbnails and a Krisha import of the recorded fixture pages. Every
+measure starts with an empty ORM cache, and the transaction is rolled
+back at the end::
+
+    python addons/royal_estate/benchmarks/bench_load.py -c odoo.conf -d royal [-r 20] [-k list]
+
+Compare the output of two runs (e.g. before and after a deployment) to
+spot regressions.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from odoo_env import add_database_arguments, odoo_env
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ADDON_DIR, "tests", "fixtures")
+
+LIST_SPEC = {
+    "name": {},
+    "property_type": {},
+    "deal_type": {},
+    "city_id": {"fields": {"display_name": {}}},
+    "district_id": {"fields": {"display_name": {}}},
+    "rooms": {},
+    "area_total": {},
+    "floor": {},
+    "price": {},
+    "currency_id": {"fields": {}},
+    "state": {},
+    "user_id": {"fields": {"display_name": {}}},
+}
+KANBAN_SPEC = {
+    "name": {},
+    "district_id": {"fields": {"display_name": {}}},
+    "rooms": {},
+    "area_total": {},
+    "floor": {},
+    "price": {},
+    "currency_id": {"fields": {}},
+    "state": {},
+}
+DEFAULT_DOMAIN = [("state", "=", "active")]
+
+
+class Benchmarks:
+    def __init__(self, env, rng: random.Random):
+        self.env = env
+        self.rng = rng
+        self.Property = env["estate.property"]
+        sample = self.Property.search([("district_id", "!=", False)], limit=1000)
+        if not sample:
+            raise SystemExit("No property with a district, run generate_dataset.py first")
+        self.sample = sample
+
+    def _any(self):
+        return self.rng.choice(self.sample)
+
+    def bench_list(self):
+        self.Property.web_search_read(DEFAULT_DOMAIN, LIST_SPEC, limit=80, count_limit=10001)
+
+    def bench_list_city_filter(self):
+        prop = self._any()
+        self.Property.web_search_read(
+            [
+                ("city_id", "=", prop.city_id.id),
+                ("deal_type", "=", "sale"),
+                ("property_type", "=", "apartment"),
+            ],
+            LIST_SPEC,
+            limit=80,
+            count_limit=10001,
+        )
+
+    def bench_kanban(self):
+        self.Property.web_search_read(DEFAULT_DOMAIN, KANBAN_SPEC, limit=40, count_limit=10001)
+
+    def bench_search_name(self):
+        self.Property.search([("name", "ilike", f"#{self.rng.randint(1, 9999)}")], limit=80)
+
+    def bench_search_anywhere(self):
+        words = self.rng.choice(["абая", "сатпаева 12", "толе би", "квартира достык"])
+        self.Property.search([("search_anywhere", "ilike", words)], limit=80)
+
+    def bench_search_price_rooms(self):
+        prop = self._any()
+        self.Property.search([
+            ("district_id", "=", prop.district_id.id),
+            ("rooms", "=", prop.rooms),
+            ("price", ">=", prop.price * 0.8),
+            ("price", "<=", prop.price * 1.2),
+        ], limit=80)
+
+    def bench_search_nearby(self):
+        prop = self._any()
+        self.Property.search_nearby(prop.latitude, prop.longitude, 1500, limit=50)
+
+    def bench_comps(self):
+        # the index is built by the first run, then reused by the process
+        self._any().get_comps()
+
+    def bench_read_group_district(self):
+        self.Property._read_group(
+            [("active", "=", True)],
+            ["district_id", "deal_type"],
+            ["__count", "price:avg", "area_total:avg"],
+        )
+
+    def bench_read_group_market_stat(self):
+        # the same dashboard, read from the materialized statistics
+        self.env["estate.market.stat"]._read_group(
+            [("district_id", "!=", False)],
+            ["district_id", "deal_type"],
+            ["listing_count:sum", "price_per_sqm_median:avg"],
+        )
+
+    def bench_read_group_state(self):
+        self.Property._read_group([], ["state"], ["__count"])
+
+    def bench_image_thumbnails(self):
+        images = self.env["estate.property.image"].search(
+            [("property_id", "=", self._any().id)]
+        )
+        for image in images:
+            stream = self.env["ir.binary"]._get_image_stream_from(
+                image, "image", width=150, height=150, crop=True
+            )
+            stream.read()
+
+    def bench_image_renditions(self):
+        # the same gallery, served from the stored thumbnails
+        images = self.env["estate.property.image"].search(
+            [("property_id", "=", self._any().id)]
+        )
+        for image in images:
+            stream = self.env["ir.binary"]._get_image_stream_from(image, "image_thumb_webp")
+            stream.read()
+
+    def bench_import(self):
+        # the addons path is only known once odoo_env() has read the configuration
+        from odoo.addons.royal_estate.services.krisha_importer import ImportedListing
+        from odoo.addons.royal_estate.services.krisha_parser import KrishaParser
+
+        parser = KrishaParser()
+        items = []
+        for page in ("listing_page_1.html", "listing_page_2.html", "listing_page_3.html"):
+            with open(os.path.join(FIXTURES_DIR, page), encoding="utf-8") as f:
+                items.extend(parser.parse_listing_page(f.read()))
+        existing = self.Property._get_existing_krisha_ids([item.krisha_id for item in items])
+        items = [item for item in items if item.krisha_id not in existing]
+        job = self.env["krisha.import.job"].create({"name": "benchmark"})
+        Line = self.env["krisha.import.job.line"]
+        lines = Line.create([{**Line._prepare_listing_vals(item), "job_id": job.id} for item in items])
+        listings = [ImportedListing(key=line.id, details=item) for line, item in zip(lines, items)]
+        lines._create_properties(listings, lines._get_city_mapping())
+        self.env.flush_all()
+
+
+def measure(env, func, repeat: int) -> list[float]:
+    timings = []
+    for _i in range(repeat):
+        env.invalidate_all()
+        env.cr.execute("SAVEPOINT bench")
+        start = time.perf_counter()
+        func()
+        env.flush_all()
+        timings.append(time.perf_counter() - start)
+        env.cr.execute("ROLLBACK TO SAVEPOINT bench")
+    env.invalidate_all()
+    return timings
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(arg_parser)
+    arg_parser.add_argument("-r", "--repeat", type=int, default=10, help="runs per benchmark")
+    arg_parser.add_argument("-k", "--keyword", help="only the benchmarks whose name contains it")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    args = arg_parser.parse_args()
+
+    with odoo_env(args) as env:
+        env.cr.execute("SELECT count(*) FROM estate_property")
+        print(f"{env.cr.fetchone()[0]} properties\n")
+        benchmarks = Benchmarks(env, random.Random(args.seed))
+        print(f"{'benchmark':<28}{'median, ms':>12}{'p95, ms':>12}{'min, ms':>12}")
+        for name in sorted(dir(benchmarks)):
+            if not name.startswith("bench_") or (args.keyword and args.keyword not in name):
+                continue
+            timings = sorted(measure(env, getattr(benchmarks, name), args.repeat))
+            p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+            print(
+                f"{name[6:]:<28}{1000 * statistics.median(timings):>12.1f}"
+                f"{1000 * p95:>12.1f}{1000 * timings[0]:>12.1f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Query plans of the estate.property list views, without and with the list indexes.
+
+Generates ``-n`` properties in a temporary copy of ``estate_property``
+(cities, districts and users are taken from the database), runs the
+queries of the usual list view filters, then creates the
+``estate_property_*_list_index`` indexes of the database on the copy and
+runs them again. Nothing is written to the database: the transaction is
+rolled back. Needs a database where royal_estate is installed::
+
+    python addons/royal_estate/benchmarks/bench_property_indexes.py "dbname=royal" [-n 200000] [-v]
+"""
+
+import argparse
+import re
+import time
+
+import psycopg2
+
+TABLE = "bench_estate_property"
+
+# filters of the search view, as the list view queries them (80 records
+# per page, in the _order of the model)
+QUERIES = {
+    "default (В работе)": "active AND state = 'active'",
+    "city + sale + apartments": (
+        "active AND city_id = %(city)s AND deal_type = 'sale' AND property_type = 'apartment'"
+    ),
+    "district + sale": "active AND district_id = %(district)s AND deal_type = 'sale'",
+    "my properties": "active AND user_id = %(user)s",
+    "city + sale + 2 rooms + price range": (
+        "active AND city_id = %(city)s AND deal_type = 'sale' AND rooms = 2"
+        " AND price BETWEEN 20000000 AND 40000000"
+    ),
+    "all": "active",
+}
+
+
+def generate(cr, count):
+    cr.execute(f"CREATE TEMP TABLE {TABLE} (LIKE estate_property INCLUDING DEFAULTS)")
+    cr.execute("SELECT array_agg(id) FROM estate_city")
+    (city_ids,) = cr.fetchone()
+    cr.execute("SELECT array_agg(id) FROM res_users WHERE share IS NOT TRUE")
+    (user_ids,) = cr.fetchone()
+    # cities are skewed towards the first ones (Almaty, Astana...), the
+    # district is one of the city's when it has any
+    cr.execute(
+        f"""
+        INSERT INTO {TABLE} (
+            id, name, active, state, deal_type, property_type, city_id, district_id,
+            user_id, rooms, area_total, price, create_date, write_date
+        )
+        SELECT s.id, 'Объект ' || s.id, random() > 0.05,
+               (ARRAY['new', 'active', 'active', 'active', 'deposit', 'deal',
+                      'canceled', 'archived'])[1 + floor(random() * 8)::int],
+               (ARRAY['sale', 'sale', 'sale', 'rent_long', 'rent_daily'])[1 + floor(random() * 5)::int],
+               (ARRAY['apartment', 'apartment', 'apartment', 'apartment', 'house',
+                      'townhouse', 'commercial', 'land'])[1 + floor(random() * 8)::int],
+               s.city_id,
+               d.id,
+               %(users)s[1 + floor(random() * cardinality(%(users)s))::int],
+               1 + floor(random() * 5)::int,
+               30 + random() * 120,
+               round(10000000 + random() * random() * 140000000),
+               now() - random() * interval '3 years',
+               now()
+          FROM (
+              SELECT id, %(cities)s[1 + floor(pow(random(), 3) * cardinality(%(cities)s))::int] AS city_id
+                FROM generate_series(1, %(count)s) AS id
+          ) s
+          LEFT JOIN LATERAL (
+              SELECT d.id FROM estate_district d
+               WHERE d.city_id = s.city_id
+               ORDER BY random()
+               LIMIT 1
+          ) d ON TRUE
+        """,
+        {"count": count, "cities": city_ids, "users": user_ids},
+    )
+    cr.execute(f"ANALYZE {TABLE}")
+
+
+def query_params(cr):
+    cr.execute(
+        f"""
+        SELECT city_id, district_id, user_id FROM {TABLE}
+         WHERE active AND district_id IS NOT NULL
+         GROUP BY city_id, district_id, user_id
+         ORDER BY count(*) DESC LIMIT 1
+        """
+    )
+    row = cr.fetchone() or (None, None, None)
+    return {"city": row[0], "district": row[1], "user": row[2]}
+
+
+def explain(cr, where, params):
+    cr.execute(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) "
+        f"SELECT id FROM {TABLE} WHERE {where} ORDER BY create_date DESC LIMIT 80",
+        params,
+    )
+    plan = [row[0] for row in cr.fetchall()]
+    execution = next(
+        (float(m.group(1)) for line in plan if (m := re.search(r"Execution Time: ([\d.]+)", line))),
+        0.0,
+    )
+    return plan, execution
+
+
+def create_list_indexes(cr):
+    cr.execute(
+        """
+        SELECT indexname, indexdef FROM pg_indexes
+         WHERE tablename = 'estate_property' AND indexname LIKE 'estate\\_property\\_%\\_list\\_index'
+        """
+    )
+    indexes = cr.fetchall()
+    if not indexes:
+        raise SystemExit("No estate_property_*_list_index in the database, update royal_estate first")
+    for name, definition in indexes:
+        definition = re.sub(r"ON (\S+\.)?estate_property ", f"ON {TABLE} ", definition)
+        cr.execute(definition.replace(name, f"bench_{name}", 1))
+    cr.execute(f"ANALYZE {TABLE}")
+    return [name for name, _definition in indexes]
+
+
+def run(cr, params, verbose):
+    results = {}
+    for label, where in QUERIES.items():
+        plan, execution = explain(cr, where, params)
+        results[label] = execution
+        if verbose:
+            print(f"--- {label}")
+            print("\n".join(plan))
+        else:
+            print(f"{label:<40}{execution:>10.2f} ms  {plan[0].split('  (')[0].strip()}")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("dsn", help='libpq connection string, e.g. "dbname=royal"')
+    arg_parser.add_argument("-n", "--number", type=int, default=200000, help="generated properties")
+    arg_parser.add_argument("-v", "--verbose", action="store_true", help="print the full plans")
+    args = arg_parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn.cursor() as cr:
+            start = time.perf_counter()
+            generate(cr, args.number)
+            print(f"{args.number} properties generated in {time.perf_counter() - start:.1f} s")
+            params = query_params(cr)
+
+            print("\n== without list indexes")
+            before = run(cr, params, args.verbose)
+            names = create_list_indexes(cr)
+            print(f"\n== with {', '.join(names)}")
+            after = run(cr, params, args.verbose)
+
+            print(f"\n{'query':<40}{'before, ms':>12}{'after, ms':>12}{'speedup':>10}")
+            for label in QUERIES:
+                speedup = before[label] / after[label] if after[label] else 0
+                print(f"{label:<40}{before[label]:>12.2f}{after[label]:>12.2f}{speedup:>9.1f}x")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Generate a production-sized synthetic dataset for royal_estate.
+
+Creates districts and streets for the cities of the database, then ``-n``
+properties with realistic distributions (type, rooms, area, district
+price levels, coordinates around the district), their photos and the CRM
+opportunities of some of them. Everything is attached to the
+"Синтетические данные" source, so that ``--drop`` removes it again::
+
+    python addons/royal_estate/benchmarks/generate_dataset.py -c odoo.conf -d royal -n 100000
+    python addons/royal_estate/benchmarks/generate_dataset.py -c odoo.conf -d royal --drop
+"""
+
+import argparse
+import base64
+import io
+import math
+import random
+import time
+
+from odoo.tools import SQL, split_every
+from PIL import Image, ImageDraw
+
+from odoo_env import add_database_arguments, odoo_env
+
+SOURCE_CODE = "synthetic"
+
+# city code: (latitude, longitude, price per m² in KZT, districts)
+CITIES = {
+    "almaty": (43.2380, 76.9450, 650000, [
+        "Алмалинский район", "Ауэзовский район", "Бостандыкский район", "Жетысуский район",
+        "Медеуский район", "Наурызбайский район", "Алатауский район", "Турксибский район",
+    ]),
+    "astana": (51.1282, 71.4304, 550000, [
+        "Алматинский район", "Байконурский район", "Есильский район",
+        "Сарыаркинский район", "район Нура",
+    ]),
+    "almaty_oblast": (43.3500, 77.1500, 300000, [
+        "Илийский район", "Карасайский район", "Талгарский район", "Енбекшиказахский район",
+    ]),
+}
+CITY_WEIGHTS = {"almaty": 0.55, "astana": 0.35, "almaty_oblast": 0.10}
+
+STREETS = [
+    "Абая", "Аль-Фараби", "Толе би", "Сатпаева", "Жандосова", "Розыбакиева", "Достык",
+    "Фурманова", "Кабанбай батыра", "Богенбай батыра", "Гагарина", "Тимирязева",
+    "Манаса", "Байтурсынова", "Ауэзова", "Муканова", "Желтоксан", "Наурызбай батыра",
+    "Шевченко", "Райымбека", "Момышулы", "Туран", "Кунаева", "Республики",
+]
+
+PROPERTY_TYPES = {"apartment": 70, "house": 12, "townhouse": 4, "commercial": 8, "land": 6}
+DEAL_TYPES = {"sale": 70, "rent_long": 25, "rent_daily": 5}
+STATES = {"new": 15, "active": 50, "deposit": 5, "deal": 10, "canceled": 10, "archived": 10}
+ROOMS = {1: 25, 2: 35, 3: 25, 4: 10, 5: 5}
+BUILDING_TYPES = {"panel": 35, "brick": 25, "monolith": 35, "metal_frame": 3, "wood": 2}
+CONDITIONS = {"no_repair": 15, "cosmetic": 35, "euro": 40, "designer": 10}
+FLOORS_TOTAL = {5: 30, 9: 25, 12: 15, 16: 15, 20: 10, 25: 5}
+# monthly and daily rent, as a share of the sale price
+RENT_RATIO = {"sale": 1, "rent_long": 1 / 220, "rent_daily": 1 / 5000}
+
+
+def pick(rng: random.Random, weights: dict):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def generate_photos(rng: random.Random, count: int, size=(1280, 960)) -> list[str]:
+    """Distinct JPEG photos (base64), reused across properties: the
+    filestore keeps one copy of each."""
+    photos = []
+    for _i in range(count):
+        image = Image.new("RGB", size, tuple(rng.randrange(256) for _c in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _j in range(12):
+            x, y = rng.randrange(size[0]), rng.randrange(size[1])
+            draw.rectangle(
+                (x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 300)),
+                fill=tuple(rng.randrange(256) for _c in range(3)),
+            )
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85)
+        photos.append(base64.b64encode(buffer.getvalue()).decode())
+    return photos
+
+
+def ensure_geography(env, rng: random.Random) -> list[dict]:
+    """Districts and streets of the known cities, created when missing.
+    Return one dict per district with its center and price level."""
+    districts = []
+    for code, (lat, lon, price_m2, names) in CITIES.items():
+        city = env["estate.city"].search([("code", "=", code)], limit=1)
+        if not city:
+            continue
+        for i, name in enumerate(names):
+            district = env["estate.district"].search(
+                [("city_id", "=", city.id), ("name", "=", name)], limit=1
+            ) or env["estate.district"].create({"name": name, "city_id": city.id})
+            streets = district.street_ids
+            if not streets:
+                streets = env["estate.street"].create([
+                    {"name": street, "city_id": city.id, "district_id": district.id}
+                    for street in rng.sample(STREETS, 8)
+                ])
+            angle = 2 * math.pi * i / len(names)
+            districts.append({
+                "city": city,
+                "district": district,
+                "streets": streets.ids,
+                "latitude": lat + 0.04 * math.sin(angle),
+                "longitude": lon + 0.05 * math.cos(angle),
+                "price_m2": price_m2 * rng.uniform(0.7, 1.4),
+                "weight": CITY_WEIGHTS.get(code, 0.05) / len(names),
+            })
+    if not districts:
+        raise SystemExit("No estate.city with a known code, is royal_estate installed?")
+    return districts
+
+
+def property_vals(rng: random.Random, n: int, district: dict, user_ids: list[int], source_id: int):
+    property_type = pick(rng, PROPERTY_TYPES)
+    deal_type = "sale" if property_type == "land" else pick(rng, DEAL_TYPES)
+    rooms = pick(rng, ROOMS) + (2 if property_type in ("house", "townhouse") else 0)
+    area = round(max(15.0, rng.gauss(18 + 20 * rooms, 8)), 1)
+    floors_total = pick(rng, FLOORS_TOTAL) if property_type == "apartment" else rng.randint(1, 3)
+    price = area * district["price_m2"] * rng.lognormvariate(0, 0.2) * RENT_RATIO[deal_type]
+    vals = {
+        "name": f"{rooms}-комн. {'квартира' if property_type == 'apartment' else 'объект'}, "
+        f"{area} м² #{n}",
+        "property_type": property_type,
+        "deal_type": deal_type,
+        "state": pick(rng, STATES),
+        "city_id": district["city"].id,
+        "district_id": district["district"].id,
+        "street_id": rng.choice(district["streets"]),
+        "house_number": str(rng.randint(1, 250)),
+        "latitude": district["latitude"] + rng.gauss(0, 0.01),
+        "longitude": district["longitude"] + rng.gauss(0, 0.012),
+        "rooms": rooms if property_type != "land" else 0,
+        "area_total": area,
+        "floor": rng.randint(1, floors_total),
+        "floors_total": floors_total,
+        "year_built": rng.randint(1960, 2025),
+        "building_type": pick(rng, BUILDING_TYPES),
+        "condition": pick(rng, CONDITIONS),
+        "price": round(price, -3 if deal_type == "sale" else 0),
+        "user_id": rng.choice(user_ids),
+        "source_id": source_id,
+        "description": " ".join(rng.choices(STREETS, k=rng.randint(20, 80))),
+    }
+    if property_type == "land":
+        vals.update({"area_land": round(rng.uniform(4, 20), 1), "area_total": 0})
+    return vals
+
+
+def generate(env, count: int, seed: int, batch_size: int, photos_per_property: int, lead_ratio: float):
+    rng = random.Random(seed)
+    env = env(context=dict(
+        env.context,
+        tracking_disable=True,
+        mail_create_nolog=True,
+        mail_create_nosubscribe=True,
+        mail_notrack=True,
+    ))
+    Source = env["estate.source"]
+    source = Source.search([("code", "=", SOURCE_CODE)], limit=1) or Source.create(
+        {"name": "Синтетические данные", "code": SOURCE_CODE}
+    )
+    districts = ensure_geography(env, rng)
+    weights = [district["weight"] for district in districts]
+    user_ids = env["res.users"].search([("share", "=", False)]).ids
+    photos = generate_photos(rng, 24) if photos_per_property else []
+    env.cr.commit()
+
+    start = time.perf_counter()
+    done = 0
+    for batch in split_every(batch_size, range(count)):
+        vals_list = [
+            property_vals(rng, n, rng.choices(districts, weights=weights)[0], user_ids, source.id)
+            for n in batch
+        ]
+        properties = env["estate.property"].create(vals_list)
+        # spread over three years, the list views are ordered by create_date
+        env.cr.execute(SQL(
+            "UPDATE estate_property SET create_date = now() - random() * interval '3 years'"
+            " WHERE id IN %s",
+            tuple(properties.ids),
+        ))
+
+        image_vals_list = []
+        lead_vals_list = []
+        for prop, vals in zip(properties, vals_list):
+            for i in range(rng.randint(0, photos_per_property)):
+                image_vals_list.append({
+                    "property_id": prop.id,
+                    "name": f"photo_{i}.jpg",
+                    "image": rng.choice(photos),
+                    "sequence": i,
+                    "is_main": i == 0,
+                })
+            if rng.random() < lead_ratio:
+                for _i in range(rng.randint(1, 3)):
+                    lead_vals_list.append({
+                        "name": f"Интерес: {vals['name']}",
+                        "type": "opportunity",
+                        "property_id": prop.id,
+                        "user_id": rng.choice(user_ids),
+                        "expected_revenue": vals["price"],
+                    })
+        env["estate.property.image"].create(image_vals_list)
+        env["crm.lead"].create(lead_vals_list)
+        env.cr.commit()
+        env.invalidate_all()
+
+        done += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{done}/{count} properties, {done / elapsed:.0f}/s", flush=True)
+
+
+def drop(env):
+    source = env["estate.source"].search([("code", "=", SOURCE_CODE)], limit=1)
+    if not source:
+        return
+    properties = env["estate.property"].with_context(active_test=False).search(
+        [("source_id", "=", source.id)]
+    )
+    for ids in split_every(1000, properties.ids):
+        env["crm.lead"].with_context(active_test=False).search([("property_id", "in", ids)]).unlink()
+        env["estate.property"].browse(ids).unlink()
+        env.cr.commit()
+        print(f"{len(ids)} properties removed", flush=True)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(arg_parser)
+    arg_parser.add_argument("-n", "--number", type=int, default=10000, help="properties to create")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    arg_parser.add_argument("--photos", type=int, default=8, help="maximum photos per property")
+    arg_parser.add_argument("--leads", type=float, default=0.3, help="share of properties with leads")
+    arg_parser.add_argument("--drop", action="store_true", help="remove the generated data")
+    args = arg_parser.parse_args()
+
+    with odoo_env(args) as env:
+        if args.drop:
+            drop(env)
+        else:
+            generate(env, args.number, args.seed, args.batch_size, args.photos, args.leads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""Odoo environment for the command line scripts of this directory."""
+
+import argparse
+from contextlib import contextmanager
+
+from odoo import api
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+
+def add_database_arguments(arg_parser: argparse.ArgumentParser) -> None:
+    arg_parser.add_argument("-c", "--config", help="Odoo configuration file")
+    arg_parser.add_argument("-d", "--database", required=True, help="database with royal_estate installed")
+
+
+@contextmanager
+def odoo_env(args: argparse.Namespace):
+    """Superuser environment on ``args.database``. The transaction is
+    rolled back on exit unless the caller commits."""
+    config.parse_config(["-c", args.config] if args.config else [])
+    registry = Registry(args.database)
+    with registry.cursor() as cr:
+        try:
+            yield api.Environment(cr, api.SUPERUSER_ID, {})
+        finally:
+            cr.rollback()
@@ -0,0 +1,26 @@
+def migrate(cr, version):
+    if not version:
+        return
+
+    # krisha_id из krisha_url (https://krisha.kz/a/show/<id>).
+    # Если одно объявление импортировано несколько раз, ID получает
+    # самая старая запись, чтобы не нарушить уникальность.
+    cr.execute(r"""
+        UPDATE estate_property p
+        SET krisha_id = src.krisha_id
+        FROM (
+            SELECT DISTINCT ON (krisha_id) id, krisha_id
+            FROM (
+                SELECT id, (regexp_match(krisha_url, '/a/show/(\d{1,10})'))[1]::bigint AS krisha_id
+                FROM estate_property
+                WHERE krisha_url IS NOT NULL
+            ) parsed
+            WHERE krisha_id BETWEEN 1 AND 2147483647
+            ORDER BY krisha_id, id
+        ) src
+        WHERE p.id = src.id
+        AND p.krisha_id IS NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM estate_property e WHERE e.krisha_id = src.krisha_id
+        )
+    """)
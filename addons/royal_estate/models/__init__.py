@@ -6,4 +6,11 @@ from . import estate_appliance
 from . import estate_property
 from . import estate_source
 from . import estate_property_image
+from . import estate_property_duplicate
+from . import estate_market_stat
+from . import estate_geocode_cache
 from . import crm_lead
+from . import ir_attachment
+from . import krisha_listing_mixin
+from . import krisha_crawl_checkpoint
+from . import krisha_import_job
@@ -1,4 +1,14 @@
-from odoo import fields, models
+import json
+import logging
+from collections import defaultdict
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+
+from ..services.geo import PolygonIndex, geojson_polygons
+
+_logger = logging.getLogger(__name__)
 
 
 class EstateDistrict(models.Model):
@@ -15,9 +25,105 @@ class EstateDistrict(models.Model):
         ondelete="restrict",
     )
     active = fields.Boolean(string="Активен", default=True)
+    boundary_geojson = fields.Text(
+        string="Границы (GeoJSON)",
+        help="Polygon или MultiPolygon в координатах «долгота, широта». "
+        "Район объекта с координатами внутри границ определяется без обращения к геокодеру.",
+    )
 
     street_ids = fields.One2many(
         "estate.street",
         "district_id",
         string="Улицы",
     )
+
+    @api.constrains("boundary_geojson")
+    def _check_boundary_geojson(self):
+        for district in self.filtered("boundary_geojson"):
+            try:
+                geojson_polygons(json.loads(district.boundary_geojson))
+            except (ValueError, KeyError, TypeError, IndexError, AttributeError) as e:
+                raise ValidationError(_(
+                    "Некорректные границы района «%(name)s»: %(error)s",
+                    name=district.name,
+                    error=e,
+                )) from e
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        districts = super().create(vals_list)
+        if any(vals.get("boundary_geojson") for vals in vals_list):
+            self.env.registry.clear_cache()
+        return districts
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"boundary_geojson", "city_id", "active"} & vals.keys():
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        has_boundary = any(self.mapped("boundary_geojson"))
+        res = super().unlink()
+        if has_boundary:
+            self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_boundary_index(self) -> PolygonIndex:
+        """Index of the active district boundaries, keyed by
+        ``(district_id, city_id)``. Built once per registry, and again after
+        a boundary changes."""
+        self.env.cr.execute(SQL(
+            """
+            SELECT id, city_id, boundary_geojson
+              FROM estate_district
+             WHERE active AND boundary_geojson IS NOT NULL
+            """
+        ))
+        polygons = {}
+        for district_id, city_id, boundary in self.env.cr.fetchall():
+            try:
+                polygons[district_id, city_id] = geojson_polygons(json.loads(boundary))
+            except (ValueError, KeyError, TypeError, IndexError, AttributeError):
+                _logger.warning("Ignoring invalid boundary of district %s", district_id)
+        return PolygonIndex(polygons)
+
+    @api.model
+    def _find_by_location(self, longitude: float, latitude: float, city_id: int | None = None):
+        """District whose boundary contains the point, restricted to the
+        city if given; an empty recordset if there is none. No network
+        call is made."""
+        keys = self._get_boundary_index().locate_all(longitude, latitude)
+        key = next((key for key in keys if not city_id or key[1] == city_id), None)
+        return self.browse(key[0] if key else ())
+
+    @api.model
+    def _find_or_create_by_names(self, names_by_city: dict[int, set[str]]) -> dict:
+        """Districts matching the geocoder names of ``{city_id: names}``, by
+        ``(city_id, name)``, the missing ones being created.
+
+        A district matches when its name contains the given one, as with a
+        ``name ilike`` search, but all the cities are read in one query.
+        """
+        districts_by_city = defaultdict(list)
+        for district in self.search([("city_id", "in", list(names_by_city))]):
+            districts_by_city[district.city_id.id].append(district)
+
+        result = {}
+        vals_list = []
+        for city_id, names in names_by_city.items():
+            for name in names:
+                needle = name.casefold()
+                district = next(
+                    (d for d in districts_by_city[city_id] if needle in d.name.casefold()),
+                    None,
+                )
+                if district:
+                    result[city_id, name] = district
+                else:
+                    vals_list.append({"name": name, "city_id": city_id})
+        for district in self.create(vals_list):
+            result[district.city_id.id, district.name] = district
+        return result
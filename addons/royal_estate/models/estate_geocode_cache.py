@@ -0,0 +1,244 @@
+import re
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from ..services.yandex_geocoder import YandexGeocoder
+
+# 4 decimals: about 10 m, far below the size of a district
+COORDINATE_DIGITS = 4
+
+
+class EstateGeocodeCache(models.Model):
+    _name = "estate.geocode.cache"
+    _description = "Кэш геокодирования"
+    _order = "write_date desc"
+    _rec_name = "key"
+
+    kind = fields.Selection(
+        [
+            ("address", "Адрес → координаты"),
+            ("district", "Координаты → район"),
+        ],
+        string="Тип запроса",
+        required=True,
+        readonly=True,
+    )
+    key = fields.Char(
+        string="Запрос",
+        required=True,
+        readonly=True,
+        help="Нормализованный адрес или округлённые координаты «долгота,широта»",
+    )
+    found = fields.Boolean(string="Найдено", readonly=True)
+    longitude = fields.Float(string="Долгота", digits=(10, 7), readonly=True)
+    latitude = fields.Float(string="Широта", digits=(10, 7), readonly=True)
+    district_name = fields.Char(string="Район", readonly=True)
+    date_fetched = fields.Datetime(string="Получено", readonly=True)
+    hit_count = fields.Integer(string="Попаданий", readonly=True)
+    miss_count = fields.Integer(
+        string="Запросов к API",
+        readonly=True,
+        help="Сколько раз ответ запрашивался у геокодера (первый раз и по истечении срока)",
+    )
+
+    # the conflict target of _insert_entries()
+    _kind_key_uniq = models.UniqueIndex("(kind, key)", "Запрос уже есть в кэше")
+
+    @api.model
+    def _normalize_address(self, address: str) -> str:
+        address = address.lower().replace("ё", "е")
+        address = re.sub(r"\s*,\s*", ", ", address)
+        return re.sub(r"\s+", " ", address).strip(" ,")
+
+    @api.model
+    def _coordinates_key(self, longitude: float, latitude: float) -> str:
+        return f"{longitude:.{COORDINATE_DIGITS}f},{latitude:.{COORDINATE_DIGITS}f}"
+
+    @api.model
+    def _get_ttl(self) -> timedelta:
+        days = self.env["ir.config_parameter"].sudo().get_param(
+            "royal_estate.geocode_cache_ttl_days", 90
+        )
+        return timedelta(days=int(days))
+
+    @api.model
+    def _get_geocoder(self) -> YandexGeocoder:
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        api_key = get_param("royal_estate.yandex_geocoder_api_key")
+        if not api_key:
+            raise UserError(_("API ключ Yandex Geocoder не настроен"))
+        return YandexGeocoder(
+            api_key,
+            max_workers=int(get_param("royal_estate.geocoder_max_workers", 4)),
+            rate_limit=float(get_param("royal_estate.geocoder_rate_limit", 5)),
+        )
+
+    @api.model
+    def _lookup_many(self, kind: str, queries: dict, fetch_many) -> dict:
+        """Return the cache entries of ``queries`` (``{key: query}``) by key.
+
+        ``fetch_many(queries)`` is called once with the queries whose entry
+        is missing or expired, and returns a values dict for each query it
+        could answer; keys left unanswered are missing from the result.
+        """
+        cache = self.sudo()
+        entries = {
+            entry.key: entry
+            for entry in cache.search([("kind", "=", kind), ("key", "in", list(queries))])
+        }
+        expiry = fields.Datetime.now() - self._get_ttl()
+        hit_keys = {key for key, entry in entries.items() if entry.date_fetched >= expiry}
+        hits = cache.browse(entries[key].id for key in hit_keys)
+        if hits:
+            self.env.cr.execute(SQL(
+                "UPDATE estate_geocode_cache SET hit_count = hit_count + 1 WHERE id IN %s",
+                tuple(hits.ids),
+            ))
+            hits.invalidate_recordset(["hit_count"])
+
+        stale = {key: query for key, query in queries.items() if key not in hit_keys}
+        if not stale:
+            return entries
+        fetched = fetch_many(list(dict.fromkeys(stale.values())))
+        date_fetched = fields.Datetime.now()
+        vals_list = []
+        for key, query in stale.items():
+            if query not in fetched:
+                entries.pop(key, None)
+                continue
+            vals = {**fetched[query], "date_fetched": date_fetched}
+            if key in entries:
+                entries[key].write({**vals, "miss_count": entries[key].miss_count + 1})
+            else:
+                vals_list.append({**vals, "kind": kind, "key": key, "miss_count": 1})
+        if vals_list:
+            cache._insert_entries(vals_list)
+            entries.update(
+                (entry.key, entry)
+                for entry in cache.search([
+                    ("kind", "=", kind),
+                    ("key", "in", [vals["key"] for vals in vals_list]),
+                ])
+            )
+        return entries
+
+    @api.model
+    def _insert_entries(self, vals_list: list[dict]):
+        """Insert the entries of ``vals_list``, but for those another
+        transaction, geocoding the same queries, inserted meanwhile: its
+        answers are as good."""
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO estate_geocode_cache (
+                kind, key, found, longitude, latitude, district_name,
+                date_fetched, hit_count, miss_count,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES %s
+            ON CONFLICT (kind, key) DO NOTHING
+            """,
+            SQL(", ").join(
+                SQL(
+                    """
+                    (%s, %s, %s, %s, %s, %s, %s, 0, %s,
+                     %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+                    """,
+                    vals["kind"],
+                    vals["key"],
+                    vals["found"],
+                    vals["longitude"],
+                    vals["latitude"],
+                    vals.get("district_name") or None,
+                    vals["date_fetched"],
+                    vals["miss_count"],
+                    self.env.uid,
+                    self.env.uid,
+                )
+                for vals in vals_list
+            ),
+        ))
+
+    @api.model
+    def _geocode(self, address: str) -> tuple[float, float] | None:
+        """``(longitude, latitude)`` of the address, ``None`` if not found."""
+        return self._geocode_many([address], raise_errors=True).get(address)
+
+    @api.model
+    def _geocode_many(
+        self, addresses, raise_errors: bool = False
+    ) -> dict[str, tuple[float, float]]:
+        """``(longitude, latitude)`` of the addresses that could be found,
+        by address. Identical addresses are requested once, concurrently.
+
+        Failed requests are logged and skipped unless ``raise_errors``.
+        """
+
+        def fetch_many(addresses):
+            geocoder = self._get_geocoder()
+            if raise_errors:
+                points = {address: geocoder.geocode(address) for address in addresses}
+            else:
+                points = geocoder.geocode_many(addresses)
+            return {
+                address: {"found": True, "longitude": point[0], "latitude": point[1]}
+                if point else {"found": False, "longitude": 0.0, "latitude": 0.0}
+                for address, point in points.items()
+            }
+
+        queries = {self._normalize_address(address): address for address in addresses}
+        entries = self._lookup_many("address", queries, fetch_many)
+        return {
+            address: (entries[key].longitude, entries[key].latitude)
+            for address in addresses
+            if (key := self._normalize_address(address)) in entries and entries[key].found
+        }
+
+    @api.model
+    def _district_at(self, longitude: float, latitude: float) -> str | None:
+        """Name of the district at the point, ``None`` if not found."""
+        point = (longitude, latitude)
+        return self._district_at_many([point], raise_errors=True).get(point)
+
+    @api.model
+    def _district_at_many(
+        self, points, raise_errors: bool = False
+    ) -> dict[tuple[float, float], str]:
+        """Name of the district at each ``(longitude, latitude)`` point where
+        one could be found, by point. Points that round to the same cache
+        key are requested once, concurrently.
+
+        Failed requests are logged and skipped unless ``raise_errors``.
+        """
+
+        def fetch_many(points):
+            geocoder = self._get_geocoder()
+            if raise_errors:
+                names = {point: geocoder.district_at(*point) for point in points}
+            else:
+                names = geocoder.district_at_many(points)
+            return {
+                point: {
+                    "found": bool(name),
+                    "longitude": point[0],
+                    "latitude": point[1],
+                    "district_name": name or False,
+                }
+                for point, name in names.items()
+            }
+
+        queries = {self._coordinates_key(*point): point for point in points}
+        entries = self._lookup_many("district", queries, fetch_many)
+        return {
+            point: entries[key].district_name
+            for point in points
+            if (key := self._coordinates_key(*point)) in entries and entries[key].found
+        }
+
+    @api.autovacuum
+    def _gc_expired(self):
+        self.search([
+            ("date_fetched", "<", fields.Datetime.now() - self._get_ttl()),
+        ]).unlink()
@@ -0,0 +1,282 @@
+import logging
+from itertools import chain
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.tools.sql import create_unique_index
+
+_logger = logging.getLogger(__name__)
+
+# withdrawn listings do not make the market
+EXCLUDED_STATES = ("canceled", "archived")
+# below this many listings the district median is replaced by the city one
+MIN_LISTINGS = 5
+
+
+def _property_type_selection(self):
+    return self.env["estate.property"]._fields["property_type"].selection
+
+
+def _deal_type_selection(self):
+    return self.env["estate.property"]._fields["deal_type"].selection
+
+
+class EstateMarketStat(models.Model):
+    """Price statistics of the listings of a segment: a district (or the
+    whole city when empty), a property type, a deal type and a number of
+    rooms. Materialized by a cron from the properties changed since its last
+    run, one (city, type, deal, rooms) slice at a time."""
+
+    _name = "estate.market.stat"
+    _description = "Статистика рынка"
+    _order = "city_id, district_id, property_type, deal_type, rooms"
+
+    city_id = fields.Many2one(
+        "estate.city",
+        string="Город",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+        index=True,
+    )
+    district_id = fields.Many2one(
+        "estate.district",
+        string="Район",
+        readonly=True,
+        ondelete="cascade",
+        help="Пусто: весь город",
+    )
+    property_type = fields.Selection(
+        _property_type_selection, string="Тип объекта", required=True, readonly=True
+    )
+    deal_type = fields.Selection(
+        _deal_type_selection, string="Тип сделки", required=True, readonly=True
+    )
+    rooms = fields.Integer(string="Комнат", readonly=True)
+    listing_count = fields.Integer(string="Объявлений", readonly=True)
+    price_mean = fields.Float(
+        string="Средняя цена", digits=(16, 0), readonly=True, aggregator="avg"
+    )
+    price_median = fields.Float(
+        string="Медиана цены", digits=(16, 0), readonly=True, aggregator="avg"
+    )
+    price_p10 = fields.Float(
+        string="Цена, P10", digits=(16, 0), readonly=True, aggregator="min"
+    )
+    price_p90 = fields.Float(
+        string="Цена, P90", digits=(16, 0), readonly=True, aggregator="max"
+    )
+    price_per_sqm_mean = fields.Float(
+        string="Средняя цена за м²", digits=(16, 0), readonly=True, aggregator="avg"
+    )
+    price_per_sqm_median = fields.Float(
+        string="Медиана цены за м²", digits=(16, 0), readonly=True, aggregator="avg"
+    )
+    price_per_sqm_p10 = fields.Float(
+        string="Цена за м², P10", digits=(16, 0), readonly=True, aggregator="min"
+    )
+    price_per_sqm_p90 = fields.Float(
+        string="Цена за м², P90", digits=(16, 0), readonly=True, aggregator="max"
+    )
+    dirty = fields.Boolean(
+        readonly=True,
+        help="A property of the slice was deleted, recomputed by the next refresh",
+    )
+    date_refreshed = fields.Datetime(string="Обновлено", readonly=True)
+
+    def init(self):
+        super().init()
+        create_unique_index(
+            self.env.cr,
+            "estate_market_stat_segment_uniq",
+            self._table,
+            ["city_id", "COALESCE(district_id, 0)", "property_type", "deal_type", "rooms"],
+        )
+
+    def _get_segment_key(self) -> tuple:
+        self.ensure_one()
+        return (
+            self.city_id.id,
+            self.district_id.id,
+            self.property_type,
+            self.deal_type,
+            self.rooms,
+        )
+
+    @api.model
+    def _get_slices(self, records) -> set[tuple]:
+        """``(city_id, property_type, deal_type, rooms)`` of properties or
+        statistics ``records``: the unit of a refresh."""
+        return {
+            (record.city_id.id, record.property_type, record.deal_type, record.rooms or 0)
+            for record in records
+            if record.city_id
+        }
+
+    @api.model
+    def _invalidate_slices(self, properties):
+        """Flag the statistics of ``properties`` about to be deleted."""
+        slices = self._get_slices(chain(properties, properties.market_stat_id))
+        if not slices:
+            return
+        self.env.cr.execute(SQL(
+            """
+            UPDATE estate_market_stat SET dirty = true
+             WHERE (city_id, property_type, deal_type, rooms) IN %s AND NOT dirty
+            """,
+            tuple(slices),
+        ))
+        self.invalidate_model(["dirty"])
+
+    @api.model
+    def _compute_slices(self, slices: set[tuple]) -> dict[tuple, dict]:
+        """Values of the statistics of the district and city segments of
+        ``slices``, by segment key."""
+        self.env["estate.property"].flush_model()
+        self.env.cr.execute(SQL(
+            """
+            SELECT city_id, district_id, property_type, deal_type, rooms, count(*),
+                   avg(price),
+                   percentile_cont(%(fractions)s::float8[]) WITHIN GROUP (ORDER BY price),
+                   avg(price_per_sqm) FILTER (WHERE price_per_sqm > 0),
+                   percentile_cont(%(fractions)s::float8[]) WITHIN GROUP (ORDER BY price_per_sqm)
+                       FILTER (WHERE price_per_sqm > 0)
+              FROM (
+                SELECT city_id, district_id, property_type, deal_type,
+                       COALESCE(rooms, 0) AS rooms, price, price_per_sqm
+                  FROM estate_property
+                 WHERE active
+                   AND price > 0
+                   AND state NOT IN %(excluded)s
+                   AND (city_id, property_type, deal_type, COALESCE(rooms, 0)) IN %(slices)s
+              ) p
+             GROUP BY GROUPING SETS (
+                (city_id, district_id, property_type, deal_type, rooms),
+                (city_id, property_type, deal_type, rooms)
+             )
+            HAVING GROUPING(district_id) = 1 OR district_id IS NOT NULL
+            """,
+            fractions=[0.1, 0.5, 0.9],
+            excluded=EXCLUDED_STATES,
+            slices=tuple(slices),
+        ))
+        now = fields.Datetime.now()
+        result = {}
+        for (
+            city_id, district_id, property_type, deal_type, rooms, count,
+            price_mean, prices, price_per_sqm_mean, prices_per_sqm,
+        ) in self.env.cr.fetchall():
+            prices_per_sqm = prices_per_sqm or [0.0, 0.0, 0.0]
+            result[city_id, district_id or False, property_type, deal_type, rooms] = {
+                "listing_count": count,
+                "price_mean": price_mean,
+                "price_p10": prices[0],
+                "price_median": prices[1],
+                "price_p90": prices[2],
+                "price_per_sqm_mean": price_per_sqm_mean or 0.0,
+                "price_per_sqm_p10": prices_per_sqm[0],
+                "price_per_sqm_median": prices_per_sqm[1],
+                "price_per_sqm_p90": prices_per_sqm[2],
+                "dirty": False,
+                "date_refreshed": now,
+            }
+        return result
+
+    @api.model
+    def _write_slices(self, slices: set[tuple]):
+        """Bring the statistics of ``slices`` up to date, removing the
+        segments left without listings."""
+        values = self._compute_slices(slices)
+        self.env.cr.execute(SQL(
+            "SELECT id FROM estate_market_stat WHERE (city_id, property_type, deal_type, rooms) IN %s",
+            tuple(slices),
+        ))
+        existing = {
+            stat._get_segment_key(): stat
+            for stat in self.browse(stat_id for (stat_id,) in self.env.cr.fetchall())
+        }
+        vals_list = []
+        for key, vals in values.items():
+            if key in existing:
+                existing.pop(key).write(vals)
+            else:
+                city_id, district_id, property_type, deal_type, rooms = key
+                vals_list.append({
+                    **vals,
+                    "city_id": city_id,
+                    "district_id": district_id,
+                    "property_type": property_type,
+                    "deal_type": deal_type,
+                    "rooms": rooms,
+                })
+        self.create(vals_list)
+        self.browse(stat.id for stat in existing.values()).unlink()
+
+    @api.model
+    def _refresh(self, batch_size: int = 5000) -> int:
+        """Recompute the slices of up to ``batch_size`` properties changed
+        since the last refresh, including the slices they were counted in
+        before the change, and of the deleted properties. Return the number
+        of properties processed."""
+        Property = self.env["estate.property"].with_context(active_test=False)
+        properties = Property.search([("market_dirty", "=", True)], order="id", limit=batch_size)
+        dirty = self.search([("dirty", "=", True)])
+        slices = self._get_slices(chain(properties, properties.market_stat_id, dirty))
+        if slices:
+            self._write_slices(slices)
+        if properties:
+            # the properties now count in the segment of their current values
+            self.flush_model()
+            self.env.cr.execute(SQL(
+                """
+                UPDATE estate_property p
+                   SET market_dirty = false,
+                       market_stat_id = (
+                        SELECT s.id FROM estate_market_stat s
+                         WHERE s.city_id = p.city_id
+                           AND COALESCE(s.district_id, 0) = COALESCE(p.district_id, 0)
+                           AND s.property_type = p.property_type
+                           AND s.deal_type = p.deal_type
+                           AND s.rooms = COALESCE(p.rooms, 0)
+                       )
+                 WHERE p.id = ANY(%s)
+                """,
+                properties.ids,
+            ))
+            Property.invalidate_model(["market_dirty", "market_stat_id"])
+        _logger.info(
+            "Market statistics: %d properties, %d slices refreshed", len(properties), len(slices)
+        )
+        return len(properties)
+
+    @api.model
+    def _cron_refresh(self, batch_size=5000):
+        done = self._refresh(batch_size)
+        self.env["ir.cron"]._notify_progress(
+            done=done,
+            remaining=self.env["estate.property"].with_context(active_test=False).search_count(
+                [("market_dirty", "=", True)]
+            ),
+        )
+
+    @api.model
+    def _get_price_per_sqm_medians(self, keys) -> dict[tuple, float]:
+        """Median price per m² of the segments ``keys`` (see
+        :meth:`_get_segment_key`); the median of the whole city when the
+        district has too few listings."""
+        keys = {key for key in keys if key[0]}
+        if not keys:
+            return {}
+        stats = self.search([
+            ("city_id", "in", list({key[0] for key in keys})),
+            ("rooms", "in", list({key[4] for key in keys})),
+            ("listing_count", ">=", MIN_LISTINGS),
+            ("price_per_sqm_median", ">", 0),
+        ])
+        medians = {stat._get_segment_key(): stat.price_per_sqm_median for stat in stats}
+        result = {}
+        for key in keys:
+            median = medians.get(key) or medians.get((key[0], False, *key[2:]))
+            if median:
+                result[key] = median
+        return result
@@ -1,11 +1,51 @@
 import logging
-import requests
+import re
+import threading
+import time
+from collections import defaultdict
 
-from odoo import api, fields, models
+from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import SQL, create_index, split_every
+
+from ..services.comps import CompsFeatures, CompsIndex
+from ..services.geo import bounding_box, geohash_cover, geohash_encode
+from ..services.search_text import normalize_search_text, search_terms
+from .estate_market_stat import EXCLUDED_STATES
 
 _logger = logging.getLogger(__name__)
 
+# suffix of the index name, indexed expressions; see init()
+LIST_INDEXES = [
+    ("recent", ["create_date DESC"]),
+    ("state", ["state", "create_date DESC"]),
+    ("city_deal", ["city_id", "deal_type", "property_type", "create_date DESC"]),
+    ("district", ["district_id", "deal_type", "create_date DESC"]),
+    ("user", ["user_id", "create_date DESC"]),
+    # price range and rooms within a city
+    ("price", ["city_id", "deal_type", "rooms", "price"]),
+]
+
+# fields of the segment and prices of the market statistics, see
+# estate.market.stat
+MARKET_FIELDS = {
+    "active",
+    "state",
+    "city_id",
+    "district_id",
+    "property_type",
+    "deal_type",
+    "rooms",
+    "price",
+    "area_total",
+}
+
+# comparable listings index of each database, per process:
+# dbname -> (built at, CompsIndex, {query: results}); see _get_comps_index()
+_comps_indexes = {}
+_comps_lock = threading.Lock()
+COMPS_CACHE_SIZE = 10000
+
 
 class EstateProperty(models.Model):
     _name = "estate.property"
@@ -13,9 +53,29 @@ class EstateProperty(models.Model):
     _inherit = ["mail.thread", "mail.activity.mixin"]
     _order = "create_date desc"
 
+    # among the imported properties only: those entered by hand store 0, the
+    # web client sends all the fields of a new record. Being partial, it is
+    # not used by the lookups by krisha_id, the field has its own index
+    _krisha_id_uniq = models.UniqueIndex(
+        "(krisha_id) WHERE krisha_id != 0",
+        "Объявление с таким ID на Krisha.kz уже есть в базе",
+    )
+
     # === Основные ===
     name = fields.Char(string="Название", required=True, tracking=True)
     description = fields.Text(string="Описание")
+    search_document = fields.Text(
+        string="Поисковый документ",
+        compute="_compute_search_document",
+        store=True,
+        index="trigram",
+        help="Нормализованные название, адрес и описание для поиска по всем полям",
+    )
+    search_anywhere = fields.Char(
+        string="Везде",
+        compute="_compute_search_anywhere",
+        search="_search_search_anywhere",
+    )
     active = fields.Boolean(default=True)
 
     property_type = fields.Selection(
@@ -59,6 +119,12 @@ class EstateProperty(models.Model):
     )
 
     price = fields.Monetary(string="Цена", tracking=True)
+    price_per_sqm = fields.Monetary(
+        string="Цена за м²",
+        compute="_compute_price_per_sqm",
+        store=True,
+        aggregator="avg",
+    )
     currency_id = fields.Many2one(
         "res.currency",
         default=lambda self: self.env.company.currency_id,
@@ -91,11 +157,93 @@ class EstateProperty(models.Model):
     # === Геолокация ===
     latitude = fields.Float(string="Широта", digits=(10, 7))
     longitude = fields.Float(string="Долгота", digits=(10, 7))
+    geohash = fields.Char(
+        string="Геохеш",
+        compute="_compute_geohash",
+        store=True,
+        help="Ячейка сетки geohash для поиска объектов поблизости",
+    )
     geo_address = fields.Char(
         string="Адрес для геокодирования",
         compute="_compute_geo_address",
         store=True,
     )
+    district_detect_date = fields.Datetime(
+        string="Район определялся",
+        compute="_compute_district_detect_date",
+        store=True,
+        readonly=True,
+        copy=False,
+        help="Когда район последний раз определялся по адресу; сбрасывается при смене адреса",
+    )
+
+    def init(self):
+        super().init()
+        # prefix (LIKE 'abc%') lookups of search_nearby
+        create_index(
+            self.env.cr,
+            "estate_property_geohash_prefix_index",
+            self._table,
+            ["geohash text_pattern_ops"],
+            where="geohash IS NOT NULL",
+        )
+        # list and kanban views: active properties, newest first (_order),
+        # narrowed by the usual filters of the search view; the pages are
+        # read in index order instead of sorting the whole filtered table
+        for name, expressions in LIST_INDEXES:
+            create_index(
+                self.env.cr,
+                f"estate_property_{name}_list_index",
+                self._table,
+                expressions,
+                where="active",
+            )
+        # properties changed since the last refresh of the market statistics
+        create_index(
+            self.env.cr,
+            "estate_property_market_dirty_index",
+            self._table,
+            ["id"],
+            where="market_dirty",
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # districts with a boundary are set at insert time, e.g. on import
+        District = self.env["estate.district"]
+        if len(District._get_boundary_index()):
+            for vals in vals_list:
+                if vals.get("district_id") or not (vals.get("latitude") and vals.get("longitude")):
+                    continue
+                district = District._find_by_location(
+                    vals["longitude"], vals["latitude"], vals.get("city_id")
+                )
+                if district:
+                    vals["district_id"] = district.id
+                    vals.setdefault("city_id", district.city_id.id)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if not MARKET_FIELDS.isdisjoint(vals):
+            vals = {**vals, "market_dirty": True}
+        return super().write(vals)
+
+    def unlink(self):
+        self.env["estate.market.stat"]._invalidate_slices(self)
+        return super().unlink()
+
+    @api.depends("price", "area_total")
+    def _compute_price_per_sqm(self):
+        for record in self:
+            record.price_per_sqm = record.price / record.area_total if record.area_total else 0.0
+
+    @api.depends("latitude", "longitude")
+    def _compute_geohash(self):
+        for record in self:
+            if record.latitude or record.longitude:
+                record.geohash = geohash_encode(record.latitude, record.longitude)
+            else:
+                record.geohash = False
 
     @api.depends("city_id", "district_id", "street_id", "house_number")
     def _compute_geo_address(self):
@@ -111,6 +259,64 @@ class EstateProperty(models.Model):
                 parts.append(record.house_number)
             record.geo_address = ", ".join(parts) if parts else False
 
+    @api.depends("name", "description", "geo_address")
+    def _compute_search_document(self):
+        # geo_address covers the city, district, street and house number
+        for record in self:
+            record.search_document = " ".join(filter(None, (
+                normalize_search_text(record.name),
+                normalize_search_text(record.geo_address),
+                normalize_search_text(record.description),
+            ))) or False
+
+    def _compute_search_anywhere(self):
+        self.search_anywhere = False
+
+    def _search_search_anywhere(self, operator, value):
+        if operator not in ("ilike", "not ilike", "like", "not like", "=", "!="):
+            raise UserError(_("Оператор %s не поддерживается для поиска везде", operator))
+        conditions = [
+            ("search_document", "ilike", term)
+            for term in search_terms(value if isinstance(value, str) else "")
+        ]
+        if not conditions:
+            return []
+        if operator in ("not ilike", "not like", "!="):
+            return ["!"] + ["&"] * (len(conditions) - 1) + conditions
+        return conditions
+
+    @api.model
+    def _get_search_anywhere_terms(self, domain) -> list[str]:
+        if not isinstance(domain, (list, tuple)):
+            return []
+        terms = []
+        for leaf in domain:
+            if (
+                isinstance(leaf, (list, tuple))
+                and len(leaf) == 3
+                and leaf[0] == "search_anywhere"
+                and leaf[1] in ("ilike", "like", "=")
+                and isinstance(leaf[2], str)
+            ):
+                terms.extend(search_terms(leaf[2]))
+        return terms
+
+    @api.model
+    def _search(self, domain, offset=0, limit=None, order=None, **kwargs):
+        query = super()._search(domain, offset, limit, order, **kwargs)
+        # results of a "search anywhere" are listed by relevance, unless the
+        # user sorts them on a column
+        if order == self._order and self.env.registry.has_trigram and not query.is_empty():
+            terms = self._get_search_anywhere_terms(domain)
+            if terms:
+                query.order = SQL(
+                    "word_similarity(%s, %s) DESC, %s",
+                    " ".join(terms),
+                    SQL.identifier(query.table, "search_document"),
+                    query.order,
+                )
+        return query
+
     @api.model
     def _default_city(self):
         return self.env["estate.city"].search([("code", "=", "almaty")], limit=1)
@@ -122,115 +328,158 @@ class EstateProperty(models.Model):
         if self.street_id and self.street_id.city_id != self.city_id:
             self.street_id = False
 
+    @api.depends("city_id", "street_id", "house_number")
+    def _compute_district_detect_date(self):
+        self.district_detect_date = False
+
+    def _get_geocode_address(self) -> str | False:
+        self.ensure_one()
+        parts = [self.city_id.name, self.street_id.name, self.house_number]
+        return ", ".join(part for part in parts if part) or False
+
     def action_detect_district(self):
         self.ensure_one()
-        api_key = (
-            self.env["ir.config_parameter"]
-            .sudo()
-            .get_param("royal_estate.yandex_geocoder_api_key")
-        )
-        if not api_key:
-            raise UserError("API ключ Yandex Geocoder не настроен")
-
-        address_parts = []
-        if self.city_id:
-            address_parts.append(self.city_id.name)
-        if self.street_id:
-            address_parts.append(self.street_id.name)
-        if self.house_number:
-            address_parts.append(self.house_number)
-
-        if not address_parts:
+        District = self.env["estate.district"]
+
+        # Шаг 0: координаты уже известны — район по его границам, без геокодера
+        if self.latitude and self.longitude:
+            district = District._find_by_location(self.longitude, self.latitude, self.city_id.id)
+            if district:
+                self.district_id = district
+                self.district_detect_date = fields.Datetime.now()
+                return
+
+        address = self._get_geocode_address()
+        if not address:
             raise UserError("Укажите адрес для определения района")
 
-        address = ", ".join(address_parts)
+        # ответы геокодера кэшируются: повторный запрос не уходит в API
+        Geocode = self.env["estate.geocode.cache"]
 
         # Шаг 1: Прямое геокодирование — получаем координаты
-        response = requests.get(
-            "https://geocode-maps.yandex.ru/1.x/",
-            params={"apikey": api_key, "geocode": address, "format": "json"},
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        feature_members = (
-            data.get("response", {})
-            .get("GeoObjectCollection", {})
-            .get("featureMember", [])
-        )
-        if not feature_members:
+        point = Geocode._geocode(address)
+        if not point:
             raise UserError(f"Адрес не найден: {address}")
-
-        geo_object = feature_members[0].get("GeoObject", {})
-        pos = geo_object.get("Point", {}).get("pos", "")
-        if not pos:
-            raise UserError(f"Координаты не найдены для адреса: {address}")
-
-        lon, lat = pos.split()
-        lon, lat = float(lon), float(lat)
+        lon, lat = point
 
         if not self.latitude or not self.longitude:
             self.latitude = lat
             self.longitude = lon
 
-        # Шаг 2: Обратное геокодирование с kind=district — получаем район
-        response = requests.get(
-            "https://geocode-maps.yandex.ru/1.x/",
-            params={
-                "apikey": api_key,
-                "geocode": f"{lon},{lat}",
-                "format": "json",
-                "kind": "district",
+        # Шаг 2: район по границам, иначе обратное геокодирование с kind=district
+        district = District._find_by_location(lon, lat, self.city_id.id)
+        district_name = district.name if district else Geocode._district_at(lon, lat)
+
+        if district:
+            self.district_id = district
+        elif district_name and self.city_id:
+            districts = District._find_or_create_by_names({self.city_id.id: {district_name}})
+            self.district_id = districts[self.city_id.id, district_name]
+        else:
+            _logger.warning("Район не найден для адреса: %s", address)
+        self.district_detect_date = fields.Datetime.now()
+
+    def action_detect_districts(self):
+        """Server action of the list view: district detection of the
+        selected properties, see :meth:`_detect_districts`."""
+        detected = self._detect_districts()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "success" if detected else "warning",
+                "message": _(
+                    "Район определён для %(detected)s из %(total)s объектов",
+                    detected=len(detected),
+                    total=len(self),
+                ),
+                "next": {"type": "ir.actions.act_window_close"},
             },
-            timeout=10,
-        )
-        response.raise_for_status()
-        data = response.json()
+        }
 
-        feature_members = (
-            data.get("response", {})
-            .get("GeoObjectCollection", {})
-            .get("featureMember", [])
-        )
+    def _detect_districts(self, batch_size: int = 200, geocode: bool = True):
+        """Fill the district, and the missing coordinates, of the properties.
 
-        district_name = None
-        for feature in feature_members:
-            name = feature.get("GeoObject", {}).get("name", "")
-            if "район" in name.lower() and "жилой" not in name.lower():
-                district_name = name
-                break
-
-        if not district_name:
-            for feature in feature_members:
-                components = (
-                    feature.get("GeoObject", {})
-                    .get("metaDataProperty", {})
-                    .get("GeocoderMetaData", {})
-                    .get("Address", {})
-                    .get("Components", [])
-                )
-                for comp in components:
-                    if comp.get("kind") == "district":
-                        name = comp.get("name", "")
-                        if "район" in name.lower() and "жилой" not in name.lower():
-                            district_name = name
-                            break
-                if district_name:
-                    break
-
-        if district_name and self.city_id:
-            district = self.env["estate.district"].search(
-                [("name", "ilike", district_name), ("city_id", "=", self.city_id.id)],
-                limit=1,
+        Coordinates inside a district boundary are resolved in process; the
+        other properties are located from their address unless ``geocode``
+        is false. Identical addresses are geocoded once, the geocoder is
+        called concurrently within its rate limit and the districts are
+        matched for all the cities of a batch at once.
+
+        Return the properties whose district was set.
+        """
+        detected = self.browse()
+        for batch in split_every(batch_size, self.ids, self.browse):
+            detected |= batch._detect_districts_batch(geocode)
+        return detected
+
+    def _detect_districts_batch(self, geocode: bool = True):
+        detected = self._detect_districts_by_boundary()
+        if geocode:
+            # without a street the geocoder only knows the city center
+            detected |= (self - detected).filtered("street_id")._detect_districts_by_address()
+        if len(detected) < len(self):
+            _logger.info(
+                "District not found for %d of %d properties", len(self - detected), len(self)
             )
-            if not district:
-                district = self.env["estate.district"].create(
-                    {"name": district_name, "city_id": self.city_id.id}
-                )
-            self.district_id = district.id
+        self.district_detect_date = fields.Datetime.now()
+        return detected
+
+    def _detect_districts_by_boundary(self):
+        District = self.env["estate.district"]
+        detected = self.browse()
+        for prop in self.filtered(lambda prop: prop.latitude and prop.longitude):
+            district = District._find_by_location(prop.longitude, prop.latitude, prop.city_id.id)
+            if district:
+                prop.district_id = district
+                detected |= prop
+        return detected
+
+    def _detect_districts_by_address(self):
+        District = self.env["estate.district"]
+        Geocode = self.env["estate.geocode.cache"]
+        addresses = {prop: prop._get_geocode_address() for prop in self}
+        points = Geocode._geocode_many(set(addresses.values()))
+        located = self.filtered(lambda prop: addresses[prop] in points)
+        detected = self.browse()
+        for prop in located:
+            lon, lat = points[addresses[prop]]
+            if not prop.latitude or not prop.longitude:
+                prop.latitude = lat
+                prop.longitude = lon
+            district = District._find_by_location(lon, lat, prop.city_id.id)
+            if district:
+                prop.district_id = district
+                detected |= prop
+        located -= detected
+
+        names = Geocode._district_at_many({points[addresses[prop]] for prop in located})
+        names_by_city = defaultdict(set)
+        for prop in located.filtered("city_id"):
+            if name := names.get(points[addresses[prop]]):
+                names_by_city[prop.city_id.id].add(name)
+        districts = District._find_or_create_by_names(names_by_city)
+        for prop in located:
+            district = districts.get((prop.city_id.id, names.get(points[addresses[prop]])))
+            if district:
+                prop.district_id = district
+                detected |= prop
+        return detected
+
+    @api.model
+    def _cron_detect_districts(self, batch_size=200):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        geocode = bool(get_param("royal_estate.yandex_geocoder_api_key"))
+        domain = [("district_id", "=", False), ("district_detect_date", "=", False)]
+        if geocode:
+            domain += ["|", ("geohash", "!=", False), ("street_id", "!=", False)]
         else:
-            _logger.warning("Район не найден для адреса: %s", address)
+            domain += [("geohash", "!=", False)]
+        properties = self.search(domain, limit=batch_size)
+        properties._detect_districts(batch_size, geocode=geocode)
+        self.env["ir.cron"]._notify_progress(
+            done=len(properties), remaining=self.search_count(domain)
+        )
 
     # === Характеристики строения ===
     floor = fields.Integer(string="Этаж")
@@ -514,6 +763,25 @@ class EstateProperty(models.Model):
     video_url = fields.Char(string="Видео")
     instagram_url = fields.Char(string="Instagram")
     krisha_url = fields.Char(string="URL на Krisha.kz")
+    krisha_id = fields.Integer(string="ID на Krisha.kz", copy=False, index=True)
+    krisha_fingerprint = fields.Char(
+        string="Отпечаток объявления",
+        copy=False,
+        help="Хэш цены, площади и списка фото на Krisha.kz на момент последней синхронизации",
+    )
+    krisha_description_hash = fields.Char(string="Хэш описания", copy=False)
+    krisha_synced_at = fields.Datetime(string="Синхронизировано с Krisha.kz", copy=False)
+
+    # === Статистика рынка ===
+    # segment the property was last counted in and whether it changed
+    # since, see estate.market.stat
+    market_stat_id = fields.Many2one(
+        "estate.market.stat",
+        readonly=True,
+        copy=False,
+        ondelete="set null",
+    )
+    market_dirty = fields.Boolean(default=True, copy=False)
 
     # === Медиа ===
     image_ids = fields.One2many(
@@ -522,6 +790,276 @@ class EstateProperty(models.Model):
         string="Фотографии",
     )
 
+    # === Дубликаты ===
+    duplicate_count = fields.Integer(
+        string="Возможные дубликаты",
+        compute="_compute_duplicate_count",
+    )
+
+    def _compute_duplicate_count(self):
+        counts = defaultdict(int)
+        Duplicate = self.env["estate.property.duplicate"]
+        for field_name in ("property_id", "duplicate_id"):
+            for prop, count in Duplicate._read_group(
+                [(field_name, "in", self.ids), ("state", "!=", "dismissed")],
+                [field_name],
+                ["__count"],
+            ):
+                counts[prop.id] += count
+        for prop in self:
+            prop.duplicate_count = counts[prop.id]
+
+    def action_view_duplicates(self):
+        self.ensure_one()
+        action = self.env["ir.actions.act_window"]._for_xml_id(
+            "royal_estate.estate_property_duplicate_action"
+        )
+        action["domain"] = ["|", ("property_id", "=", self.id), ("duplicate_id", "=", self.id)]
+        action["context"] = {}
+        return action
+
+    def action_find_duplicates(self):
+        self.env["estate.property.duplicate"].sudo()._detect(self)
+        self.invalidate_recordset(["duplicate_count"])
+        if len(self) == 1 and self.duplicate_count:
+            return self.action_view_duplicates()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "info",
+                "message": _("Возможных дубликатов: %s", sum(self.mapped("duplicate_count"))),
+            },
+        }
+
+    @api.onchange("krisha_url")
+    def _onchange_krisha_url(self):
+        krisha_id = self._krisha_id_from_url(self.krisha_url)
+        if krisha_id:
+            self.krisha_id = krisha_id
+
+    @api.model
+    def _krisha_id_from_url(self, url):
+        match = re.search(r"/a/show/(\d+)", url or "")
+        return int(match.group(1)) if match else False
+
+    @api.model
+    def _get_existing_krisha_ids(self, krisha_ids) -> set[int]:
+        """Return the subset of ``krisha_ids`` already imported, archived
+        properties included."""
+        krisha_ids = list({int(krisha_id) for krisha_id in krisha_ids if krisha_id})
+        if not krisha_ids:
+            return set()
+        self.flush_model(["krisha_id"])
+        self.env.cr.execute(SQL(
+            "SELECT krisha_id FROM estate_property WHERE krisha_id = ANY(%s)",
+            krisha_ids,
+        ))
+        return {krisha_id for (krisha_id,) in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_krisha_fingerprints(self, krisha_ids) -> dict[int, tuple[int, str | None]]:
+        """Map already imported ``krisha_ids`` to ``(property id, fingerprint)``."""
+        krisha_ids = list({int(krisha_id) for krisha_id in krisha_ids if krisha_id})
+        if not krisha_ids:
+            return {}
+        self.flush_model(["krisha_id", "krisha_fingerprint"])
+        self.env.cr.execute(SQL(
+            """SELECT krisha_id, id, krisha_fingerprint
+            FROM estate_property
+            WHERE krisha_id = ANY(%s)""",
+            krisha_ids,
+        ))
+        return {
+            krisha_id: (property_id, fingerprint)
+            for krisha_id, property_id, fingerprint in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _search_nearby_distances(self, latitude, longitude, radius_m, domain=None, limit=None):
+        """Return ``[(id, distance in meters)]`` of the properties within
+        ``radius_m`` of the point, nearest first.
+
+        The geohash cells covering the circle are looked up through the
+        prefix index, the exact haversine distance is computed in SQL on the
+        few rows left.
+        """
+        query = self._search(list(domain or []))
+        table = query.table
+        lat = SQL.identifier(table, "latitude")
+        lon = SQL.identifier(table, "longitude")
+        prefixes = geohash_cover(latitude, longitude, radius_m)
+        query.add_where(SQL("(%s)", SQL(" OR ").join(
+            SQL("%s LIKE %s", SQL.identifier(table, "geohash"), f"{prefix}%")
+            for prefix in prefixes
+        )))
+        min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_m)
+        query.add_where(SQL("%s BETWEEN %s AND %s", lat, min_lat, max_lat))
+        query.add_where(SQL("%s BETWEEN %s AND %s", lon, min_lon, max_lon))
+        distance = SQL(
+            """2 * 6371008.8 * asin(least(1, sqrt(
+                power(sin(radians(%(lat)s - %(latitude)s) / 2), 2)
+                + cos(radians(%(latitude)s)) * cos(radians(%(lat)s))
+                * power(sin(radians(%(lon)s - %(longitude)s) / 2), 2)
+            )))""",
+            lat=lat,
+            lon=lon,
+            latitude=latitude,
+            longitude=longitude,
+        )
+        self.env.cr.execute(SQL(
+            """SELECT id, distance FROM (%s) AS nearby
+            WHERE distance <= %s
+            ORDER BY distance
+            %s""",
+            query.select(SQL.identifier(table, "id"), SQL("%s AS distance", distance)),
+            radius_m,
+            SQL("LIMIT %s", limit) if limit else SQL(),
+        ))
+        return self.env.cr.fetchall()
+
+    @api.model
+    def search_nearby(self, latitude, longitude, radius_m, domain=None, limit=None):
+        """Properties within ``radius_m`` meters of the point, nearest first."""
+        return self.browse(
+            property_id
+            for property_id, _distance in self._search_nearby_distances(
+                latitude, longitude, radius_m, domain=domain, limit=limit
+            )
+        )
+
+    def get_nearby_comparables(self, radius_m=None, limit=50):
+        """Nearby properties of the same type and deal, for the map widget."""
+        self.ensure_one()
+        if not (self.latitude or self.longitude):
+            return []
+        if radius_m is None:
+            radius_m = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("royal_estate.nearby_radius_m", 1500)
+            )
+        distances = dict(self._search_nearby_distances(
+            self.latitude,
+            self.longitude,
+            radius_m,
+            domain=[
+                ("id", "!=", self.id),
+                ("property_type", "=", self.property_type),
+                ("deal_type", "=", self.deal_type),
+            ],
+            limit=limit,
+        ))
+        return [
+            {
+                "id": prop.id,
+                "name": prop.name,
+                "latitude": prop.latitude,
+                "longitude": prop.longitude,
+                "price": prop.price,
+                "distance": round(distances[prop.id]),
+            }
+            for prop in self.browse(distances)
+        ]
+
+    @api.model
+    def _get_comps_index(self) -> tuple[float, CompsIndex, dict]:
+        """Feature matrix of the active listings, built once per process and
+        rebuilt when older than ``royal_estate.comps_index_ttl`` seconds,
+        with the results of the queries made on it."""
+        ttl = float(
+            self.env["ir.config_parameter"].sudo().get_param("royal_estate.comps_index_ttl", 600)
+        )
+        dbname = self.env.cr.dbname
+        entry = _comps_indexes.get(dbname)
+        if entry is None or time.monotonic() - entry[0] >= ttl:
+            with _comps_lock:
+                entry = _comps_indexes.get(dbname)
+                if entry is None or time.monotonic() - entry[0] >= ttl:
+                    entry = (time.monotonic(), self._build_comps_index(), {})
+                    _comps_indexes[dbname] = entry
+        return entry
+
+    @api.model
+    def _build_comps_index(self) -> CompsIndex:
+        start = time.perf_counter()
+        self.flush_model()
+        self.env.cr.execute(SQL(
+            """
+            SELECT id, property_type, deal_type, latitude, longitude, rooms, area_total,
+                   floor, floors_total, year_built, building_type, condition
+              FROM estate_property
+             WHERE active AND state NOT IN %s
+            """,
+            EXCLUDED_STATES,
+        ))
+        index = CompsIndex(
+            (row[0], (row[1], row[2]), *row[3:]) for row in self.env.cr.fetchall()
+        )
+        _logger.info(
+            "Comps index of %d listings built in %.2f s", len(index), time.perf_counter() - start
+        )
+        return index
+
+    def _get_comps_features(self) -> CompsFeatures:
+        self.ensure_one()
+        return CompsFeatures(
+            latitude=self.latitude,
+            longitude=self.longitude,
+            rooms=self.rooms,
+            area=self.area_total,
+            floor=self.floor,
+            floors_total=self.floors_total,
+            year_built=self.year_built,
+            building_type=self.building_type or None,
+            condition=self.condition or None,
+        )
+
+    def _get_comps(self, limit=10) -> list[tuple[int, float]]:
+        """``(id, distance)`` of the ``limit`` active listings of the same
+        type and deal most similar to this one, most similar first.
+
+        The result is cached until the features of the property change or
+        the index is rebuilt.
+        """
+        self.ensure_one()
+        features = self._get_comps_features()
+        segment = (self.property_type, self.deal_type)
+        _built, index, results = self._get_comps_index()
+        key = (self.id, segment, features, limit)
+        if key not in results:
+            if len(results) >= COMPS_CACHE_SIZE:
+                results.clear()
+            results[key] = index.query(segment, features, limit, exclude=[self.id])
+        return results[key]
+
+    def get_comps(self, limit=10):
+        """Comparable listings to price this property, most similar first;
+        ``distance`` is 0 for identical features."""
+        distances = dict(self._get_comps(limit))
+        comps = self.search([("id", "in", list(distances))])
+        return [
+            {
+                "id": prop.id,
+                "name": prop.name,
+                "price": prop.price,
+                "price_per_sqm": prop.price_per_sqm,
+                "distance": round(distances[prop.id], 2),
+            }
+            for prop in comps.sorted(lambda prop: distances[prop.id])
+        ]
+
+    def action_view_comps(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("Аналоги: %s", self.name),
+            "res_model": "estate.property",
+            "view_mode": "list,form",
+            "views": [(False, "list"), (False, "form")],
+            "domain": [("id", "in", [comp["id"] for comp in self.get_comps()])],
+        }
+
     @api.model
     def get_twogis_api_key(self):
         return (
@@ -0,0 +1,226 @@
+import logging
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from ..services.duplicates import WEIGHTS, ListingFeatures, find_duplicates
+from ..services.image_hash import perceptual_overlap
+
+_logger = logging.getLogger(__name__)
+
+
+class EstatePropertyDuplicate(models.Model):
+    _name = "estate.property.duplicate"
+    _description = "Возможный дубликат объекта"
+    _order = "score desc, id desc"
+    _rec_name = "property_id"
+
+    property_id = fields.Many2one(
+        "estate.property",
+        string="Объект",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    duplicate_id = fields.Many2one(
+        "estate.property",
+        string="Возможный дубликат",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    score = fields.Float(string="Сходство", digits=(3, 2), readonly=True)
+    area_score = fields.Float(string="Площадь", digits=(3, 2), readonly=True)
+    price_score = fields.Float(string="Цена", digits=(3, 2), readonly=True)
+    floor_score = fields.Float(string="Этаж", digits=(3, 2), readonly=True)
+    location_score = fields.Float(string="Расположение", digits=(3, 2), readonly=True)
+    photos_score = fields.Float(string="Фото", digits=(3, 2), readonly=True)
+    state = fields.Selection(
+        [
+            ("new", "Не проверен"),
+            ("confirmed", "Дубликат"),
+            ("dismissed", "Не дубликат"),
+        ],
+        string="Статус",
+        required=True,
+        default="new",
+    )
+
+    _pair_uniq = models.Constraint(
+        "UNIQUE(property_id, duplicate_id)",
+        "Эта пара объектов уже есть в списке дубликатов",
+    )
+    _pair_order = models.Constraint(
+        "CHECK(property_id < duplicate_id)",
+        "Пара дубликатов хранится один раз, объект с меньшим ID первым",
+    )
+
+    def action_confirm(self):
+        self.write({"state": "confirmed"})
+
+    def action_dismiss(self):
+        self.write({"state": "dismissed"})
+
+    @api.model
+    def _get_threshold(self) -> float:
+        return float(
+            self.env["ir.config_parameter"].sudo().get_param(
+                "royal_estate.duplicate_threshold", 0.8
+            )
+        )
+
+    @api.model
+    def _photo_similarity(self):
+        """Comparison of the perceptual hashes of the photos of two
+        listings, see ``services.duplicates``."""
+        return perceptual_overlap
+
+    @api.model
+    def _iter_listing_features(self, properties=None, batch_size=5000):
+        """Yield the features of the active listings that can be compared,
+        by batches of whole districts of about ``batch_size`` listings: a
+        listing is only compared within its district. With ``properties``,
+        only of the listings sharing a block with them, in one batch."""
+        self.env["estate.property"].flush_model()
+        self.env["estate.property.image"].flush_model()
+        if properties:
+            # rooms are read as 0 when not set, see _read_listing_features()
+            yield self._read_listing_features(SQL(
+                """
+                AND EXISTS (
+                    SELECT 1 FROM estate_property q
+                     WHERE q.id = ANY(%s)
+                       AND q.property_type IS NOT DISTINCT FROM p.property_type
+                       AND q.deal_type IS NOT DISTINCT FROM p.deal_type
+                       AND q.district_id = p.district_id
+                       AND COALESCE(q.rooms, 0) = COALESCE(p.rooms, 0)
+                )
+                """,
+                properties.ids,
+            ))
+            return
+        self.env.cr.execute(SQL(
+            """
+            SELECT district_id, count(*)
+              FROM estate_property
+             WHERE active AND district_id IS NOT NULL AND area_total > 0
+             GROUP BY district_id
+             ORDER BY district_id
+            """
+        ))
+        district_ids, size = [], 0
+        for district_id, count in self.env.cr.fetchall():
+            district_ids.append(district_id)
+            size += count
+            if size >= batch_size:
+                yield self._read_listing_features(
+                    SQL("AND p.district_id = ANY(%s)", district_ids)
+                )
+                district_ids, size = [], 0
+        if district_ids:
+            yield self._read_listing_features(SQL("AND p.district_id = ANY(%s)", district_ids))
+
+    @api.model
+    def _read_listing_features(self, scope: SQL) -> list[ListingFeatures]:
+        """Features of the active listings that can be compared, among those
+        matching the ``scope`` condition on ``p``."""
+        self.env.cr.execute(SQL(
+            """
+            SELECT p.id, p.property_type, p.deal_type, p.district_id, p.rooms,
+                   p.area_total, p.price, p.floor, p.floors_total,
+                   p.latitude, p.longitude,
+                   array_remove(array_agg(DISTINCT NULLIF(i.phash, '')), NULL)
+              FROM estate_property p
+              LEFT JOIN estate_property_image i ON i.property_id = p.id
+             WHERE p.active
+               AND p.district_id IS NOT NULL
+               AND p.area_total > 0
+               %s
+             GROUP BY p.id
+            """,
+            scope,
+        ))
+        return [
+            ListingFeatures(
+                id=row[0],
+                property_type=row[1],
+                deal_type=row[2],
+                district_id=row[3],
+                rooms=row[4] or 0,
+                area=row[5] or 0.0,
+                price=float(row[6] or 0.0),
+                floor=row[7] or 0,
+                floors_total=row[8] or 0,
+                latitude=row[9] or 0.0,
+                longitude=row[10] or 0.0,
+                photo_hashes=frozenset(int(phash, 16) for phash in row[11]),
+            )
+            for row in self.env.cr.fetchall()
+        ]
+
+    @api.model
+    def _detect(self, properties=None, batch_size=5000) -> int:
+        """Store the pairs of likely duplicates among the active listings,
+        or only those involving ``properties``. Return the number of pairs
+        found. Pairs already reviewed keep their state; unreviewed pairs
+        that no longer match are removed."""
+        threshold = self._get_threshold()
+        photo_similarity = self._photo_similarity()
+        only_ids = set(properties.ids) if properties else None
+        listings_count = 0
+        pairs = {}
+        for listings in self._iter_listing_features(properties, batch_size):
+            listings_count += len(listings)
+            pairs.update(
+                ((first, second), (score, scores))
+                for first, second, score, scores in find_duplicates(
+                    listings, threshold, photo_similarity=photo_similarity, only_ids=only_ids
+                )
+            )
+
+        domain = [("state", "=", "new")]
+        if properties:
+            domain += [
+                "|",
+                ("property_id", "in", properties.ids),
+                ("duplicate_id", "in", properties.ids),
+            ]
+        existing = {
+            (dup.property_id.id, dup.duplicate_id.id): dup
+            for dup in self.search(domain)
+        }
+        reviewed = set()
+        if pairs:
+            self.env.cr.execute(SQL(
+                """
+                SELECT property_id, duplicate_id FROM estate_property_duplicate
+                 WHERE state != 'new' AND property_id = ANY(%s)
+                """,
+                list({first for first, _second in pairs}),
+            ))
+            reviewed = set(self.env.cr.fetchall())
+
+        vals_list = []
+        for pair, (score, scores) in pairs.items():
+            if pair in reviewed:
+                continue
+            vals = {
+                "score": score,
+                **{f"{name}_score": scores.get(name, 0.0) for name in WEIGHTS},
+            }
+            if pair in existing:
+                existing.pop(pair).write(vals)
+            else:
+                vals_list.append({**vals, "property_id": pair[0], "duplicate_id": pair[1]})
+        self.create(vals_list)
+        self.browse(dup.id for dup in existing.values()).unlink()
+        _logger.info(
+            "Duplicate detection: %d listings compared, %d pairs found", listings_count, len(pairs)
+        )
+        return len(pairs)
+
+    @api.model
+    def _cron_detect(self):
+        self._detect()
@@ -1,4 +1,15 @@
-from odoo import fields, models
+import base64
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from odoo import api, fields, models
+from odoo.tools import SQL, str2bool
+
+from ..services.image_hash import BANDS, MAX_DISTANCE, hamming, hash_bands, image_dhash
+from ..services.image_normalize import MAX_EDGE, QUALITY, normalize_image
+from ..services.image_renditions import RENDITIONS, RENDITIONS_VERSION, image_renditions
 
 
 class EstatePropertyImage(models.Model):
@@ -13,9 +24,292 @@ class EstatePropertyImage(models.Model):
         index=True,
     )
     name = fields.Char()
+    # stored normalized, see _process_photo()
     image = fields.Binary(attachment=True)
+    image_original = fields.Binary(
+        string="Original",
+        attachment=True,
+        readonly=True,
+        help="Photo as uploaded, kept when royal_estate.photo_keep_original is "
+        "set. With fs_attachment, list this field on a cold storage to keep "
+        "the originals out of the main one",
+    )
     sequence = fields.Integer(default=10)
+    source_url = fields.Char(
+        string="Source URL",
+        help="URL the photo was downloaded from during an import",
+    )
     is_main = fields.Boolean(
         string="Main Image",
         help="This image will be used as the property thumbnail",
     )
+    # empty string when the image cannot be decoded, NULL while not computed
+    phash = fields.Char(
+        string="Perceptual Hash",
+        readonly=True,
+        help="64-bit difference hash (hex) of the photo, close for resized "
+        "or re-encoded copies of the same photo",
+    )
+    phash_band_0 = fields.Integer(readonly=True, index=True)
+    phash_band_1 = fields.Integer(readonly=True, index=True)
+    phash_band_2 = fields.Integer(readonly=True, index=True)
+    phash_band_3 = fields.Integer(readonly=True, index=True)
+    # resized copies served as is instead of resizing the original on each
+    # request, see services/image_renditions.py; empty when the image cannot
+    # be decoded
+    image_large = fields.Binary(string="Large (JPEG)", attachment=True, readonly=True)
+    image_large_webp = fields.Binary(string="Large (WebP)", attachment=True, readonly=True)
+    image_medium = fields.Binary(string="Medium (JPEG)", attachment=True, readonly=True)
+    image_medium_webp = fields.Binary(string="Medium (WebP)", attachment=True, readonly=True)
+    image_thumb = fields.Binary(string="Thumbnail (JPEG)", attachment=True, readonly=True)
+    image_thumb_webp = fields.Binary(string="Thumbnail (WebP)", attachment=True, readonly=True)
+    renditions_version = fields.Integer(
+        readonly=True,
+        help="RENDITIONS_VERSION the renditions were generated with, 0 while not generated",
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # created a chunk at a time: the photos of the others are not decoded
+        # yet or already stored
+        processed = self._process_photos(
+            base64.b64decode(vals["image"]) for vals in vals_list if vals.get("image")
+        )
+        chunk_size = 2 * self._get_photo_params()["workers"]
+        images = []
+        for start in range(0, len(vals_list), chunk_size):
+            chunk = []
+            for vals in vals_list[start:start + chunk_size]:
+                if vals.get("image"):
+                    binaries, photo_vals = next(processed)
+                    vals = {**vals, **photo_vals, **self._encode_binaries(binaries)}
+                chunk.append(vals)
+            images.append(super().create(chunk))
+        return self.browse().concat(*images)
+
+    def write(self, vals):
+        if "image" in vals:
+            if vals["image"]:
+                [(binaries, photo_vals)] = self._process_photos(
+                    [base64.b64decode(vals["image"])]
+                )
+                vals = {**vals, **photo_vals, **self._encode_binaries(binaries)}
+            else:
+                vals = {
+                    **vals,
+                    **self._get_phash_vals(None),
+                    **self._get_rendition_vals(None),
+                    "image_original": False,
+                }
+        return super().write(vals)
+
+    @api.model
+    def _get_phash_vals(self, source: bytes | str | None) -> dict:
+        """Values of the hash fields for the image content or file path
+        ``source``."""
+        value = image_dhash(source) if source is not None else None
+        vals = {"phash": "" if source is not None else False}
+        if value is not None:
+            vals["phash"] = f"{value:016x}"
+        bands = hash_bands(value) if value is not None else [False] * BANDS
+        vals.update({f"phash_band_{i}": band for i, band in enumerate(bands)})
+        return vals
+
+    @api.model
+    def _get_rendition_contents(self, source: bytes | str | None) -> dict:
+        """Content of the rendition fields for the image content or file
+        path ``source``, None when it cannot be decoded."""
+        renditions = image_renditions(source) if source is not None else None
+        contents = {}
+        for name in RENDITIONS:
+            jpeg, webp = renditions[name] if renditions else (None, None)
+            contents[f"image_{name}"] = jpeg
+            contents[f"image_{name}_webp"] = webp
+        return contents
+
+    @api.model
+    def _get_rendition_vals(self, source: bytes | str | None) -> dict:
+        """Values of the rendition fields for the image content or file path
+        ``source``."""
+        return {
+            **self._encode_binaries(self._get_rendition_contents(source)),
+            "renditions_version": RENDITIONS_VERSION if source is not None else 0,
+        }
+
+    @api.model
+    def _encode_binaries(self, contents: dict) -> dict:
+        return {
+            name: base64.b64encode(content) if content else False
+            for name, content in contents.items()
+        }
+
+    @api.model
+    def _get_photo_params(self) -> dict:
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return {
+            "keep_original": str2bool(get_param("royal_estate.photo_keep_original", "False")),
+            "max_edge": int(get_param("royal_estate.photo_max_edge", MAX_EDGE)),
+            "quality": int(get_param("royal_estate.photo_quality", QUALITY)),
+            "workers": max(1, int(get_param("royal_estate.photo_workers", 4))),
+        }
+
+    @api.model
+    def _process_photo(self, source: bytes | str, keep_original: bool, **params) -> tuple:
+        """``(binaries, vals)`` of the photo content or file path ``source``:
+        the content of its binary fields and the values of the others.
+
+        ``image`` is ``source`` normalized by
+        :func:`~..services.image_normalize.normalize`, or ``source`` itself
+        when it cannot be decoded; ``image_original`` is ``source`` when kept.
+        They are file paths when ``source`` is one and they are not
+        normalized.
+
+        Runs in the worker threads of :meth:`_process_photos`: the
+        environment must not be used.
+        """
+        normalized = normalize_image(source, **params)
+        content = normalized or source
+        binaries = {
+            "image": content,
+            "image_original": source if keep_original and normalized else None,
+            **self._get_rendition_contents(content),
+        }
+        vals = {**self._get_phash_vals(content), "renditions_version": RENDITIONS_VERSION}
+        return binaries, vals
+
+    @api.model
+    def _process_photos(self, sources: Iterable):
+        """Yield :meth:`_process_photo` of each of ``sources``, in order.
+
+        Photos are processed by a pool of ``royal_estate.photo_workers``
+        threads (decoding, resizing and encoding release the GIL), one chunk
+        of ``2 * workers`` at a time: ``sources`` is only consumed as far as
+        the current chunk, so that a whole batch of photos is never held in
+        memory.
+        """
+        params = self._get_photo_params()
+        workers = params.pop("workers")
+        sources = iter(sources)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while chunk := list(islice(sources, 2 * workers)):
+                yield from executor.map(
+                    lambda source: self._process_photo(source, **params), chunk
+                )
+
+    def _set_image_from_files(self, photos):
+        """Attach the downloaded ``photos`` (one per record, same order) as
+        the ``image`` of the records, with the fields derived from them.
+
+        The attachments of all the binary fields of a chunk of photos are
+        created at once; the originals, when kept, and the photos that cannot
+        be decoded are copied to the storage without being read into memory.
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        chunk_size = 2 * self._get_photo_params()["workers"]
+        processed = self._process_photos([photo.path for photo in photos])
+        for start in range(0, len(self), chunk_size):
+            attachment_vals_list = []
+            chunk = slice(start, start + chunk_size)
+            for image, photo in zip(self[chunk], photos[chunk]):
+                binaries, vals = next(processed)
+                # no binary field: kept in cache, flushed together with the chunk
+                image.write(vals)
+                for name, content in binaries.items():
+                    if not content:
+                        continue
+                    field_vals = {
+                        "name": name,
+                        "res_model": self._name,
+                        "res_field": name,
+                        "res_id": image.id,
+                    }
+                    if isinstance(content, bytes):
+                        attachment_vals_list.append({**field_vals, "raw": content})
+                    else:
+                        attachment_vals_list.append(
+                            Attachment._prepare_stored_file_vals(field_vals, photo)
+                        )
+            Attachment.create(attachment_vals_list)
+        self.invalidate_recordset([
+            name for name, field in self._fields.items() if field.type == "binary"
+        ])
+
+    @api.model
+    def _search_similar(self, hashes) -> dict[int, "EstatePropertyImage"]:
+        """Map each of the :func:`~..services.image_hash.dhash` ``hashes``
+        to the images whose hash is at most ``MAX_DISTANCE`` bits away.
+
+        Candidates are looked up through the indexed bands of the hash, only
+        they are compared bit by bit.
+        """
+        hashes = set(hashes)
+        if not hashes:
+            return {}
+        bands = [hash_bands(value) for value in hashes]
+        self.flush_model(["phash", *(f"phash_band_{i}" for i in range(BANDS))])
+        self.env.cr.execute(SQL(
+            "SELECT id, phash FROM estate_property_image WHERE %s",
+            SQL(" OR ").join(
+                SQL(
+                    "%s = ANY(%s)",
+                    SQL.identifier(f"phash_band_{i}"),
+                    list({value_bands[i] for value_bands in bands}),
+                )
+                for i in range(BANDS)
+            ),
+        ))
+        matches = defaultdict(list)
+        for image_id, phash in self.env.cr.fetchall():
+            other = int(phash, 16)
+            for value in hashes:
+                if hamming(value, other) <= MAX_DISTANCE:
+                    matches[value].append(image_id)
+        return {value: self.browse(ids) for value, ids in matches.items()}
+
+    @api.model
+    def _cron_compute_phash(self, batch_size=200):
+        """Hash the photos stored before perceptual hashes existed."""
+        query = SQL(
+            """
+            FROM estate_property_image i
+            WHERE i.phash IS NULL
+              AND EXISTS (
+                SELECT 1 FROM ir_attachment a
+                 WHERE a.res_model = 'estate.property.image'
+                   AND a.res_field = 'image'
+                   AND a.res_id = i.id
+              )
+            """
+        )
+        self.env.cr.execute(SQL("SELECT i.id %s ORDER BY i.id LIMIT %s", query, batch_size))
+        images = self.browse(image_id for (image_id,) in self.env.cr.fetchall())
+        for image in images.with_context(bin_size=False):
+            image.write(self._get_phash_vals(base64.b64decode(image.image or b"")))
+        self.flush_model(["phash"])
+        self.env.cr.execute(SQL("SELECT count(*) %s", query))
+        self.env["ir.cron"]._notify_progress(done=len(images), remaining=self.env.cr.fetchone()[0])
+
+    @api.model
+    def _cron_generate_renditions(self, batch_size=50):
+        """Generate the renditions of the photos stored before them, or
+        with an older :data:`RENDITIONS_VERSION`."""
+        query = SQL(
+            """
+            FROM estate_property_image i
+            WHERE COALESCE(i.renditions_version, 0) != %s
+              AND EXISTS (
+                SELECT 1 FROM ir_attachment a
+                 WHERE a.res_model = 'estate.property.image'
+                   AND a.res_field = 'image'
+                   AND a.res_id = i.id
+              )
+            """,
+            RENDITIONS_VERSION,
+        )
+        self.env.cr.execute(SQL("SELECT i.id %s ORDER BY i.id LIMIT %s", query, batch_size))
+        images = self.browse(image_id for (image_id,) in self.env.cr.fetchall())
+        for image in images.with_context(bin_size=False):
+            image.write(self._get_rendition_vals(base64.b64decode(image.image or b"")))
+        self.flush_model(["renditions_version"])
+        self.env.cr.execute(SQL("SELECT count(*) %s", query))
+        self.env["ir.cron"]._notify_progress(done=len(images), remaining=self.env.cr.fetchone()[0])
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+
+from odoo import api, models
+from odoo.tools.mimetypes import guess_mimetype
+
+from ..services.krisha_parser import PhotoFile
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    @api.model
+    def _prepare_stored_file_vals(self, vals: dict, photo: PhotoFile) -> dict:
+        """Complete the ``vals`` of a binary attachment with the content of
+        the local file ``photo``, copied in chunks to the storage of the
+        attachment: the content is never loaded (let alone base64 encoded)
+        unless the attachment is kept in the database.
+
+        ``fs.storage`` storages of ``fs_attachment`` are used when that
+        module is installed, the Odoo filestore otherwise.
+        """
+        with open(photo.path, "rb") as f:
+            mimetype = guess_mimetype(f.read(1024))
+        vals = {
+            **vals,
+            "type": "binary",
+            "mimetype": mimetype,
+            "checksum": photo.checksum,
+            "file_size": photo.size,
+        }
+        attachment = self.with_context(
+            attachment_res_model=vals.get("res_model"),
+            attachment_res_field=vals.get("res_field"),
+        )
+        storage = attachment.env.context.get("storage_location") or attachment._storage()
+        if storage in attachment._get_fs_storage_codes():
+            if not attachment._fs_store_in_db(photo.size, mimetype):
+                vals["store_fname"] = attachment._fs_copy_file(storage, photo)
+                return vals
+        elif storage == "file":
+            vals["store_fname"] = attachment._filestore_copy_file(photo)
+            return vals
+        with open(photo.path, "rb") as f:
+            vals["raw"] = f.read()
+        return vals
+
+    @api.model
+    def _get_fs_storage_codes(self) -> list[str]:
+        # fs_attachment is optional
+        if hasattr(self, "_get_storage_codes"):
+            return self._get_storage_codes()
+        return []
+
+    @api.model
+    def _fs_store_in_db(self, size: int, mimetype: str) -> bool:
+        # same rules as _store_in_db_instead_of_object_storage, which needs
+        # the content itself
+        if self._is_storage_disabled():
+            return True
+        for mimetype_key, limit in self._get_storage_force_db_config().items():
+            if mimetype.startswith(mimetype_key):
+                return not limit or size <= limit
+        return False
+
+    @api.model
+    def _fs_copy_file(self, storage: str, photo: PhotoFile) -> str:
+        fs = self._get_fs_storage_for_code(storage)
+        path = self.with_context(force_storage_key=photo.checksum)._get_fs_path(storage, None)
+        if not fs.exists(path):
+            dirname = os.path.dirname(path)
+            if dirname and not fs.exists(dirname):
+                fs.makedirs(dirname)
+            with open(photo.path, "rb") as src, fs.open(
+                path, "wb", **self._storage_write_option(fs)
+            ) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        fname = f"{storage}://{path}"
+        self._fs_mark_for_gc(fname)
+        return fname
+
+    @api.model
+    def _filestore_copy_file(self, photo: PhotoFile) -> str:
+        # same layout as _get_path, identical content is stored once
+        sha = photo.checksum
+        for fname in (f"{sha[:3]}/{sha}", f"{sha[:2]}/{sha}"):
+            if os.path.isfile(self._full_path(fname)):
+                return fname
+        full_path = self._full_path(fname)
+        dirname = os.path.dirname(full_path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst, open(photo.path, "rb") as src:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            os.replace(tmp_path, full_path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+        self._mark_for_gc(fname)
+        return fname
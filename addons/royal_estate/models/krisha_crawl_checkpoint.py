@@ -0,0 +1,94 @@
+import json
+import logging
+import threading
+from contextlib import closing, contextmanager
+from dataclasses import asdict
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+from ..services.krisha_parser import KrishaProperty, ParseParams
+
+_logger = logging.getLogger(__name__)
+
+# an older crawl is started over: the search results have moved on since
+CHECKPOINT_MAX_AGE = timedelta(days=1)
+
+
+class KrishaCrawlCheckpoint(models.Model):
+    _name = "krisha.crawl.checkpoint"
+    _description = "Контрольная точка парсинга Krisha.kz"
+    _order = "write_date desc"
+
+    signature = fields.Char(string="Подпись поиска", required=True, readonly=True)
+    last_page = fields.Integer(string="Последняя страница", readonly=True)
+    items = fields.Json(string="Объявления", readonly=True)
+
+    # the conflict target of _save()
+    _signature_uniq = models.UniqueIndex(
+        "(signature)", "Контрольная точка для этого поиска уже существует"
+    )
+
+    @contextmanager
+    def _in_new_cursor(self):
+        """Checkpoints are written in their own transaction: they must
+        survive the rollback of the crawl that failed."""
+        if getattr(threading.current_thread(), "testing", False):
+            yield self.env.cr
+            return
+        with closing(self.env.registry.cursor()) as cr:
+            yield cr
+            cr.commit()  # pylint: disable=invalid-commit
+
+    @api.model
+    def _load(self, params: ParseParams) -> tuple[int, list[KrishaProperty]]:
+        """Return the last completed page of the search and the adverts
+        seen up to it, ``(0, [])`` if the search has to start over."""
+        checkpoint = self.search([
+            ("signature", "=", params.signature()),
+            ("write_date", ">=", fields.Datetime.now() - CHECKPOINT_MAX_AGE),
+        ], limit=1)
+        if not checkpoint:
+            return 0, []
+        _logger.info("Resuming Krisha crawl after page %d", checkpoint.last_page)
+        return checkpoint.last_page, [KrishaProperty(**item) for item in checkpoint.items or []]
+
+    @api.model
+    def _save(self, params: ParseParams, page: int, new_items: list[KrishaProperty]):
+        """Record ``page`` as completed, appending the adverts first seen on it."""
+        items = json.dumps([asdict(item) for item in new_items])
+        with self._in_new_cursor() as cr:
+            cr.execute(SQL(
+                """
+                INSERT INTO krisha_crawl_checkpoint (
+                    signature, last_page, items,
+                    create_uid, create_date, write_uid, write_date
+                )
+                VALUES (%(signature)s, %(page)s, %(items)s::jsonb,
+                        %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+                ON CONFLICT (signature) DO UPDATE SET
+                    last_page = EXCLUDED.last_page,
+                    items = krisha_crawl_checkpoint.items || EXCLUDED.items,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+                """,
+                signature=params.signature(),
+                page=page,
+                items=items,
+                uid=self.env.uid,
+            ))
+
+    @api.model
+    def _discard(self, params: ParseParams):
+        with self._in_new_cursor() as cr:
+            cr.execute(SQL(
+                "DELETE FROM krisha_crawl_checkpoint WHERE signature = %s",
+                params.signature(),
+            ))
+
+    @api.autovacuum
+    def _gc_checkpoints(self):
+        self.search([
+            ("write_date", "<", fields.Datetime.now() - CHECKPOINT_MAX_AGE),
+        ]).unlink()
@@ -0,0 +1,426 @@
+import logging
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+from ..services.krisha_parser import (
+    KRISHA_CITIES,
+    KrishaCrawlError,
+    KrishaProperty,
+    ParseParams,
+)
+
+_logger = logging.getLogger(__name__)
+
+# cron runs in a row a search page may fail before the job is failed
+MAX_PARSE_FAILURES = 3
+
+# fields of estate.property refreshed by an incremental sync, the rest
+# (name, stage, agents...) belongs to the agency once imported
+SYNC_FIELDS = (
+    "price",
+    "rooms",
+    "area_total",
+    "floor",
+    "floors_total",
+    "latitude",
+    "longitude",
+)
+
+
+class KrishaImportJob(models.Model):
+    _name = "krisha.import.job"
+    _description = "Фоновый импорт Krisha.kz"
+    _order = "id desc"
+
+    name = fields.Char(
+        string="Название",
+        required=True,
+        default=lambda self: _("Импорт Krisha.kz"),
+    )
+    state = fields.Selection(
+        [
+            ("draft", "Черновик"),
+            ("parse", "Парсинг"),
+            ("import", "Импорт"),
+            ("done", "Готово"),
+            ("failed", "Ошибка"),
+            ("canceled", "Отменён"),
+        ],
+        string="Статус",
+        required=True,
+        default="draft",
+        copy=False,
+    )
+    user_id = fields.Many2one(
+        "res.users",
+        string="Ответственный",
+        required=True,
+        default=lambda self: self.env.user,
+    )
+    mode = fields.Selection(
+        [
+            ("import", "Импорт новых"),
+            ("sync", "Обновление"),
+        ],
+        string="Режим",
+        required=True,
+        default="import",
+        help="Обновление: изменившиеся объявления, уже импортированные в базу, "
+        "перечитываются с Krisha.kz, новые импортируются",
+    )
+    nightly_sync = fields.Boolean(
+        string="Обновлять еженощно",
+        copy=False,
+        help="Каждую ночь запускать по этим параметрам новое задание в режиме обновления",
+    )
+
+    # === Параметры поиска ===
+    city = fields.Selection(KRISHA_CITIES, string="Город", default="almaty", required=True)
+    rooms = fields.Char(string="Комнаты", help="Через запятую, например: 1,2,3")
+    price_from = fields.Integer(string="Цена от")
+    price_to = fields.Integer(string="Цена до")
+    has_photo = fields.Boolean(string="С фото", default=True)
+    owner = fields.Boolean(string="От владельца")
+    max_pages = fields.Integer(string="Страниц", default=1, required=True)
+
+    # === Прогресс ===
+    last_page = fields.Integer(string="Обработано страниц", readonly=True, copy=False)
+    parse_done = fields.Boolean(string="Парсинг завершён", readonly=True, copy=False)
+    parse_failures = fields.Integer(
+        string="Неудачных попыток",
+        readonly=True,
+        copy=False,
+        help="Сколько запусков подряд не удалось загрузить следующую страницу поиска",
+    )
+    line_ids = fields.One2many(
+        "krisha.import.job.line",
+        "job_id",
+        string="Объявления",
+        copy=False,
+    )
+    line_count = fields.Integer(string="Объявлений", compute="_compute_progress")
+    done_count = fields.Integer(string="Импортировано", compute="_compute_progress")
+    failed_count = fields.Integer(string="Ошибок", compute="_compute_progress")
+    updated_count = fields.Integer(string="Обновлено", compute="_compute_progress")
+    unchanged_count = fields.Integer(
+        string="Без изменений",
+        readonly=True,
+        copy=False,
+        help="Уже импортированные объявления, отпечаток которых не изменился",
+    )
+    progress = fields.Float(string="Прогресс", compute="_compute_progress")
+    date_start = fields.Datetime(string="Запущен", readonly=True, copy=False)
+    date_done = fields.Datetime(string="Завершён", readonly=True, copy=False)
+    error = fields.Text(string="Ошибка", readonly=True, copy=False)
+
+    @api.depends("state", "last_page", "max_pages", "line_ids.state")
+    def _compute_progress(self):
+        counts = {
+            (job.id, state): count
+            for job, state, count in self.env["krisha.import.job.line"]._read_group(
+                [("job_id", "in", self.ids)],
+                groupby=["job_id", "state"],
+                aggregates=["__count"],
+            )
+        }
+        for job in self:
+            job.line_count = sum(
+                counts.get((job.id, state), 0)
+                for state in ("pending", "done", "updated", "unchanged", "duplicate", "failed")
+            )
+            job.done_count = counts.get((job.id, "done"), 0)
+            job.updated_count = counts.get((job.id, "updated"), 0)
+            job.failed_count = counts.get((job.id, "failed"), 0)
+            if job.state == "parse":
+                job.progress = 100.0 * job.last_page / job.max_pages if job.max_pages else 0.0
+            elif job.line_count:
+                pending = counts.get((job.id, "pending"), 0)
+                job.progress = 100.0 * (job.line_count - pending) / job.line_count
+            else:
+                job.progress = 100.0 if job.state == "done" else 0.0
+
+    def _get_parse_params(self) -> ParseParams:
+        self.ensure_one()
+        return ParseParams(
+            city=self.city,
+            rooms=self.rooms or "",
+            price_from=self.price_from or 0,
+            price_to=self.price_to or 0,
+            has_photo=self.has_photo,
+            owner=self.owner,
+        )
+
+    def action_start(self):
+        for job in self:
+            if job.state not in ("draft", "failed", "canceled"):
+                raise UserError(_("Задание «%s» уже запущено или завершено", job.name))
+            job.write({
+                "state": "import" if job.parse_done else "parse",
+                "date_start": fields.Datetime.now(),
+                "date_done": False,
+                "parse_failures": 0,
+                "error": False,
+            })
+        self.env.ref("royal_estate.ir_cron_krisha_import_job")._trigger()
+
+    def action_cancel(self):
+        self.filtered(lambda job: job.state in ("draft", "parse", "import")).write(
+            {"state": "canceled"}
+        )
+
+    def _get_form_action(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "current",
+        }
+
+    def action_view_properties(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": "estate.property",
+            "view_mode": "list,form",
+            "domain": [("id", "in", self.line_ids.property_id.ids)],
+            "name": _("Импортированные объекты"),
+        }
+
+    @api.model
+    def _cron_process_jobs(self, chunk_size=100, pages_per_run=5):
+        job = self.search([("state", "in", ("parse", "import"))], order="id", limit=1)
+        if not job:
+            return
+        job = job.with_user(job.user_id)
+        try:
+            if job.state == "parse":
+                done = job._process_parse_chunk(pages_per_run)
+            else:
+                done = job._process_import_chunk(chunk_size)
+        except Exception as e:
+            _logger.exception("Krisha import job %s failed", job.id)
+            self.env.cr.rollback()
+            job.write({"state": "failed", "error": str(e)})
+            # keep the failure visible even if the cron transaction is rolled back
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            done = 0
+        self.env["ir.cron"]._notify_progress(done=done, remaining=self._get_remaining_work())
+
+    @api.model
+    def _cron_schedule_nightly_sync(self):
+        for template in self.search([("nightly_sync", "=", True)]):
+            job = template.copy({
+                "name": _("%s (обновление)", template.name),
+                "mode": "sync",
+                "user_id": template.user_id.id,
+            })
+            job.action_start()
+
+    @api.model
+    def _get_remaining_work(self) -> int:
+        remaining = self.env["krisha.import.job.line"].search_count([
+            ("job_id.state", "=", "import"),
+            ("state", "=", "pending"),
+        ])
+        for job in self.search([("state", "=", "parse")]):
+            remaining += max(job.max_pages - job.last_page, 1)
+        return remaining
+
+    def _process_parse_chunk(self, pages_per_run: int) -> int:
+        self.ensure_one()
+        parser = self.env["krisha.listing.mixin"]._get_parser()
+        first_page = self.last_page + 1
+        last_page = min(self.max_pages, first_page + pages_per_run - 1)
+
+        Line = self.env["krisha.import.job.line"]
+        parsed = 0
+        try:
+            for page, items in parser.iter_pages(self._get_parse_params(), first_page, last_page):
+                Line.create(self._prepare_line_vals_list(items))
+                self.write({"last_page": page, "parse_failures": 0, "error": False})
+                parsed += 1
+                # every parsed page survives a worker restart
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        except KrishaCrawlError as e:
+            if self.parse_failures + 1 >= MAX_PARSE_FAILURES:
+                raise
+            # the next cron run resumes on the failed page
+            _logger.warning("Krisha import job %s: %s, will retry", self.id, e)
+            self.write({"parse_failures": self.parse_failures + 1, "error": str(e)})
+            return parsed
+
+        if self.last_page < last_page or self.last_page >= self.max_pages:
+            self.write({"state": "import", "parse_done": True})
+        return parsed
+
+    def _prepare_line_vals_list(self, items: list[KrishaProperty]) -> list[dict]:
+        self.ensure_one()
+        Line = self.env["krisha.import.job.line"]
+        existing = self.env["estate.property"]._get_krisha_fingerprints(
+            item.krisha_id for item in items
+        )
+        # adverts move to the next page when new ones are published
+        seen_ids = set(Line.search([
+            ("job_id", "=", self.id),
+            ("krisha_id", "in", [item.krisha_id for item in items if item.krisha_id]),
+        ]).mapped("krisha_id"))
+        vals_list = []
+        unchanged_count = 0
+        for item in items:
+            if item.krisha_id and item.krisha_id in seen_ids:
+                continue
+            seen_ids.add(item.krisha_id)
+            vals = {**Line._prepare_listing_vals(item), "job_id": self.id}
+            if item.krisha_id not in existing:
+                vals_list.append(vals)
+                continue
+            property_id, fingerprint = existing[item.krisha_id]
+            if self.mode != "sync":
+                vals_list.append({**vals, "state": "duplicate"})
+            elif fingerprint == item.fingerprint:
+                unchanged_count += 1
+            else:
+                vals_list.append({**vals, "property_id": property_id})
+        if unchanged_count:
+            self.unchanged_count += unchanged_count
+        return vals_list
+
+    def _process_import_chunk(self, chunk_size: int) -> int:
+        self.ensure_one()
+        lines = self.env["krisha.import.job.line"].search(
+            [("job_id", "=", self.id), ("state", "=", "pending")],
+            limit=chunk_size,
+        )
+        if not lines:
+            self.write({"state": "done", "date_done": fields.Datetime.now()})
+            return 0
+
+        # new adverts imported since the job was parsed (by another job or by hand)
+        existing_ids = self.env["estate.property"]._get_existing_krisha_ids(
+            lines.mapped("krisha_id")
+        )
+        duplicates = lines.filtered(
+            lambda line: not line.property_id and line.krisha_id in existing_ids
+        )
+        duplicates.write({"state": "duplicate"})
+        lines -= duplicates
+
+        pipeline = lines._get_import_pipeline()
+        city_mapping = lines._get_city_mapping()
+        for batch_lines, listings in lines._iter_import_batches(pipeline):
+            new_lines, new_listings = self.env["krisha.import.job.line"], []
+            for line, listing in zip(batch_lines, listings):
+                if line.property_id:
+                    line._sync_property(listing, city_mapping)
+                else:
+                    new_lines |= line
+                    new_listings.append(listing)
+            if new_lines:
+                new_lines._import_batch(new_listings, city_mapping)
+            # each imported batch is committed on its own
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+        _logger.info(
+            "Krisha import job %s: %d listings in %.1f s",
+            self.id,
+            len(lines),
+            pipeline.wall_time,
+        )
+        return len(lines)
+
+
+class KrishaImportJobLine(models.Model):
+    _name = "krisha.import.job.line"
+    _inherit = ["krisha.listing.mixin"]
+    _description = "Объявление фонового импорта Krisha.kz"
+    _order = "job_id, id"
+
+    job_id = fields.Many2one(
+        "krisha.import.job",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Ожидает"),
+            ("done", "Импортировано"),
+            ("updated", "Обновлено"),
+            ("unchanged", "Без изменений"),
+            ("duplicate", "Дубликат"),
+            ("failed", "Ошибка"),
+        ],
+        string="Статус",
+        required=True,
+        default="pending",
+        index=True,
+    )
+    property_id = fields.Many2one("estate.property", string="Объект", ondelete="set null")
+    error = fields.Text(string="Ошибка")
+
+    def _import_batch(self, listings, city_mapping):
+        try:
+            with self.env.cr.savepoint():
+                properties = self._create_properties(listings, city_mapping)
+        except Exception as e:
+            if len(self) == 1:
+                _logger.warning("Failed to import %s: %s", self.krisha_url, e)
+                self.write({"state": "failed", "error": str(e)})
+                return
+            # isolate the faulty advert(s) instead of failing the whole batch
+            for line, listing in zip(self, listings):
+                line._import_batch([listing], city_mapping)
+            return
+        for line, prop in zip(self, properties):
+            line.write({"state": "done", "property_id": prop.id, "error": False})
+
+    def _sync_property(self, listing, city_mapping):
+        """Write only the fields that changed on Krisha.kz to the already
+        imported property and add the photos it does not have yet."""
+        self.ensure_one()
+        if listing.details is None:
+            # never blank the description of an imported property
+            self.write({"state": "failed", "error": _("Не удалось загрузить объявление")})
+            return
+        prop = self.property_id
+        vals = self._prepare_property_vals(listing.details, city_mapping)
+        changes = {
+            name: vals[name]
+            for name in SYNC_FIELDS
+            if name in vals
+            and (prop._fields[name].convert_to_write(prop[name], prop) or False)
+            != (vals[name] or False)
+        }
+        # the description is compared to the one last read from Krisha.kz
+        # rather than to the current one, edited by the agents
+        if vals["krisha_description_hash"] != prop.krisha_description_hash:
+            changes["description"] = vals["description"]
+        try:
+            with self.env.cr.savepoint():
+                if changes:
+                    prop.write(changes)
+                prop.write({
+                    "krisha_fingerprint": vals["krisha_fingerprint"],
+                    "krisha_description_hash": vals["krisha_description_hash"],
+                    "krisha_synced_at": vals["krisha_synced_at"],
+                })
+                if listing.photos:
+                    images = self.env["estate.property.image"].create(
+                        self._prepare_image_vals_list(
+                            prop, listing, has_main=any(prop.image_ids.mapped("is_main"))
+                        )
+                    )
+                    images._set_image_from_files([photo for _i, _url, photo in listing.photos])
+        except Exception as e:
+            _logger.warning("Failed to update %s: %s", self.krisha_url, e)
+            self.write({"state": "failed", "error": str(e)})
+            return
+        updated = changes or listing.photos
+        self.write({"state": "updated" if updated else "unchanged", "error": False})
+
+    def _get_known_photo_urls(self) -> set[str]:
+        self.ensure_one()
+        return set(filter(None, self.property_id.image_ids.mapped("source_url")))
@@ -0,0 +1,222 @@
+import logging
+import os
+from typing import Any
+
+from odoo import api, fields, models
+from odoo.tools import config
+
+from ..services.http_cache import FileResponseCache
+from ..services.krisha_importer import ImportedListing, ImportTask, KrishaImportPipeline
+from ..services.krisha_parser import (
+    KrishaParser,
+    KrishaProperty,
+    listing_fingerprint,
+    text_hash,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class KrishaListingMixin(models.AbstractModel):
+    _name = "krisha.listing.mixin"
+    _description = "Объявление Krisha.kz"
+
+    krisha_id = fields.Integer(string="ID на Krisha")
+    krisha_url = fields.Char(string="URL")
+    title = fields.Char(string="Заголовок")
+    rooms = fields.Integer(string="Комнат")
+    area = fields.Float(string="Площадь")
+    floor = fields.Integer(string="Этаж")
+    floors_total = fields.Integer(string="Этажность")
+    price = fields.Integer(string="Цена")
+    city = fields.Char(string="Город")
+    address = fields.Char(string="Адрес")
+    latitude = fields.Float(string="Широта")
+    longitude = fields.Float(string="Долгота")
+    photo_url = fields.Char(string="Фото URL")
+    photo_urls_json = fields.Text(string="Все фото URLs")
+
+    @api.model
+    def _get_parser(self) -> KrishaParser:
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return KrishaParser(
+            max_workers=int(get_param("royal_estate.krisha_max_workers", 4)),
+            rate_limit=float(get_param("royal_estate.krisha_rate_limit", 2)),
+            max_per_host=int(get_param("royal_estate.krisha_max_per_host", 4)),
+            cache=self._get_response_cache(),
+            retries=int(get_param("royal_estate.krisha_retries", 3)),
+            backoff=float(get_param("royal_estate.krisha_retry_backoff", 1)),
+        )
+
+    @api.model
+    def _get_response_cache(self) -> FileResponseCache | None:
+        """Detail pages and photos cached on disk next to the filestore,
+        shared by the wizard, the import jobs and all workers."""
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        max_size_mb = int(get_param("royal_estate.krisha_cache_size_mb", 512))
+        if not max_size_mb:
+            return None
+        return FileResponseCache(
+            os.path.join(config["data_dir"], "krisha_cache", self.env.cr.dbname),
+            ttl=int(get_param("royal_estate.krisha_cache_ttl", 86400)),
+            max_size=max_size_mb * 1024 * 1024,
+        )
+
+    @api.model
+    def _get_import_pipeline(self) -> KrishaImportPipeline:
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return KrishaImportPipeline(
+            self._get_parser(),
+            max_workers=int(get_param("royal_estate.krisha_import_workers", 8)),
+        )
+
+    @api.model
+    def _prepare_listing_vals(self, item: KrishaProperty) -> dict[str, Any]:
+        return {
+            "krisha_id": item.krisha_id or False,
+            "krisha_url": item.url,
+            "title": item.title,
+            "rooms": item.rooms,
+            "area": item.area,
+            "floor": item.floor or False,
+            "floors_total": item.floors_total or False,
+            "price": item.price,
+            "city": item.city,
+            "address": item.address,
+            "latitude": item.latitude or False,
+            "longitude": item.longitude or False,
+            "photo_url": item.photo_urls[0] if item.photo_urls else "",
+            "photo_urls_json": ",".join(item.photo_urls),
+        }
+
+    def _get_listing_vals(self) -> dict[str, Any]:
+        self.ensure_one()
+        mixin_fields = self.env["krisha.listing.mixin"]._fields.values()
+        return {
+            field.name: self[field.name]
+            for field in mixin_fields
+            if field.store and not field.automatic
+        }
+
+    @api.model
+    def _get_city_mapping(self) -> dict[str, int]:
+        cities = self.env["estate.city"].search([])
+        mapping: dict[str, int] = {}
+        for city in cities:
+            mapping[city.name.lower()] = city.id
+            if city.code:
+                mapping[city.code.lower()] = city.id
+        return mapping
+
+    def _get_photo_urls(self) -> list[str]:
+        self.ensure_one()
+        return self.photo_urls_json.split(",") if self.photo_urls_json else []
+
+    def _get_krisha_fingerprint(self) -> str:
+        self.ensure_one()
+        return listing_fingerprint(self.price, self.area, self._get_photo_urls())
+
+    def _get_known_photo_urls(self) -> set[str]:
+        return set()
+
+    def _get_import_tasks(self) -> list[ImportTask]:
+        return [
+            ImportTask(
+                key=listing.id,
+                url=listing.krisha_url,
+                photo_urls=listing._get_photo_urls(),
+                known_photo_urls=listing._get_known_photo_urls(),
+            )
+            for listing in self
+        ]
+
+    def _prepare_property_vals(
+        self, details: KrishaProperty | None, city_mapping: dict[str, int]
+    ) -> dict[str, Any]:
+        self.ensure_one()
+        description = details.description if details else ""
+        property_vals = {
+            "name": self.title or f"{self.rooms}-комн. квартира, {self.area} м²",
+            "property_type": "apartment",
+            "deal_type": "sale",
+            "state": "new",
+            "rooms": self.rooms,
+            "area_total": self.area,
+            "floor": self.floor,
+            "floors_total": self.floors_total,
+            "price": self.price,
+            "krisha_url": self.krisha_url,
+            "krisha_id": self.krisha_id or False,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "description": description,
+            "krisha_fingerprint": self._get_krisha_fingerprint(),
+            "krisha_description_hash": text_hash(description),
+            "krisha_synced_at": fields.Datetime.now(),
+        }
+
+        city_id = city_mapping.get(self.city.lower()) if self.city else False
+        if city_id:
+            property_vals["city_id"] = city_id
+        return property_vals
+
+    @api.model
+    def _prepare_image_vals_list(self, prop, listing: ImportedListing, has_main: bool = False):
+        return [
+            {
+                "property_id": prop.id,
+                "name": f"Фото {i + 1}",
+                "source_url": url,
+                "sequence": i * 10,
+                "is_main": i == 0 and not has_main,
+            }
+            for i, url, _photo in listing.photos
+        ]
+
+    def _iter_import_batches(self, pipeline: KrishaImportPipeline):
+        """Run the pipeline over ``self`` and yield ``(records, listings)``
+        batches of completed adverts, ready for ``_create_properties``.
+
+        The photo spool files of a batch are deleted once it is processed.
+        """
+        batch_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("royal_estate.krisha_import_batch_size", 50)
+        )
+        with pipeline:
+            batch: list[ImportedListing] = []
+            for listing in pipeline.run(self._get_import_tasks()):
+                batch.append(listing)
+                if len(batch) >= batch_size:
+                    yield self.browse([item.key for item in batch]), batch
+                    for item in batch:
+                        item.release()
+                    batch = []
+            if batch:
+                yield self.browse([item.key for item in batch]), batch
+
+    def _create_properties(self, listings: list[ImportedListing], city_mapping: dict[str, int]):
+        """Create one property per record of ``self`` (same order as
+        ``listings``) and all their photos with a single ``create`` per model.
+
+        Tracking and chatter messages are disabled: an import is logged by
+        the job, not by thousands of "created" messages.
+        """
+        env = self.env(context=dict(self.env.context, tracking_disable=True))
+        properties = env["estate.property"].create([
+            record._prepare_property_vals(listing.details, city_mapping)
+            for record, listing in zip(self, listings)
+        ])
+
+        image_vals_list = []
+        for prop, listing in zip(properties, listings):
+            image_vals_list.extend(self._prepare_image_vals_list(prop, listing))
+        images = env["estate.property.image"].create(image_vals_list)
+        images._set_image_from_files([
+            photo for listing in listings for _i, _url, photo in listing.photos
+        ])
+        _logger.info(
+            "Created %d properties with %d photos", len(properties), len(image_vals_list)
+        )
+        return properties
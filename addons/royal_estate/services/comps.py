@@ -0,0 +1,139 @@
+import math
+from collections import defaultdict
+from collections.abc import Hashable, Iterable
+from dataclasses import astuple, dataclass
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_M
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180 / 1000
+
+CONDITION_LEVELS = {"no_repair": 0, "cosmetic": 1, "euro": 2, "designer": 3}
+
+# feature: (scale, weight); features are divided by their scale, so that a
+# difference of one scale counts for ``weight`` in the squared distance
+FEATURES = {
+    "x_km": (1.0, 3.0),
+    "y_km": (1.0, 3.0),
+    "rooms": (1.0, 2.0),
+    "log_area": (0.15, 2.0),  # ~15% larger or smaller
+    "floor": (3.0, 0.5),
+    "floors_total": (5.0, 0.5),
+    "year_built": (10.0, 1.0),
+    "condition": (1.0, 1.0),
+}
+BUILDING_TYPE_WEIGHT = 1.0
+# a squared scaled difference never counts more than this, and neither does
+# a feature unknown on the listing
+MAX_SQUARED = 4.0
+
+_SCALES = np.array([scale for scale, _weight in FEATURES.values()], dtype=np.float32)
+_WEIGHTS = np.array([weight for _scale, weight in FEATURES.values()], dtype=np.float32)
+
+
+@dataclass(slots=True, frozen=True)
+class CompsFeatures:
+    latitude: float = 0.0
+    longitude: float = 0.0
+    rooms: int = 0
+    area: float = 0.0
+    floor: int = 0
+    floors_total: int = 0
+    year_built: int = 0
+    building_type: str | None = None
+    condition: str | None = None
+
+
+def feature_matrix(rows: list[tuple]) -> np.ndarray:
+    """Scaled values of :data:`FEATURES` of ``rows`` of
+    :class:`CompsFeatures` fields, NaN where unknown (0 or empty)."""
+    columns = np.array([row[:7] for row in rows], dtype=np.float64).reshape(-1, 7)
+    latitude, longitude, rooms, area, floor, floors_total, year_built = (
+        np.where(columns == 0, np.nan, columns).T
+    )
+    condition = np.array(
+        [CONDITION_LEVELS.get(row[8], np.nan) for row in rows], dtype=np.float64
+    )
+    with np.errstate(invalid="ignore"):
+        log_area = np.log(np.where(area > 0, area, np.nan))
+    matrix = np.column_stack([
+        longitude * KM_PER_DEGREE * np.cos(np.radians(latitude)),
+        latitude * KM_PER_DEGREE,
+        rooms,
+        log_area,
+        floor,
+        floors_total,
+        year_built,
+        condition,
+    ])
+    return (matrix / _SCALES).astype(np.float32)
+
+
+class CompsIndex:
+    """Normalized feature matrices of listings, one per segment (e.g.
+    property and deal type), scored against a query all at once.
+
+    The distance of a listing is the weighted sum of its squared scaled
+    differences to the query over the features known on the query, plus
+    a fixed cost when the building types differ.
+    """
+
+    def __init__(self, rows: Iterable[tuple]):
+        """``rows``: ``(listing id, segment, *CompsFeatures fields)``."""
+        segments = defaultdict(list)
+        for row in rows:
+            segments[row[1]].append(row)
+        self._building_codes: dict[str, int] = {}
+        self._segments = {
+            segment: (
+                np.array([row[0] for row in segment_rows], dtype=np.int64),
+                feature_matrix([row[2:] for row in segment_rows]),
+                np.array(
+                    [self._building_code(row[9]) for row in segment_rows], dtype=np.int16
+                ),
+            )
+            for segment, segment_rows in segments.items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids, _matrix, _buildings in self._segments.values())
+
+    def _building_code(self, building_type: str | None) -> int:
+        if not building_type:
+            return -1
+        return self._building_codes.setdefault(building_type, len(self._building_codes))
+
+    def query(
+        self,
+        segment: Hashable,
+        features: CompsFeatures,
+        limit: int = 10,
+        exclude: Iterable[int] = (),
+    ) -> list[tuple[int, float]]:
+        """``(listing id, distance)`` of the ``limit`` listings of
+        ``segment`` closest to ``features``, closest first."""
+        if segment not in self._segments:
+            return []
+        ids, matrix, buildings = self._segments[segment]
+        query = feature_matrix([astuple(features)])[0]
+        known = ~np.isnan(query)
+        # fmin ignores NaN: unknown listing values count as MAX_SQUARED
+        squared = np.fmin(np.square(matrix[:, known] - query[known]), MAX_SQUARED)
+        distances = squared @ _WEIGHTS[known]
+        if features.building_type:
+            code = self._building_codes.get(features.building_type, -2)
+            distances += BUILDING_TYPE_WEIGHT * (buildings != code)
+        exclude = list(exclude)
+        if exclude:
+            distances[np.isin(ids, exclude)] = np.inf
+        limit = min(limit, len(ids))
+        if limit <= 0:
+            return []
+        top = np.argpartition(distances, limit - 1)[:limit]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [
+            (int(ids[i]), math.sqrt(float(distances[i])))
+            for i in top
+            if np.isfinite(distances[i])
+        ]
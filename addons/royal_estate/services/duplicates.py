@@ -0,0 +1,124 @@
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import chain, islice
+
+from .geo import haversine_m
+
+# listings of the same flat are compared when their areas fall in the same
+# or in adjacent buckets
+AREA_BUCKET_M2 = 5.0
+
+AREA_TOLERANCE = 0.10
+PRICE_TOLERANCE = 0.15
+DISTANCE_TOLERANCE_M = 300.0
+
+WEIGHTS = {
+    "area": 0.20,
+    "price": 0.15,
+    "floor": 0.20,
+    "location": 0.25,
+    "photos": 0.20,
+}
+# below this many comparable criteria a pair is never reported
+MIN_CRITERIA = 3
+
+
+@dataclass(slots=True)
+class ListingFeatures:
+    id: int
+    property_type: str
+    deal_type: str
+    district_id: int
+    rooms: int
+    area: float
+    price: float = 0.0
+    floor: int = 0
+    floors_total: int = 0
+    latitude: float = 0.0
+    longitude: float = 0.0
+    photo_hashes: frozenset = field(default_factory=frozenset)
+
+    def block_key(self) -> tuple:
+        return (
+            self.property_type,
+            self.deal_type,
+            self.district_id,
+            self.rooms,
+            int(self.area // AREA_BUCKET_M2),
+        )
+
+
+def _closeness(a: float, b: float, tolerance: float) -> float | None:
+    if not a or not b:
+        return None
+    return max(0.0, 1.0 - abs(a - b) / max(a, b) / tolerance)
+
+
+def photo_overlap(a: frozenset, b: frozenset) -> float | None:
+    """Share of the photos of the smaller set found in the other one."""
+    if not a or not b:
+        return None
+    return len(a & b) / min(len(a), len(b))
+
+
+def score_pair(
+    a: ListingFeatures,
+    b: ListingFeatures,
+    photo_similarity: Callable[[frozenset, frozenset], float | None] = photo_overlap,
+) -> tuple[float, dict[str, float]]:
+    """Weighted similarity of two listings in [0, 1] and the score of each
+    criterion; criteria unknown on either side are left out."""
+    scores = {}
+    if (area := _closeness(a.area, b.area, AREA_TOLERANCE)) is not None:
+        scores["area"] = area
+    if (price := _closeness(a.price, b.price, PRICE_TOLERANCE)) is not None:
+        scores["price"] = price
+    if a.floor and b.floor:
+        if a.floor != b.floor:
+            scores["floor"] = 0.0
+        elif a.floors_total and b.floors_total and a.floors_total != b.floors_total:
+            scores["floor"] = 0.5
+        else:
+            scores["floor"] = 1.0
+    if (a.latitude or a.longitude) and (b.latitude or b.longitude):
+        distance = haversine_m(a.latitude, a.longitude, b.latitude, b.longitude)
+        scores["location"] = max(0.0, 1.0 - distance / DISTANCE_TOLERANCE_M)
+    if (photos := photo_similarity(a.photo_hashes, b.photo_hashes)) is not None:
+        scores["photos"] = photos
+    if len(scores) < MIN_CRITERIA:
+        return 0.0, scores
+    total_weight = sum(WEIGHTS[name] for name in scores)
+    score = sum(WEIGHTS[name] * value for name, value in scores.items()) / total_weight
+    # the same photos are the strongest evidence whatever the other criteria
+    if scores.get("photos", 0.0) >= 0.5:
+        score = max(score, scores["photos"])
+    return score, scores
+
+
+def find_duplicates(
+    listings: Iterable[ListingFeatures],
+    threshold: float,
+    photo_similarity: Callable[[frozenset, frozenset], float | None] = photo_overlap,
+    only_ids: set[int] | None = None,
+) -> Iterator[tuple[int, int, float, dict[str, float]]]:
+    """Yield ``(id, other_id, score, scores)`` of the pairs scoring at least
+    ``threshold``, with ``id < other_id``.
+
+    Listings are only compared within their block (same type, deal,
+    district and rooms, close areas) instead of all against all. With
+    ``only_ids``, only the pairs involving one of them are scored.
+    """
+    blocks = defaultdict(list)
+    for listing in listings:
+        blocks[listing.block_key()].append(listing)
+    for key, block in blocks.items():
+        next_block = blocks.get((*key[:-1], key[-1] + 1), [])
+        for i, a in enumerate(block):
+            for b in chain(islice(block, i + 1, None), next_block):
+                if only_ids is not None and a.id not in only_ids and b.id not in only_ids:
+                    continue
+                score, scores = score_pair(a, b, photo_similarity)
+                if score >= threshold:
+                    first, second = (a, b) if a.id < b.id else (b, a)
+                    yield first.id, second.id, score, scores
@@ -0,0 +1,180 @@
+import math
+from collections.abc import Iterator
+
+EARTH_RADIUS_M = 6371008.8
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+GEOHASH_PRECISION = 9
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard geohash of a point: the longer the common prefix of two
+    hashes, the smaller the cell containing both points."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        target, point = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (target[0] + target[1]) / 2
+        value <<= 1
+        if point >= mid:
+            value |= 1
+            target[0] = mid
+        else:
+            target[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> tuple[float, float]:
+    """``(height, width)`` in degrees of a geohash cell."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def bounding_box(latitude: float, longitude: float, radius_m: float) -> tuple[float, float, float, float]:
+    """``(min_lat, min_lon, max_lat, max_lon)`` of the circle."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat)), 180.0)
+    return latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+
+
+def geohash_cover(latitude: float, longitude: float, radius_m: float) -> list[str]:
+    """Geohash prefixes of the cells covering the circle.
+
+    The longest precision whose cells are at least as large as the
+    bounding box is used, so that a handful of cells (at most 9) is enough.
+    """
+    min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_m)
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        height, width = geohash_cell_size(precision)
+        if height >= max_lat - min_lat and width >= max_lon - min_lon:
+            break
+        precision -= 1
+    height, width = geohash_cell_size(precision)
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(geohash_encode(max(min(lat, 90.0), -90.0), _wrap_longitude(lon), precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + width, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return sorted(cells)
+
+
+def _wrap_longitude(longitude: float) -> float:
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+Ring = list[tuple[float, float]]
+Polygon = list[Ring]
+
+
+def geojson_polygons(geometry: dict) -> list[Polygon]:
+    """Polygons of a GeoJSON Polygon or MultiPolygon (or of a Feature of
+    one), as lists of ``(longitude, latitude)`` rings, holes included."""
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry.get('type')!r}")
+    result = []
+    for polygon in polygons:
+        rings = [[(float(p[0]), float(p[1])) for p in ring] for ring in polygon]
+        if not rings or len(rings[0]) < 3:
+            raise ValueError("A polygon needs at least 3 points")
+        result.append(rings)
+    return result
+
+
+def point_in_polygon(longitude: float, latitude: float, polygon: Polygon) -> bool:
+    """Even-odd rule over all the rings: points in a hole are outside."""
+    inside = False
+    for ring in polygon:
+        x1, y1 = ring[-1]
+        for x2, y2 in ring:
+            if (y1 > latitude) != (y2 > latitude) and (
+                longitude < (x2 - x1) * (latitude - y1) / (y2 - y1) + x1
+            ):
+                inside = not inside
+            x1, y1 = x2, y2
+    return inside
+
+
+class PolygonIndex:
+    """Finds the polygon containing a point among many, without a database.
+
+    The bounding boxes of the polygons are registered in a uniform grid
+    whose cells are about the size of an average polygon, so that a lookup
+    only tests the exact point-in-polygon of a few candidates.
+    """
+
+    def __init__(self, polygons: dict):
+        """``polygons`` maps the key returned by :meth:`locate` to a list of
+        polygons (see :func:`geojson_polygons`)."""
+        self._entries = []
+        for key, key_polygons in polygons.items():
+            for polygon in key_polygons:
+                xs = [x for x, _y in polygon[0]]
+                ys = [y for _x, y in polygon[0]]
+                self._entries.append((key, polygon, (min(xs), min(ys), max(xs), max(ys))))
+        if self._entries:
+            sizes = [max(b[2] - b[0], b[3] - b[1]) for _k, _p, b in self._entries]
+            self.cell_size = max(sum(sizes) / len(sizes), 1e-6)
+        else:
+            self.cell_size = 1.0
+        self._grid: dict[tuple[int, int], list[int]] = {}
+        for i, (_key, _polygon, (min_x, min_y, max_x, max_y)) in enumerate(self._entries):
+            for cx in range(self._cell(min_x), self._cell(max_x) + 1):
+                for cy in range(self._cell(min_y), self._cell(max_y) + 1):
+                    self._grid.setdefault((cx, cy), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def locate_all(self, longitude: float, latitude: float) -> Iterator:
+        """Yield the key of each polygon containing the point, once per
+        polygon: overlapping polygons of different keys are all found."""
+        for i in self._grid.get((self._cell(longitude), self._cell(latitude)), ()):
+            key, polygon, (min_x, min_y, max_x, max_y) = self._entries[i]
+            if (
+                min_x <= longitude <= max_x
+                and min_y <= latitude <= max_y
+                and point_in_polygon(longitude, latitude, polygon)
+            ):
+                yield key
+
+    def locate(self, longitude: float, latitude: float):
+        """Key of the first polygon containing the point, ``None`` if none."""
+        return next(self.locate_all(longitude, latitude), None)
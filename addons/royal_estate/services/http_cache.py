@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    content: bytes
+    etag: str | None = None
+    last_modified: str | None = None
+    encoding: str | None = None
+    stored_at: float = field(default_factory=time.time)
+    # data parsed from ``content``, dropped whenever the content changes,
+    # and the version of the parser that produced it
+    parsed: Any = None
+    parsed_version: int | None = None
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(Protocol):
+    """Response cache used by ``KrishaParser``.
+
+    Responses younger than ``ttl`` seconds are served without a request,
+    older ones are revalidated with ``If-None-Match``/``If-Modified-Since``.
+    """
+
+    ttl: float
+
+    def get(self, url: str) -> CachedResponse | None: ...
+
+    def set(self, url: str, response: CachedResponse) -> None: ...
+
+
+class FileResponseCache:
+    """Response cache in a directory, shared by threads and processes.
+
+    Each URL is stored as ``<sha1>.body`` with its headers in
+    ``<sha1>.json``. Reads bump the mtime of the body so that, once the
+    directory outgrows ``max_size`` bytes, the least recently used entries
+    are evicted first.
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400, max_size: int = 512 * 1024 * 1024):
+        self.ttl = ttl
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._size: int | None = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str, ext: str) -> str:
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def get(self, url: str) -> CachedResponse | None:
+        body_path = self._path(url, "body")
+        try:
+            with open(self._path(url, "json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                content = f.read()
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or len(content) != meta.get("size"):
+            # hash collision or an entry being rewritten by another worker
+            return None
+        return CachedResponse(
+            content=content,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            encoding=meta.get("encoding"),
+            stored_at=meta.get("stored_at", 0.0),
+            parsed=meta.get("parsed"),
+            parsed_version=meta.get("parsed_version"),
+        )
+
+    def set(self, url: str, response: CachedResponse) -> None:
+        meta = {
+            "url": url,
+            "size": len(response.content),
+            "etag": response.etag,
+            "last_modified": response.last_modified,
+            "encoding": response.encoding,
+            "stored_at": response.stored_at,
+            "parsed": response.parsed,
+            "parsed_version": response.parsed_version,
+        }
+        body_path = self._path(url, "body")
+        try:
+            old_size = os.path.getsize(body_path)
+        except OSError:
+            old_size = 0
+        try:
+            self._write(body_path, response.content)
+            self._write(self._path(url, "json"), json.dumps(meta).encode())
+        except OSError as e:
+            _logger.warning("Failed to cache %s: %s", url, e)
+            return
+        self._grow(len(response.content) - old_size)
+
+    def _write(self, path: str, data: bytes) -> None:
+        # write aside and rename, readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+    def _grow(self, delta: int) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _mtime, size, _path in self._scan())
+            else:
+                self._size += delta
+            if self._size > self.max_size:
+                self._evict()
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".body"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        # evict down to 90% so that the next writes do not rescan at once
+        target = self.max_size * 0.9
+        entries = sorted(self._scan())
+        size = sum(entry[1] for entry in entries)
+        for _mtime, entry_size, body_path in entries:
+            if size <= target:
+                break
+            for path in (body_path, body_path[: -len("body")] + "json"):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            size -= entry_size
+        _logger.info("Krisha response cache evicted down to %d bytes", size)
+        self._size = size
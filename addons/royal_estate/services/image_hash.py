@@ -0,0 +1,58 @@
+import io
+
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+# the 64-bit hash is split in bands of 16 bits, each stored in an indexed
+# column: hashes differing by at most BANDS - 1 bits share at least one band
+BANDS = 4
+BAND_BITS = HASH_SIZE * HASH_SIZE // BANDS
+# two photos are considered the same below this Hamming distance
+MAX_DISTANCE = BANDS - 1
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash of ``image``: one bit per pixel of a 9×8
+    grayscale thumbnail, set when it is brighter than its right neighbour.
+    Resized, re-encoded or slightly retouched copies keep (almost) the
+    same bits."""
+    if image.format == "JPEG":
+        # let the decoder scale down by up to 8, a full decode is not needed
+        image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+    image = ImageOps.exif_transpose(image).convert("L")
+    pixels = image.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).load()
+    value = 0
+    for y in range(HASH_SIZE):
+        for x in range(HASH_SIZE):
+            value = value << 1 | (pixels[x, y] > pixels[x + 1, y])
+    return value
+
+
+def image_dhash(source: bytes | str) -> int | None:
+    """:func:`dhash` of the image content or file path ``source``, None
+    when it is not a readable image."""
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return dhash(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def hash_bands(value: int) -> list[int]:
+    return [(value >> (BAND_BITS * i)) & ((1 << BAND_BITS) - 1) for i in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def perceptual_overlap(a: frozenset, b: frozenset) -> float | None:
+    """Share of the photos of the smaller set with a near copy in the other
+    one, the sets holding :func:`dhash` values."""
+    if not a or not b:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(
+        any(hamming(value, other) <= MAX_DISTANCE for other in b) for value in a
+    ) / len(a)
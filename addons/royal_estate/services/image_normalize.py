@@ -0,0 +1,43 @@
+import io
+
+from PIL import Image, ImageOps
+
+from .image_renditions import flatten
+
+MAX_EDGE = 2560
+QUALITY = 85
+
+
+def normalize(image: Image.Image, max_edge: int = MAX_EDGE, quality: int = QUALITY) -> bytes:
+    """JPEG of ``image`` turned upright according to its EXIF orientation,
+    its longest edge capped to ``max_edge`` and without metadata. Only the
+    color profile is kept."""
+    if image.format == "JPEG":
+        # let the decoder scale down by up to 8, a full decode is not needed
+        image.draft("RGB", (max_edge, max_edge))
+    icc_profile = image.info.get("icc_profile")
+    image = flatten(image)
+    if image.width > max_edge or image.height > max_edge:
+        image = ImageOps.contain(image, (max_edge, max_edge), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        "JPEG",
+        quality=quality,
+        optimize=True,
+        progressive=True,
+        icc_profile=icc_profile,
+    )
+    return buffer.getvalue()
+
+
+def normalize_image(
+    source: bytes | str, max_edge: int = MAX_EDGE, quality: int = QUALITY
+) -> bytes | None:
+    """:func:`normalize` of the image content or file path ``source``, None
+    when it is not a readable image."""
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return normalize(image, max_edge, quality)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
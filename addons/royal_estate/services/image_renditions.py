@@ -0,0 +1,66 @@
+import io
+
+from PIL import Image, ImageOps
+
+# name: (bounding box, crop to it); the thumbnail is twice the 150 px of the
+# gallery for high-density screens
+RENDITIONS = {
+    "large": ((1920, 1920), False),
+    "medium": ((1024, 1024), False),
+    "thumb": ((300, 300), True),
+}
+# bump when RENDITIONS or the encoding change, the cron regenerates them
+RENDITIONS_VERSION = 1
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def _encode(image: Image.Image, format: str) -> bytes:
+    buffer = io.BytesIO()
+    if format == "WEBP":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def flatten(image: Image.Image) -> Image.Image:
+    """``image`` upright and in RGB, transparent areas made white."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render(image: Image.Image) -> dict[str, tuple[bytes, bytes]]:
+    """``(JPEG, WebP)`` content of each of :data:`RENDITIONS` of ``image``,
+    never enlarged. Each rendition is resized from the previous (larger)
+    one."""
+    if image.format == "JPEG":
+        # let the decoder scale down by up to 8, a full decode is not needed
+        image.draft("RGB", max(size for size, _crop in RENDITIONS.values()))
+    image = flatten(image)
+    result = {}
+    for name, (size, crop) in RENDITIONS.items():
+        if crop:
+            size = (min(size[0], image.width), min(size[1], image.height))
+            rendition = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            if image.width > size[0] or image.height > size[1]:
+                image = ImageOps.contain(image, size, Image.Resampling.LANCZOS)
+            rendition = image
+        result[name] = (_encode(rendition, "JPEG"), _encode(rendition, "WEBP"))
+    return result
+
+
+def image_renditions(source: bytes | str) -> dict[str, tuple[bytes, bytes]] | None:
+    """:func:`render` of the image content or file path ``source``, None
+    when it is not a readable image."""
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return render(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
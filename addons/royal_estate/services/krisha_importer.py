@@ -0,0 +1,152 @@
+import logging
+import shutil
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any
+
+from .krisha_parser import KrishaParser, KrishaProperty, PhotoFile
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportTask:
+    key: Any
+    url: str
+    photo_urls: list[str] = field(default_factory=list)
+    # photos already stored for this advert, they are not downloaded again
+    known_photo_urls: set[str] = field(default_factory=set)
+
+
+@dataclass
+class ImportedListing:
+    key: Any
+    # None when the detail page could not be fetched or parsed
+    details: KrishaProperty | None
+    # (position in the advert, url, spool file)
+    photos: list[tuple[int, str, PhotoFile]] = field(default_factory=list)
+
+    def release(self) -> None:
+        """Delete the spool files of the photos once they are stored."""
+        for _i, _url, photo in self.photos:
+            photo.release()
+
+
+class KrishaImportPipeline:
+    """Downloads detail pages and photos of many listings in worker threads.
+
+    Detail pages and photos share one bounded pool: as soon as the detail
+    page of a listing is parsed, its photos are queued. Completed listings
+    are yielded to the calling thread, which keeps all ORM work on its own
+    cursor.
+
+    Photos are streamed to spool files in a directory owned by the
+    pipeline, use it as a context manager so that the directory is removed
+    with whatever photos were not released.
+    """
+
+    def __init__(self, parser: KrishaParser, max_workers: int = 8, max_photos: int = 10):
+        self.parser = parser
+        self.max_workers = max(1, max_workers)
+        self.max_photos = max_photos
+        self.wall_time = 0.0
+        self._spool_dir: str | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def spool_dir(self) -> str:
+        if self._spool_dir is None:
+            self._spool_dir = tempfile.mkdtemp(prefix="krisha_photos_")
+        return self._spool_dir
+
+    def close(self) -> None:
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+
+    def run(self, tasks: Iterable[ImportTask]) -> Iterator[ImportedListing]:
+        start = time.monotonic()
+        pending: dict[Any, ImportedListing] = {}
+        remaining_photos: dict[Any, int] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="krisha_import"
+        ) as executor:
+            in_flight = {}
+            task_iter = iter(tasks)
+            details_in_flight = 0
+
+            def submit_details():
+                # Detail pages are only queued up to the pool size so that
+                # photos of already parsed listings are not starved.
+                nonlocal details_in_flight
+                while details_in_flight < self.max_workers:
+                    task = next(task_iter, None)
+                    if task is None:
+                        return
+                    future = executor.submit(self.parser.fetch_property_details, task.url)
+                    in_flight[future] = ("details", task, None)
+                    details_in_flight += 1
+
+            submit_details()
+            while in_flight:
+                done, _not_done = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, task, photo = in_flight.pop(future)
+                    if kind == "details":
+                        details_in_flight -= 1
+                        listing = self._on_details(task, future)
+                        all_photo_urls = task.photo_urls
+                        if listing.details and listing.details.photo_urls:
+                            all_photo_urls = listing.details.photo_urls
+                        photo_urls = [
+                            (i, url)
+                            for i, url in enumerate(all_photo_urls[: self.max_photos])
+                            if url and url not in task.known_photo_urls
+                        ]
+                        if not photo_urls:
+                            yield listing
+                            continue
+                        pending[task.key] = listing
+                        remaining_photos[task.key] = len(photo_urls)
+                        for i, photo_url in photo_urls:
+                            photo_future = executor.submit(
+                                self.parser.download_image_to, photo_url, self.spool_dir
+                            )
+                            in_flight[photo_future] = ("photo", task, (i, photo_url))
+                    else:
+                        listing = pending[task.key]
+                        photo_file = self._on_photo(future)
+                        if photo_file:
+                            listing.photos.append((*photo, photo_file))
+                        remaining_photos[task.key] -= 1
+                        if not remaining_photos[task.key]:
+                            del pending[task.key], remaining_photos[task.key]
+                            listing.photos.sort(key=lambda photo: photo[0])
+                            yield listing
+                submit_details()
+
+        self.wall_time = time.monotonic() - start
+
+    def _on_details(self, task: ImportTask, future) -> ImportedListing:
+        try:
+            details = future.result()
+        except Exception as e:
+            _logger.warning("Failed to fetch details for %s: %s", task.url, e)
+            details = None
+        return ImportedListing(key=task.key, details=details)
+
+    def _on_photo(self, future) -> PhotoFile | None:
+        try:
+            return future.result()
+        except Exception as e:
+            _logger.warning("Failed to download image: %s", e)
+            return None
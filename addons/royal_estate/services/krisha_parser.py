@@ -1,35 +1,157 @@
+import hashlib
 import json
 import logging
+import os
 import re
-from dataclasses import dataclass
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
 from typing import Any
 from urllib.parse import urlencode
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from .http_cache import CachedResponse, ResponseCache
+from .throttle import HostConnectionLimiter, HostRateLimiter, PageCutoff
 
 _logger = logging.getLogger(__name__)
 
 BASE_URL = "https://krisha.kz"
 SEARCH_URL = f"{BASE_URL}/prodazha/kvartiry/"
 
-
-@dataclass
+KRISHA_CITIES = [
+    ("almaty", "Алматы"),
+    ("astana", "Астана"),
+    ("shymkent", "Шымкент"),
+    ("aktau", "Актау"),
+    ("aktobe", "Актобе"),
+    ("atyrau", "Атырау"),
+    ("karaganda", "Караганда"),
+    ("kokshetau", "Кокшетау"),
+    ("kostanay", "Костанай"),
+    ("kyzylorda", "Кызылорда"),
+    ("mangystau", "Мангистауская область"),
+    ("pavlodar", "Павлодар"),
+    ("petropavlovsk", "Петропавловск"),
+    ("semey", "Семей"),
+    ("taldykorgan", "Талдыкорган"),
+    ("taraz", "Тараз"),
+    ("turkestan", "Туркестан"),
+    ("uralsk", "Уральск"),
+    ("ust-kamenogorsk", "Усть-Каменогорск"),
+]
+
+
+# bump when the fields of KrishaProperty change: the details cached by the
+# parser are parsed again instead of being read into the new fields
+DETAILS_VERSION = 1
+
+
+@dataclass(slots=True)
 class KrishaProperty:
-    krisha_id: int
+    """An advert as read from Krisha.kz, from a listing or a detail page."""
+
+    krisha_id: int | None
     url: str
-    title: str
-    rooms: int
-    area: float
-    floor: int
-    floors_total: int
-    price: int
-    city: str
-    address: str
-    latitude: float | None
-    longitude: float | None
-    description: str
-    photo_urls: list[str]
+    title: str = ""
+    rooms: int = 0
+    area: float = 0.0
+    floor: int | None = None
+    floors_total: int | None = None
+    price: int = 0
+    city: str = ""
+    address: str = ""
+    latitude: float | None = None
+    longitude: float | None = None
+    description: str = ""
+    photo_urls: list[str] = field(default_factory=list)
+
+    @property
+    def fingerprint(self) -> str:
+        return listing_fingerprint(self.price, self.area, self.photo_urls)
+
+
+def text_hash(text: str | None) -> str:
+    return hashlib.sha1((text or "").encode()).hexdigest()
+
+
+def listing_fingerprint(price: Any, area: Any, photo_urls: list[str]) -> str:
+    """Fingerprint of what the search listing shows for an advert.
+
+    A changed fingerprint means the advert must be re-fetched.
+    """
+    photos_hash = text_hash("\n".join(photo_urls))
+    return text_hash(f"{int(price or 0)}|{float(area or 0):.2f}|{photos_hash}")
+
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# answers worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class KrishaCrawlError(Exception):
+    """A search page could not be fetched, even after retries.
+
+    The pages before ``page`` have been yielded: a rerun can resume there.
+    """
+
+    def __init__(self, page: int, error: Exception):
+        super().__init__(f"page {page}: {error}")
+        self.page = page
+        self.error = error
+
+
+_JSON_DECODER = json.JSONDecoder()
+# anchored on the assignment: a bare "window.data" also matches window.dataLayer
+_JSDATA_ASSIGNMENT = re.compile(r"window\.(?:data|__DATA__)\s*=")
+
+
+def extract_jsdata(html: str) -> dict[str, Any] | None:
+    """Decode the ``window.data`` JSON of the ``<script id="jsdata">`` tag.
+
+    The raw page is scanned with ``str.find`` and the assignment regex, and
+    the JSON decoded in place with ``raw_decode``: no DOM is built and the
+    rest of the page (most of it) is never looked at.
+    """
+    pos = html.find('id="jsdata"')
+    if pos < 0:
+        pos = html.find("id='jsdata'")
+        if pos < 0:
+            return None
+    end = html.find("</script>", pos)
+    if end < 0:
+        end = len(html)
+    for assignment in _JSDATA_ASSIGNMENT.finditer(html, pos, end):
+        start = html.find("{", assignment.end(), end)
+        if start < 0:
+            continue
+        try:
+            data, _end = _JSON_DECODER.raw_decode(html, start)
+        except json.JSONDecodeError as e:
+            _logger.warning("Failed to parse jsdata: %s", e)
+            return None
+        return data if isinstance(data, dict) else None
+    return None
+
+
+@dataclass(slots=True)
+class PhotoFile:
+    """A photo downloaded to a local spool file, ready to be stored."""
+
+    path: str
+    checksum: str  # sha1, as ir.attachment computes it
+    size: int
+
+    def release(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
 
 
 @dataclass
@@ -41,9 +163,23 @@ class ParseParams:
     has_photo: bool = True
     owner: bool = False
 
+    def signature(self) -> str:
+        """Stable key of a search, whatever the number of pages crawled."""
+        return text_hash(json.dumps(asdict(self), sort_keys=True))
+
 
 class KrishaParser:
-    def __init__(self, timeout: int = 30):
+    def __init__(
+        self,
+        timeout: int = 30,
+        base_url: str = BASE_URL,
+        max_workers: int = 1,
+        rate_limit: float = 0.0,
+        max_per_host: int = 0,
+        cache: ResponseCache | None = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": (
@@ -55,9 +191,21 @@ class KrishaParser:
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
         })
         self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.connection_limiter = HostConnectionLimiter(max_per_host)
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        pool_size = max(self.max_workers, max_per_host)
+        if pool_size > 1:
+            adapter = HTTPAdapter(pool_maxsize=pool_size)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
 
     def build_search_url(self, params: ParseParams, page: int = 1) -> str:
-        city_url = f"{BASE_URL}/prodazha/kvartiry/{params.city}/"
+        city_url = f"{self.base_url}/prodazha/kvartiry/{params.city}/"
 
         query_params: dict[str, Any] = {}
 
@@ -83,59 +231,46 @@ class KrishaParser:
             return f"{city_url}?{urlencode(query_params)}"
         return city_url
 
-    def parse_listing_page(self, html: str) -> list[dict[str, Any]]:
-        soup = BeautifulSoup(html, "html.parser")
-        items: list[dict[str, Any]] = []
-
-        script_tag = soup.find("script", {"id": "jsdata"})
-        if script_tag and script_tag.string:
-            try:
-                # Try both old and new formats
-                match = re.search(r"window\.(?:__DATA__|data)\s*=\s*(\{.+\})", script_tag.string)
-                if match:
-                    data = json.loads(match.group(1))
-                    adverts = data.get("adverts", [])
-                    for advert in adverts:
-                        items.append(self._parse_advert(advert))
-            except (json.JSONDecodeError, KeyError) as e:
-                _logger.warning("Failed to parse jsdata: %s", e)
-
-        if not items:
-            items = self._parse_html_fallback(soup)
-
-        return items
+    def parse_listing_page(self, html: str) -> list[KrishaProperty]:
+        data = extract_jsdata(html)
+        if data is not None:
+            return [self._parse_advert(advert) for advert in data.get("adverts") or []]
+        return self._parse_html_fallback(BeautifulSoup(html, "html.parser"))
 
-    def _parse_advert(self, advert: dict[str, Any]) -> dict[str, Any]:
-        photos = advert.get("photos", [])
+    def _parse_advert(self, advert: dict[str, Any], detail: bool = False) -> KrishaProperty:
         photo_urls = [
-            photo.get("src", "").replace("-thumb", "-full")
-            for photo in photos
+            photo["src"].replace("-thumb", "-full")
+            for photo in advert.get("photos") or ()
             if photo.get("src")
         ]
 
-        map_data = advert.get("map", {})
+        map_data = advert.get("map") or {}
         lat = map_data.get("lat")
         lon = map_data.get("lon")
 
-        return {
-            "krisha_id": advert.get("id"),
-            "url": f"{BASE_URL}/a/show/{advert.get('id')}",
-            "title": advert.get("title", ""),
-            "rooms": self._extract_rooms(advert.get("title", "")),
-            "area": self._extract_area(advert.get("square")),
-            "floor": advert.get("floor"),
-            "floors_total": advert.get("floorCount"),
-            "price": advert.get("price"),
-            "city": advert.get("city", {}).get("title", ""),
-            "address": advert.get("address", ""),
-            "latitude": float(lat) if lat else None,
-            "longitude": float(lon) if lon else None,
-            "description": "",
-            "photo_urls": photo_urls,
-        }
-
-    def _parse_html_fallback(self, soup: BeautifulSoup) -> list[dict[str, Any]]:
-        items: list[dict[str, Any]] = []
+        title = advert.get("title") or ""
+        address = advert.get("address") or ""
+        if detail:
+            address = advert.get("addressTitle") or address
+        return KrishaProperty(
+            krisha_id=advert.get("id"),
+            url=f"{self.base_url}/a/show/{advert.get('id')}",
+            title=title,
+            rooms=self._extract_rooms(title),
+            area=self._extract_area(advert.get("square")),
+            floor=advert.get("floor"),
+            floors_total=advert.get("floorCount"),
+            price=advert.get("price") or 0,
+            city=(advert.get("city") or {}).get("title") or "",
+            address=address,
+            latitude=float(lat) if lat else None,
+            longitude=float(lon) if lon else None,
+            description=(advert.get("text") or "") if detail else "",
+            photo_urls=photo_urls,
+        )
+
+    def _parse_html_fallback(self, soup: BeautifulSoup) -> list[KrishaProperty]:
+        items: list[KrishaProperty] = []
         for card in soup.select("div[data-id]"):
             krisha_id = card.get("data-id")
             if not krisha_id:
@@ -147,111 +282,197 @@ class KrishaParser:
 
             price_el = card.select_one(".a-card__price")
             price_text = price_el.get_text(strip=True) if price_el else "0"
-            price = self._parse_price(price_text)
-
-            items.append({
-                "krisha_id": int(krisha_id),
-                "url": f"{BASE_URL}{href}" if href else f"{BASE_URL}/a/show/{krisha_id}",
-                "title": title,
-                "rooms": self._extract_rooms(title),
-                "area": 0.0,
-                "floor": None,
-                "floors_total": None,
-                "price": price,
-                "city": "",
-                "address": "",
-                "latitude": None,
-                "longitude": None,
-                "description": "",
-                "photo_urls": [],
-            })
+
+            items.append(KrishaProperty(
+                krisha_id=int(krisha_id),
+                url=f"{self.base_url}{href}" if href else f"{self.base_url}/a/show/{krisha_id}",
+                title=title,
+                rooms=self._extract_rooms(title),
+                price=self._parse_price(price_text),
+            ))
 
         return items
 
+    def _get(
+        self, url: str, headers: dict[str, str] | None = None, stream: bool = False
+    ) -> requests.Response:
+        """GET with up to ``retries`` retries of transient failures, waiting
+        ``backoff``, then twice as long each time."""
+        attempt = 0
+        while True:
+            try:
+                with self.connection_limiter.slot(url):
+                    self.rate_limiter.wait(url)
+                    response = self.session.get(
+                        url, timeout=self.timeout, headers=headers, stream=stream
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                reason = str(e)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            delay = self.backoff * 2**attempt
+            attempt += 1
+            _logger.warning(
+                "Retrying %s in %.1f s (%d/%d): %s", url, delay, attempt, self.retries, reason
+            )
+            time.sleep(delay)
+
     def fetch_page(self, url: str) -> str:
-        response = self.session.get(url, timeout=self.timeout)
+        response = self._get(url)
         response.raise_for_status()
         return response.text
 
-    def fetch_property_details(self, url: str) -> dict[str, Any]:
+    def fetch_cached(
+        self,
+        url: str,
+        parse: Callable[[CachedResponse], Any] | None = None,
+        parse_version: int = 0,
+    ) -> CachedResponse:
+        """GET ``url`` through the response cache.
+
+        ``parse`` is applied to new content only, its result is kept in the
+        cache next to the content and reused as long as the server answers
+        ``304 Not Modified``. Content parsed with another ``parse_version``
+        is parsed again, without a request.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        if cached and cached.is_fresh(self.cache.ttl):
+            if not parse or cached.parsed_version == parse_version:
+                return cached
+        else:
+            response = self._get(url, headers=cached.conditional_headers() if cached else None)
+            if cached and response.status_code == 304:
+                cached.stored_at = time.time()
+            else:
+                response.raise_for_status()
+                cached = CachedResponse(
+                    content=response.content,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    encoding=response.encoding,
+                )
+        if parse and cached.parsed_version != parse_version:
+            cached.parsed = parse(cached)
+            cached.parsed_version = parse_version
+        if self.cache:
+            self.cache.set(url, cached)
+        return cached
+
+    def fetch_property_details(self, url: str) -> KrishaProperty | None:
         _logger.info("Fetching details from: %s", url)
         try:
-            html = self.fetch_page(url)
-            soup = BeautifulSoup(html, "html.parser")
-
-            script_tag = soup.find("script", {"id": "jsdata"})
-            _logger.info("Script tag found: %s, has string: %s", script_tag is not None, script_tag.string is not None if script_tag else False)
-
-            if script_tag and script_tag.string:
-                # Try both old and new formats
-                match = re.search(r"window\.(?:__DATA__|data)\s*=\s*(\{.+\})", script_tag.string)
-                if match:
-                    data = json.loads(match.group(1))
-                    advert = data.get("advert", {})
-                    result = self._parse_detail_advert(advert)
-                    _logger.info("Parsed details: %d photos found", len(result.get("photo_urls", [])))
-                    return result
-                else:
-                    _logger.warning("Regex did not match __DATA__")
-            else:
-                _logger.warning("No jsdata script found or empty string")
-        except Exception as e:
-            _logger.exception("Error fetching details: %s", e)
+            parsed = self.fetch_cached(
+                url, self._parse_detail_page, DETAILS_VERSION
+            ).parsed
+        except (requests.RequestException, ValueError):
+            _logger.exception("Error fetching details from %s", url)
+            return None
+        return KrishaProperty(**parsed) if parsed else None
 
-        return {}
+    def _parse_detail_page(self, response: CachedResponse) -> dict[str, Any] | None:
+        # kept as a plain dict: this is what the response cache stores
+        data = extract_jsdata(response.text)
+        if not data or not data.get("advert"):
+            _logger.warning("No advert jsdata found on the detail page")
+            return None
+        result = self._parse_advert(data["advert"], detail=True)
+        _logger.info("Parsed details: %d photos found", len(result.photo_urls))
+        return asdict(result)
+
+    def parse(self, params: ParseParams, max_pages: int = 1) -> list[KrishaProperty]:
+        all_items: list[KrishaProperty] = []
+        for _page, items in self.iter_pages(params, 1, max_pages):
+            all_items.extend(items)
+        return all_items
 
-    def _parse_detail_advert(self, advert: dict[str, Any]) -> dict[str, Any]:
-        photos = advert.get("photos", [])
-        photo_urls = [
-            photo.get("src", "").replace("-thumb", "-full")
-            for photo in photos
-            if photo.get("src")
-        ]
+    def iter_pages(
+        self, params: ParseParams, first_page: int, last_page: int
+    ) -> Iterator[tuple[int, list[KrishaProperty]]]:
+        """Yield ``(page, items)`` in page order, stopping before the first
+        empty page.
 
-        map_data = advert.get("map", {})
-        lat = map_data.get("lat")
-        lon = map_data.get("lon")
+        :raise KrishaCrawlError: once the pages before a failed one are yielded
+        """
+        if self.max_workers > 1 and last_page > first_page:
+            yield from self._iter_pages_concurrent(params, first_page, last_page)
+            return
 
-        return {
-            "krisha_id": advert.get("id"),
-            "url": f"{BASE_URL}/a/show/{advert.get('id')}",
-            "title": advert.get("title", ""),
-            "rooms": self._extract_rooms(advert.get("title", "")),
-            "area": self._extract_area(advert.get("square")),
-            "floor": advert.get("floor"),
-            "floors_total": advert.get("floorCount"),
-            "price": advert.get("price"),
-            "city": advert.get("city", {}).get("title", ""),
-            "address": advert.get("addressTitle", "") or advert.get("address", ""),
-            "latitude": float(lat) if lat else None,
-            "longitude": float(lon) if lon else None,
-            "description": advert.get("text", ""),
-            "photo_urls": photo_urls,
-        }
-
-    def parse(self, params: ParseParams, max_pages: int = 1) -> list[dict[str, Any]]:
-        all_items: list[dict[str, Any]] = []
-
-        for page in range(1, max_pages + 1):
+        for page in range(first_page, last_page + 1):
             url = self.build_search_url(params, page)
             _logger.info("Parsing page %d: %s", page, url)
 
             try:
                 html = self.fetch_page(url)
                 items = self.parse_listing_page(html)
-
-                if not items:
-                    _logger.info("No items found on page %d, stopping", page)
-                    break
-
-                all_items.extend(items)
-                _logger.info("Found %d items on page %d", len(items), page)
-
             except requests.RequestException as e:
-                _logger.exception("Failed to fetch page %d: %s", page, e)
-                break
-
-        return all_items
+                _logger.warning("Failed to fetch page %d: %s", page, e)
+                raise KrishaCrawlError(page, e) from e
+
+            if not items:
+                _logger.info("No items found on page %d, stopping", page)
+                return
+
+            _logger.info("Found %d items on page %d", len(items), page)
+            yield page, items
+
+    def _iter_pages_concurrent(
+        self, params: ParseParams, first_page: int, last_page: int
+    ) -> Iterator[tuple[int, list[KrishaProperty]]]:
+        # Pages are fetched by a bounded pool, but are yielded in page
+        # order: the first empty (or failed) page is a cutoff shared by all
+        # workers, pages at or after it are not started and their results
+        # are dropped if they were already in flight. A failed cutoff is
+        # raised once the pages before it are yielded.
+        cutoff = PageCutoff(last_page + 1)
+        pages: dict[int, list[KrishaProperty]] = {}
+        errors: dict[int, Exception] = {}
+        next_page = first_page
+
+        def fetch(page: int) -> tuple[int, list[KrishaProperty]]:
+            if page >= cutoff.value:
+                return page, []
+            url = self.build_search_url(params, page)
+            _logger.info("Parsing page %d: %s", page, url)
+            try:
+                items = self.parse_listing_page(self.fetch_page(url))
+            except requests.RequestException as e:
+                _logger.warning("Failed to fetch page %d: %s", page, e)
+                errors[page] = e
+                cutoff.lower(page)
+                return page, []
+            if not items:
+                _logger.info("No items found on page %d, stopping", page)
+                cutoff.lower(page)
+            else:
+                _logger.info("Found %d items on page %d", len(items), page)
+            return page, items
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="krisha_parser"
+        ) as executor:
+            in_flight = set()
+            for page in range(first_page, last_page + 1):
+                if page >= cutoff.value:
+                    break
+                in_flight.add(executor.submit(fetch, page))
+                if len(in_flight) >= self.max_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    pages.update(future.result() for future in done)
+                    while next_page in pages and next_page < cutoff.value:
+                        yield next_page, pages.pop(next_page)
+                        next_page += 1
+            pages.update(future.result() for future in wait(in_flight).done)
+
+        while next_page < cutoff.value:
+            yield next_page, pages.pop(next_page)
+            next_page += 1
+        if cutoff.value in errors:
+            error = errors[cutoff.value]
+            raise KrishaCrawlError(cutoff.value, error) from error
 
     def _extract_rooms(self, title: str) -> int:
         match = re.search(r"(\d+)-комн", title)
@@ -274,9 +495,35 @@ class KrishaParser:
 
     def download_image(self, url: str) -> bytes | None:
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            return response.content
+            return self.fetch_cached(url).content
+        except requests.RequestException as e:
+            _logger.warning("Failed to download image %s: %s", url, e)
+            return None
+
+    def download_image_to(self, url: str, directory: str) -> PhotoFile | None:
+        """Stream the photo at ``url`` into a new file of ``directory``,
+        computing its checksum on the way: the photo is never held in memory
+        as a whole."""
+        try:
+            response = self._get(url, stream=True)
+            with response:
+                response.raise_for_status()
+                checksum = hashlib.sha1()
+                size = 0
+                fd, path = tempfile.mkstemp(dir=directory, suffix=".photo")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            checksum.update(chunk)
+                            f.write(chunk)
+                            size += len(chunk)
+                except BaseException:
+                    os.unlink(path)
+                    raise
         except requests.RequestException as e:
             _logger.warning("Failed to download image %s: %s", url, e)
             return None
+        if not size:
+            os.unlink(path)
+            return None
+        return PhotoFile(path=path, checksum=checksum.hexdigest(), size=size)
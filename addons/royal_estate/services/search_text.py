@@ -0,0 +1,31 @@
+import re
+
+# Kazakh letters folded to the Russian ones typed on a Russian keyboard,
+# and ё to е: "Қонаев", "Конаев" and "конаев" all give "конаев"
+_FOLD = str.maketrans({
+    "ё": "е",
+    "ә": "а",
+    "ғ": "г",
+    "қ": "к",
+    "ң": "н",
+    "ө": "о",
+    "ұ": "у",
+    "ү": "у",
+    "һ": "х",
+    "і": "и",
+})
+
+_SEPARATORS = re.compile(r"[^\w]+|_")
+
+
+def normalize_search_text(text: str | None) -> str:
+    """Lowercase, Kazakh-folded words of ``text`` separated by single
+    spaces, as stored in the search document of the properties."""
+    if not text:
+        return ""
+    return " ".join(_SEPARATORS.split(text.lower().translate(_FOLD))).strip()
+
+
+def search_terms(query: str | None) -> list[str]:
+    """Distinct normalized words of a search query."""
+    return list(dict.fromkeys(normalize_search_text(query).split()))
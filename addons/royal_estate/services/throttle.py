@@ -0,0 +1,71 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host, shared by all worker threads.
+
+    ``rate`` is the maximum number of requests per second per host,
+    ``0`` disables the limit.
+    """
+
+    def __init__(self, rate: float = 0.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot: dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PageCutoff:
+    """First page number that must not be fetched, shared by all workers."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def lower(self, page: int) -> None:
+        with self._lock:
+            self._value = min(self._value, page)
+
+
+class HostConnectionLimiter:
+    """Caps the number of simultaneous connections to the same host.
+
+    ``max_per_host`` of ``0`` disables the limit.
+    """
+
+    def __init__(self, max_per_host: int = 0):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    @contextmanager
+    def slot(self, url: str):
+        if not self.max_per_host:
+            yield
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = semaphore
+        with semaphore:
+            yield
@@ -0,0 +1,130 @@
+import logging
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .throttle import HostRateLimiter
+
+_logger = logging.getLogger(__name__)
+
+GEOCODER_URL = "https://geocode-maps.yandex.ru/1.x/"
+
+
+def _feature_members(data: dict[str, Any]) -> list[dict[str, Any]]:
+    return data.get("response", {}).get("GeoObjectCollection", {}).get("featureMember", [])
+
+
+def _is_district_name(name: str) -> bool:
+    name = name.lower()
+    return "район" in name and "жилой" not in name
+
+
+class YandexGeocoder:
+    """Forward geocoding and district lookup with the Yandex Geocoder API.
+
+    ``rate_limit`` is the maximum number of requests per second, shared by
+    the ``max_workers`` threads of the ``*_many`` methods.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int = 10,
+        base_url: str = GEOCODER_URL,
+        session: requests.Session | None = None,
+        max_workers: int = 1,
+        rate_limit: float = 0.0,
+    ):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.base_url = base_url
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        if session is None:
+            session = requests.Session()
+            if self.max_workers > 1:
+                adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+        self.session = session
+
+    def _request(self, **params) -> dict[str, Any]:
+        self.rate_limiter.wait(self.base_url)
+        response = self.session.get(
+            self.base_url,
+            params={"apikey": self.api_key, "format": "json", **params},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def geocode(self, address: str) -> tuple[float, float] | None:
+        """``(longitude, latitude)`` of the address, ``None`` if not found."""
+        feature_members = _feature_members(self._request(geocode=address))
+        if not feature_members:
+            return None
+        pos = feature_members[0].get("GeoObject", {}).get("Point", {}).get("pos", "")
+        if not pos:
+            return None
+        lon, lat = pos.split()
+        return float(lon), float(lat)
+
+    def district_at(self, longitude: float, latitude: float) -> str | None:
+        """Name of the city district at the point, ``None`` if not found."""
+        feature_members = _feature_members(
+            self._request(geocode=f"{longitude},{latitude}", kind="district")
+        )
+        for feature in feature_members:
+            name = feature.get("GeoObject", {}).get("name", "")
+            if _is_district_name(name):
+                return name
+
+        for feature in feature_members:
+            components = (
+                feature.get("GeoObject", {})
+                .get("metaDataProperty", {})
+                .get("GeocoderMetaData", {})
+                .get("Address", {})
+                .get("Components", [])
+            )
+            for comp in components:
+                if comp.get("kind") == "district" and _is_district_name(comp.get("name", "")):
+                    return comp["name"]
+        return None
+
+    def geocode_many(self, addresses: Iterable[str]) -> dict[str, tuple[float, float] | None]:
+        """:meth:`geocode` of each address, requested concurrently.
+
+        Addresses whose request failed are left out of the result.
+        """
+        return self._map(self.geocode, addresses)
+
+    def district_at_many(
+        self, points: Iterable[tuple[float, float]]
+    ) -> dict[tuple[float, float], str | None]:
+        """:meth:`district_at` of each ``(longitude, latitude)`` point,
+        requested concurrently.
+
+        Points whose request failed are left out of the result.
+        """
+        return self._map(lambda point: self.district_at(*point), points)
+
+    def _map(self, func: Callable[[Hashable], Any], keys: Iterable[Hashable]) -> dict:
+        def call(key):
+            try:
+                return key, func(key), None
+            except requests.RequestException as e:
+                _logger.warning("Geocoder request for %s failed: %s", key, e)
+                return key, None, e
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="yandex_geocoder"
+        ) as executor:
+            return {
+                key: result
+                for key, result, error in executor.map(call, dict.fromkeys(keys))
+                if error is None
+            }
@@ -1,6 +1,6 @@
 /** @odoo-module **/
 
-import { Component, useState, useRef, onMounted, onWillUnmount } from "@odoo/owl";
+import { Component, useState, useRef, onMounted, onWillUnmount, onWillUpdateProps } from "@odoo/owl";
 
 const MAPGL_API_URL = "https://mapgl.2gis.com/api/js/v1";
 const GEOCODER_API_URL = "https://catalog.api.2gis.com/3.0/items/geocode";
@@ -13,6 +13,7 @@ export class LocationMap extends Component {
         latitude: { type: Number, optional: true },
         longitude: { type: Number, optional: true },
         geoAddress: { type: String, optional: true },
+        nearby: { type: Array, optional: true },
         apiKey: { type: String },
         readonly: { type: Boolean, optional: true },
         onLocationChange: { type: Function, optional: true },
@@ -22,6 +23,7 @@ export class LocationMap extends Component {
         this.mapContainer = useRef("mapContainer");
         this.map = null;
         this.marker = null;
+        this.nearbyMarkers = [];
 
         this.state = useState({
             isLoading: true,
@@ -31,6 +33,11 @@ export class LocationMap extends Component {
 
         onMounted(() => this.initMap());
         onWillUnmount(() => this.destroyMap());
+        onWillUpdateProps((nextProps) => {
+            if (nextProps.nearby !== this.props.nearby) {
+                this.addNearbyMarkers(nextProps.nearby);
+            }
+        });
     }
 
     async initMap() {
@@ -83,6 +90,7 @@ export class LocationMap extends Component {
         if (this.hasCoordinates()) {
             this.addMarker(center);
         }
+        this.addNearbyMarkers(this.props.nearby);
 
         if (!this.props.readonly) {
             this.map.on("click", (ev) => this.onMapClick(ev));
@@ -90,6 +98,7 @@ export class LocationMap extends Component {
     }
 
     destroyMap() {
+        this.clearNearbyMarkers();
         if (this.marker) {
             this.marker.destroy();
             this.marker = null;
@@ -121,6 +130,32 @@ export class LocationMap extends Component {
         });
     }
 
+    clearNearbyMarkers() {
+        for (const marker of this.nearbyMarkers) {
+            marker.destroy();
+        }
+        this.nearbyMarkers = [];
+    }
+
+    addNearbyMarkers(nearby) {
+        if (!this.map) return;
+
+        this.clearNearbyMarkers();
+        for (const prop of nearby || []) {
+            this.nearbyMarkers.push(
+                new window.mapgl.Marker(this.map, {
+                    coordinates: [prop.longitude, prop.latitude],
+                    size: [20, 20],
+                    label: {
+                        text: `${(prop.price || 0).toLocaleString("ru-RU")} ₸ · ${prop.distance} м`,
+                        fontSize: 11,
+                        offset: [0, -14],
+                    },
+                })
+            );
+        }
+    }
+
     onMapClick(ev) {
         if (this.props.readonly) return;
 
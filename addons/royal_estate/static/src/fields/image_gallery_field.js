@@ -57,15 +57,11 @@ export class ImageGalleryField extends Component {
             const images = await this.orm.searchRead(
                 "estate.property.image",
                 [["property_id", "=", propertyId]],
-                ["id", "name", "sequence", "is_main"],
-                { order: "sequence, id" }
+                ["id", "name", "sequence", "is_main", "image_thumb", "write_date"],
+                { order: "sequence, id", context: { bin_size: true } }
             );
 
-            this.state.images = images.map((img) => ({
-                ...img,
-                thumbnailUrl: `/web/image/estate.property.image/${img.id}/image?width=150&height=150`,
-                fullUrl: `/web/image/estate.property.image/${img.id}/image`,
-            }));
+            this.state.images = images.map((img) => this.getImageUrls(img));
         } catch {
             this.state.images = [];
         }
@@ -73,6 +69,29 @@ export class ImageGalleryField extends Component {
         this.state.isLoading = false;
     }
 
+    // The renditions are served as stored, WebP first; the original is only
+    // resized on the fly until they are generated. The write date makes the
+    // URLs cacheable for good.
+    getImageUrls(img) {
+        const url = (field, params = "") =>
+            `/web/image/estate.property.image/${img.id}/${field}?unique=${encodeURIComponent(img.write_date)}${params}`;
+        if (!img.image_thumb) {
+            return {
+                ...img,
+                thumbnailUrl: url("image", "&width=150&height=150"),
+                fullUrl: url("image"),
+            };
+        }
+        return {
+            ...img,
+            thumbnailUrl: url("image_thumb"),
+            thumbnailWebpUrl: url("image_thumb_webp"),
+            fullUrl: url("image_large"),
+            fullWebpSrcset: `${url("image_medium_webp")} 1024w, ${url("image_large_webp")} 1920w`,
+            fullSrcset: `${url("image_medium")} 1024w, ${url("image_large")} 1920w`,
+        };
+    }
+
     onImageClick(image, index) {
         this.dialogService.add(ImageLightbox, {
             images: this.state.images,
@@ -21,15 +21,24 @@ export class LocationMapField extends Component {
             latitude: 0,
             longitude: 0,
             geoAddress: "",
+            nearby: [],
         });
 
         onWillStart(async () => {
             await this.loadApiKey();
             this.updateStateFromRecord(this.props);
+            await this.loadNearby(this.props.record.resId);
         });
 
-        onWillUpdateProps((nextProps) => {
+        onWillUpdateProps(async (nextProps) => {
+            const moved =
+                nextProps.record.resId !== this.props.record.resId ||
+                nextProps.record.data.latitude !== this.state.latitude ||
+                nextProps.record.data.longitude !== this.state.longitude;
             this.updateStateFromRecord(nextProps);
+            if (moved && !nextProps.record.dirty) {
+                await this.loadNearby(nextProps.record.resId);
+            }
         });
     }
 
@@ -46,6 +55,23 @@ export class LocationMapField extends Component {
         }
     }
 
+    async loadNearby(resId) {
+        if (!resId || !this.state.apiKey) {
+            this.state.nearby = [];
+            return;
+        }
+        try {
+            this.state.nearby = await this.orm.call(
+                "estate.property",
+                "get_nearby_comparables",
+                [[resId]]
+            );
+        } catch {
+            console.error("Failed to load nearby properties");
+            this.state.nearby = [];
+        }
+    }
+
     updateStateFromRecord(props) {
         const record = props.record;
 
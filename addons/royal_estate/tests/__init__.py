@@ -0,0 +1,13 @@
+from . import test_comps
+from . import test_duplicates
+from . import test_geo
+from . import test_geocode_cache
+from . import test_http_cache
+from . import test_image_hash
+from . import test_image_normalize
+from . import test_image_renditions
+from . import test_krisha_crawl_checkpoint
+from . import test_krisha_importer
+from . import test_krisha_parser
+from . import test_market_stat
+from . import test_search_text
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+class StubKrishaServer:
+    """Local HTTP server replaying recorded Krisha.kz pages.
+
+    ``listing_pages`` maps a search page number to a fixture file name,
+    unknown pages are served with an empty listing and ``None`` answers 404. ``routes`` maps an
+    exact request path to ``(content_type, body)``. Responses carry an
+    ``ETag`` and conditional requests are answered ``304 Not Modified``.
+    ``failures`` maps a request path (query included) to the number of
+    ``503`` answers given before the real one.
+    """
+
+    def __init__(self, listing_pages: dict[int, str] | None = None, routes=None):
+        self.listing_pages = listing_pages or {}
+        self.routes = routes or {}
+        self.requests: list[str] = []
+        self.not_modified: list[str] = []
+        self.failures: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append(self.path)
+                    failures = stub.failures.get(self.path, 0)
+                    if failures:
+                        stub.failures[self.path] = failures - 1
+                if failures:
+                    self.send_error(503)
+                    return
+                content_type, body = stub._respond(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    with stub._lock:
+                        stub.not_modified.append(self.path)
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _respond(self, path: str) -> tuple[str, bytes | None]:
+        parts = urlsplit(path)
+        if parts.path in self.routes:
+            return self.routes[parts.path]
+        if parts.path.startswith("/prodazha/kvartiry/"):
+            page = int(parse_qs(parts.query).get("page", ["1"])[0])
+            fixture = self.listing_pages.get(page, "listing_empty.html")
+            if fixture is None:
+                return "text/plain", None
+            return "text/html; charset=utf-8", read_fixture(fixture)
+        return "text/plain", None
@@ -0,0 +1,106 @@
+from dataclasses import astuple
+
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..models.estate_property import _comps_indexes
+from ..services.comps import CompsFeatures, CompsIndex
+
+SALE = ("apartment", "sale")
+
+
+def flat(**values):
+    return CompsFeatures(**{
+        "latitude": 43.2380,
+        "longitude": 76.9450,
+        "rooms": 2,
+        "area": 54.0,
+        "floor": 5,
+        "floors_total": 9,
+        "year_built": 1985,
+        "building_type": "panel",
+        "condition": "cosmetic",
+        **values,
+    })
+
+
+class TestCompsIndex(BaseCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        listings = [
+            (1, SALE, flat()),
+            (2, SALE, flat(area=56.0, floor=6)),
+            (3, SALE, flat(rooms=3, area=75.0)),
+            # 5 km north
+            (4, SALE, flat(latitude=43.2830)),
+            (5, SALE, flat(building_type="monolith", year_built=2020, condition="euro")),
+            (6, ("apartment", "rent_long"), flat()),
+            # nothing known but the rooms
+            (7, SALE, CompsFeatures(rooms=2)),
+        ]
+        cls.index = CompsIndex(
+            (listing_id, segment, *astuple(features))
+            for listing_id, segment, features in listings
+        )
+
+    def test_ranking(self):
+        comps = self.index.query(SALE, flat(), limit=10)
+        self.assertEqual([listing_id for listing_id, _d in comps], [1, 2, 5, 3, 4, 7])
+        self.assertEqual(comps[0][1], 0.0)
+        self.assertEqual(len(self.index), 7)
+
+    def test_limit_and_exclude(self):
+        comps = self.index.query(SALE, flat(), limit=2, exclude=[1])
+        self.assertEqual([listing_id for listing_id, _d in comps], [2, 5])
+
+    def test_segments(self):
+        self.assertEqual(self.index.query(("apartment", "rent_long"), flat())[0][0], 6)
+        self.assertEqual(self.index.query(("house", "sale"), flat()), [])
+
+    def test_unknown_query_features(self):
+        # only the rooms are compared: every 2-room listing is as close
+        comps = self.index.query(SALE, CompsFeatures(rooms=2), limit=10)
+        self.assertEqual({d for _id, d in comps[:5]}, {0.0})
+        self.assertEqual(comps[-1][0], 3)
+
+
+class TestPropertyComps(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        vals = {
+            "latitude": 43.2380,
+            "longitude": 76.9450,
+            "rooms": 2,
+            "area_total": 54.0,
+            "floor": 5,
+            "floors_total": 9,
+            "price": 30_000_000,
+            "state": "active",
+        }
+        Property = cls.env["estate.property"]
+        cls.subject = Property.create({**vals, "name": "Новый объект", "state": "new"})
+        cls.twin = Property.create({**vals, "name": "Такая же квартира"})
+        cls.bigger = Property.create({**vals, "name": "Трёхкомнатная", "rooms": 3, "area_total": 80})
+        cls.canceled = Property.create({**vals, "name": "Снятая", "state": "canceled"})
+
+    def setUp(self):
+        super().setUp()
+        # built by another test, or before the test records existed
+        _comps_indexes.pop(self.env.cr.dbname, None)
+
+    def test_get_comps(self):
+        comps = self.subject.get_comps(limit=1000)
+        ids = [comp["id"] for comp in comps]
+        self.assertEqual(ids[0], self.twin.id)
+        self.assertEqual(comps[0]["distance"], 0)
+        self.assertIn(self.bigger.id, ids)
+        self.assertNotIn(self.subject.id, ids)
+        self.assertNotIn(self.canceled.id, ids)
+
+    def test_cached_until_features_change(self):
+        comps = self.subject._get_comps()
+        self.assertIs(self.subject._get_comps(), comps)
+        self.subject.area_total = 80
+        self.subject.rooms = 3
+        self.assertEqual(self.subject._get_comps()[0][0], self.bigger.id)
@@ -0,0 +1,133 @@
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.duplicates import ListingFeatures, find_duplicates, score_pair
+
+
+def listing(id, **values):
+    return ListingFeatures(**{
+        "id": id,
+        "property_type": "apartment",
+        "deal_type": "sale",
+        "district_id": 1,
+        "rooms": 2,
+        "area": 54.0,
+        "price": 42_000_000.0,
+        "floor": 5,
+        "floors_total": 9,
+        "latitude": 43.2380,
+        "longitude": 76.9450,
+        **values,
+    })
+
+
+class TestScorePair(BaseCase):
+    def test_same_flat(self):
+        score, scores = score_pair(
+            listing(1), listing(2, area=55.0, price=41_500_000.0, latitude=43.2385)
+        )
+        self.assertGreater(score, 0.8)
+        self.assertEqual(set(scores), {"area", "price", "floor", "location"})
+
+    def test_other_floor_and_building(self):
+        score, _scores = score_pair(listing(1), listing(2, floor=8, latitude=43.2480))
+        self.assertLess(score, 0.8)
+
+    def test_same_photos(self):
+        # a lower price and no coordinates, but the photos are the same
+        score, scores = score_pair(
+            listing(1, photo_hashes=frozenset({"a", "b", "c"})),
+            listing(2, price=30_000_000.0, latitude=0.0, longitude=0.0,
+                    photo_hashes=frozenset({"a", "b"})),
+        )
+        self.assertEqual(scores["photos"], 1.0)
+        self.assertEqual(score, 1.0)
+
+    def test_too_few_criteria(self):
+        score, _scores = score_pair(
+            listing(1, price=0.0, floor=0, latitude=0.0, longitude=0.0),
+            listing(2, price=0.0, floor=0, latitude=0.0, longitude=0.0),
+        )
+        self.assertEqual(score, 0.0)
+
+
+class TestFindDuplicates(BaseCase):
+    def test_blocking(self):
+        listings = [
+            listing(3),
+            # the next area bucket is compared too
+            listing(1, area=55.5),
+            listing(2, district_id=2),
+            listing(4, rooms=3),
+            listing(5, deal_type="rent_long"),
+        ]
+        pairs = list(find_duplicates(listings, 0.8))
+        self.assertEqual([(first, second) for first, second, _s, _d in pairs], [(1, 3)])
+
+    def test_only_ids(self):
+        listings = [listing(1), listing(2), listing(3)]
+        pairs = find_duplicates(listings, 0.8, only_ids={3})
+        self.assertEqual(
+            sorted((first, second) for first, second, _s, _d in pairs), [(1, 3), (2, 3)]
+        )
+
+
+class TestDuplicateDetection(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        city = cls.env["estate.city"].search([("code", "=", "almaty")], limit=1)
+        district = cls.env["estate.district"].create({"name": "Медеуский район", "city_id": city.id})
+        vals = {
+            "city_id": city.id,
+            "district_id": district.id,
+            "rooms": 2,
+            "area_total": 54.0,
+            "price": 42_000_000,
+            "floor": 5,
+            "floors_total": 9,
+            "latitude": 43.2380,
+            "longitude": 76.9450,
+        }
+        Property = cls.env["estate.property"]
+        cls.original = Property.create({**vals, "name": "2-комн. квартира, Достык"})
+        cls.copy = Property.create({**vals, "name": "Квартира на Достык", "price": 41_000_000})
+        cls.other = Property.create({**vals, "name": "2-комн. квартира, 12 этаж", "floor": 12})
+        cls.Duplicate = cls.env["estate.property.duplicate"]
+
+    def test_detect(self):
+        self.assertEqual(self.Duplicate._detect(), 1)
+        pair = self.Duplicate.search([])
+        self.assertEqual(pair.property_id | pair.duplicate_id, self.original | self.copy)
+        self.assertEqual(self.original.duplicate_count, 1)
+        self.assertEqual(self.other.duplicate_count, 0)
+
+    def test_detect_by_batches(self):
+        other_district = self.env["estate.district"].create({
+            "name": "Бостандыкский район", "city_id": self.original.city_id.id,
+        })
+        self.other.district_id = other_district
+        self.assertEqual(self.Duplicate._detect(batch_size=1), 1)
+
+    def test_detect_without_rooms(self):
+        properties = self.original | self.copy | self.other
+        properties.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE estate_property SET rooms = NULL WHERE id IN %s", [tuple(properties.ids)]
+        )
+        properties.invalidate_recordset(["rooms"])
+        self.assertEqual(self.Duplicate._detect(self.copy), 1)
+
+    def test_reviewed_pairs_are_kept(self):
+        self.Duplicate._detect(self.copy)
+        pair = self.Duplicate.search([])
+        pair.action_dismiss()
+        self.Duplicate._detect()
+        self.assertEqual(self.Duplicate.search([]), pair)
+        self.assertEqual(pair.state, "dismissed")
+        self.assertEqual(self.copy.duplicate_count, 0)
+
+    def test_pairs_no_longer_matching_are_removed(self):
+        self.Duplicate._detect()
+        self.copy.floor = 9
+        self.Duplicate._detect(self.copy)
+        self.assertFalse(self.Duplicate.search([]))
@@ -0,0 +1,97 @@
+import random
+
+from odoo.tests.common import BaseCase
+
+from ..services.geo import (
+    PolygonIndex,
+    bounding_box,
+    geohash_cover,
+    geohash_encode,
+    geojson_polygons,
+    haversine_m,
+    point_in_polygon,
+)
+
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)]
+
+
+class TestGeo(BaseCase):
+    def test_geohash_encode(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geohash_encode(-25.382708, -49.265506, 8), "6gkzwgjz")
+
+    def test_haversine(self):
+        # Almaty - Astana, about 970 km
+        distance = haversine_m(43.2385, 76.9453, 51.1605, 71.4704)
+        self.assertAlmostEqual(distance / 1000, 970, delta=15)
+        self.assertEqual(haversine_m(43.2, 76.9, 43.2, 76.9), 0)
+
+    def test_cover_contains_every_point_of_the_circle(self):
+        rng = random.Random(42)
+        for latitude, longitude, radius_m in (
+            (43.2385, 76.9453, 1500),
+            (51.1605, 71.4704, 300),
+            (42.3417, 69.5901, 10000),
+        ):
+            prefixes = geohash_cover(latitude, longitude, radius_m)
+            self.assertLessEqual(len(prefixes), 9)
+            min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_m)
+            for _i in range(500):
+                lat = rng.uniform(min_lat, max_lat)
+                lon = rng.uniform(min_lon, max_lon)
+                if haversine_m(latitude, longitude, lat, lon) > radius_m:
+                    continue
+                point_hash = geohash_encode(lat, lon)
+                self.assertTrue(any(point_hash.startswith(prefix) for prefix in prefixes))
+
+    def test_point_in_polygon(self):
+        polygon = [square(0, 0, 10), square(4, 4, 2)]
+        self.assertTrue(point_in_polygon(1, 1, polygon))
+        self.assertFalse(point_in_polygon(5, 5, polygon))  # in the hole
+        self.assertFalse(point_in_polygon(11, 5, polygon))
+        triangle = [[(0, 0), (10, 0), (0, 10)]]
+        self.assertTrue(point_in_polygon(4, 4, triangle))
+        self.assertFalse(point_in_polygon(6, 6, triangle))
+
+    def test_geojson_polygons(self):
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "MultiPolygon", "coordinates": [[square(0, 0, 1)], [square(5, 5, 1)]]},
+        }
+        self.assertEqual(len(geojson_polygons(feature)), 2)
+        with self.assertRaises(ValueError):
+            geojson_polygons({"type": "Point", "coordinates": [0, 0]})
+        with self.assertRaises(ValueError):
+            geojson_polygons({"type": "Polygon", "coordinates": [[[0, 0], [1, 1]]]})
+
+    def test_polygon_index_matches_brute_force(self):
+        # a 10x10 grid of districts of 0.02 degrees around Almaty
+        polygons = {
+            (i, j): [[square(76.8 + i * 0.02, 43.1 + j * 0.02, 0.02)]]
+            for i in range(10)
+            for j in range(10)
+        }
+        index = PolygonIndex(polygons)
+        rng = random.Random(42)
+        for _i in range(1000):
+            lon, lat = rng.uniform(76.79, 77.01), rng.uniform(43.09, 43.31)
+            expected = next(
+                (key for key, [polygon] in polygons.items() if point_in_polygon(lon, lat, polygon)),
+                None,
+            )
+            self.assertEqual(index.locate(lon, lat), expected)
+        self.assertIsNone(PolygonIndex({}).locate(76.9, 43.2))
+
+    def test_polygon_index_overlapping(self):
+        # the boundaries of districts of two cities drawn overlapping
+        index = PolygonIndex({
+            (1, "city"): [[square(0, 0, 2)]],
+            (2, "other city"): [[square(1, 1, 2)]],
+        })
+        self.assertEqual(list(index.locate_all(0.5, 0.5)), [(1, "city")])
+        self.assertEqual(
+            sorted(index.locate_all(1.5, 1.5)), [(1, "city"), (2, "other city")]
+        )
+        self.assertEqual(list(index.locate_all(5, 5)), [])
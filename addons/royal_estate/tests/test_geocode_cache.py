@@ -0,0 +1,249 @@
+import json
+from datetime import timedelta
+from unittest.mock import patch
+
+import requests
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.yandex_geocoder import YandexGeocoder
+
+
+class StubGeocoder:
+    """Stands for YandexGeocoder, counts the calls that would reach the API."""
+
+    def __init__(self, points=None, districts=None):
+        self.points = points or {}
+        self.districts = districts or {}
+        self.calls = []
+
+    def geocode(self, address):
+        self.calls.append(("geocode", address))
+        return self.points.get(address)
+
+    def district_at(self, longitude, latitude):
+        self.calls.append(("district_at", longitude, latitude))
+        return self.districts.get((round(longitude, 2), round(latitude, 2)))
+
+    def geocode_many(self, addresses):
+        return {address: self.geocode(address) for address in addresses}
+
+    def district_at_many(self, points):
+        return {point: self.district_at(*point) for point in points}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, data, failing=()):
+        self.data = data
+        self.failing = failing
+        self.params = []
+
+    def get(self, url, params=None, timeout=None):
+        self.params.append(params)
+        if params["geocode"] in self.failing:
+            raise requests.ConnectionError("connection reset")
+        return FakeResponse(self.data)
+
+
+def feature_collection(*geo_objects):
+    return {
+        "response": {
+            "GeoObjectCollection": {
+                "featureMember": [{"GeoObject": geo_object} for geo_object in geo_objects]
+            }
+        }
+    }
+
+
+class TestYandexGeocoder(BaseCase):
+    def test_geocode(self):
+        session = FakeSession(feature_collection({"Point": {"pos": "76.9453 43.2385"}}))
+        geocoder = YandexGeocoder("key", session=session)
+        self.assertEqual(geocoder.geocode("Алматы, Абая 1"), (76.9453, 43.2385))
+        self.assertEqual(session.params[0]["geocode"], "Алматы, Абая 1")
+
+        geocoder = YandexGeocoder("key", session=FakeSession(feature_collection()))
+        self.assertIsNone(geocoder.geocode("nowhere"))
+
+    def test_district_from_name_or_components(self):
+        session = FakeSession(feature_collection(
+            {"name": "жилой район Самал"},
+            {"name": "Медеуский район"},
+        ))
+        geocoder = YandexGeocoder("key", session=session)
+        self.assertEqual(geocoder.district_at(76.95, 43.24), "Медеуский район")
+        self.assertEqual(session.params[0]["kind"], "district")
+
+        components = [
+            {"kind": "locality", "name": "Алматы"},
+            {"kind": "district", "name": "Бостандыкский район"},
+        ]
+        session = FakeSession(feature_collection({
+            "name": "Алматы",
+            "metaDataProperty": {"GeocoderMetaData": {"Address": {"Components": components}}},
+        }))
+        geocoder = YandexGeocoder("key", session=session)
+        self.assertEqual(geocoder.district_at(76.95, 43.24), "Бостандыкский район")
+
+
+    def test_geocode_many(self):
+        session = FakeSession(
+            feature_collection({"Point": {"pos": "76.9453 43.2385"}}), failing={"Б"}
+        )
+        geocoder = YandexGeocoder("key", session=session, max_workers=3)
+        points = geocoder.geocode_many(["А", "Б", "В", "А"])
+        self.assertEqual(points, {"А": (76.9453, 43.2385), "В": (76.9453, 43.2385)})
+        # duplicates are requested once
+        self.assertEqual(len(session.params), 3)
+
+
+class TestGeocodeCache(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.geocoder = StubGeocoder(
+            points={"г. Алматы, Абая, 1": (76.9453, 43.2385)},
+            districts={(76.95, 43.24): "Медеуский район"},
+        )
+        patcher = patch.object(
+            self.registry["estate.geocode.cache"], "_get_geocoder", return_value=self.geocoder
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.Cache = self.env["estate.geocode.cache"]
+
+    def test_repeated_lookups_stay_in_the_database(self):
+        point = self.Cache._geocode("г. Алматы, Абая, 1")
+        self.assertEqual(point, (76.9453, 43.2385))
+        # same address, written differently
+        self.assertEqual(self.Cache._geocode("  г. алматы ,абая,  1 "), point)
+        self.assertEqual(self.Cache._district_at(*point), "Медеуский район")
+        # a few meters away: same rounded coordinates
+        self.assertEqual(self.Cache._district_at(76.94531, 43.23851), "Медеуский район")
+        self.assertEqual(len(self.geocoder.calls), 2)
+
+        entry = self.Cache.search([("kind", "=", "address")])
+        self.assertEqual((entry.hit_count, entry.miss_count), (1, 1))
+
+    def test_not_found_is_cached(self):
+        self.assertIsNone(self.Cache._geocode("Алматы, Несуществующая, 0"))
+        self.assertIsNone(self.Cache._geocode("Алматы, Несуществующая, 0"))
+        self.assertEqual(len(self.geocoder.calls), 1)
+
+    def test_entry_inserted_meanwhile(self):
+        vals = {
+            "kind": "address",
+            "key": self.Cache._normalize_address("г. Алматы, Абая, 1"),
+            "found": True,
+            "longitude": 76.9453,
+            "latitude": 43.2385,
+            "date_fetched": fields.Datetime.now(),
+            "miss_count": 1,
+        }
+        self.Cache._insert_entries([vals])
+        self.Cache._insert_entries([{**vals, "longitude": 0.0}])
+        entry = self.Cache.search([("kind", "=", "address")])
+        self.assertEqual(len(entry), 1)
+        self.assertEqual(entry.longitude, 76.9453)
+
+    def test_expired_entries_are_fetched_again(self):
+        self.Cache._geocode("г. Алматы, Абая, 1")
+        entry = self.Cache.search([("kind", "=", "address")])
+        entry.date_fetched = fields.Datetime.now() - timedelta(days=365)
+        self.Cache._geocode("г. Алматы, Абая, 1")
+        self.assertEqual(len(self.geocoder.calls), 2)
+        self.assertEqual((entry.hit_count, entry.miss_count), (0, 2))
+
+    def test_detect_district(self):
+        city = self.env["estate.city"].search([("code", "=", "almaty")], limit=1)
+        street = self.env["estate.street"].create({"name": "Абая", "city_id": city.id})
+        prop = self.env["estate.property"].create({
+            "name": "Тест",
+            "city_id": city.id,
+            "street_id": street.id,
+            "house_number": "1",
+        })
+        prop.action_detect_district()
+        prop.district_id = False
+        prop.action_detect_district()
+        self.assertEqual(prop.district_id.name, "Медеуский район")
+        self.assertEqual((prop.longitude, prop.latitude), (76.9453, 43.2385))
+        self.assertEqual(len(self.geocoder.calls), 2)
+
+    def test_detect_districts_in_batch(self):
+        city = self.env["estate.city"].search([("code", "=", "almaty")], limit=1)
+        self.geocoder.points["г. Алматы, Сатпаева, 10"] = (76.9101, 43.2352)
+        self.geocoder.districts[76.91, 43.24] = "Бостандыкский район"
+        existing = self.env["estate.district"].create({
+            "name": "Бостандыкский район (Алматы)", "city_id": city.id,
+        })
+        streets = self.env["estate.street"].create([
+            {"name": "Абая", "city_id": city.id},
+            {"name": "Сатпаева", "city_id": city.id},
+            {"name": "Неизвестная", "city_id": city.id},
+        ])
+        props = self.env["estate.property"].create([
+            {"name": f"Тест {i}", "city_id": city.id, "street_id": street.id, "house_number": house}
+            for i, (street, house) in enumerate([
+                (streets[0], "1"),
+                (streets[0], "1"),
+                (streets[1], "10"),
+                (streets[2], "5"),
+            ])
+        ])
+
+        detected = props._detect_districts(batch_size=3)
+        self.assertEqual(detected, props[:3])
+        self.assertEqual(props[0].district_id.name, "Медеуский район")
+        self.assertEqual(props[1].district_id, props[0].district_id)
+        self.assertEqual(props[2].district_id, existing)
+        self.assertFalse(props[3].district_id)
+        self.assertTrue(all(props.mapped("district_detect_date")))
+        # the address shared by the first two properties is requested once
+        geocode_calls = [call for call in self.geocoder.calls if call[0] == "geocode"]
+        self.assertEqual(len(geocode_calls), 3)
+
+        props[3].house_number = "7"
+        self.assertFalse(props[3].district_detect_date)
+
+    def test_district_from_boundary(self):
+        city = self.env["estate.city"].search([("code", "=", "almaty")], limit=1)
+        medeu = self.env["estate.district"].create({
+            "name": "Медеуский район",
+            "city_id": city.id,
+            "boundary_geojson": json.dumps({
+                "type": "Polygon",
+                "coordinates": [[[76.93, 43.22], [76.97, 43.22], [76.97, 43.26], [76.93, 43.22]]],
+            }),
+        })
+        props = self.env["estate.property"].create([
+            {"name": "Внутри", "city_id": city.id, "longitude": 76.96, "latitude": 43.23},
+            {"name": "Снаружи", "city_id": city.id, "longitude": 76.90, "latitude": 43.23},
+        ])
+        self.assertEqual(props[0].district_id, medeu)
+        self.assertFalse(props[1].district_id)
+
+        medeu.boundary_geojson = json.dumps({
+            "type": "Polygon",
+            "coordinates": [[
+                [76.89, 43.22], [76.97, 43.22], [76.97, 43.26], [76.89, 43.26], [76.89, 43.22],
+            ]],
+        })
+        props[1].action_detect_district()
+        self.assertEqual(props[1].district_id, medeu)
+        self.assertFalse(self.geocoder.calls)
+
+        with self.assertRaises(ValidationError):
+            medeu.boundary_geojson = '{"type": "Point", "coordinates": [76.9, 43.2]}'
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests.common import BaseCase
+
+from ..services import krisha_parser
+from ..services.http_cache import CachedResponse, FileResponseCache
+from ..services.krisha_parser import KrishaParser
+from .common import StubKrishaServer, read_fixture
+
+
+class TestResponseCache(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp(prefix="krisha_cache_")
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        routes = {
+            "/a/show/1000681101": (
+                "text/html; charset=utf-8",
+                read_fixture("advert_detail.html"),
+            ),
+            "/photos/1.jpg": ("image/jpeg", b"photo-1"),
+        }
+        self.server = StubKrishaServer(routes=routes).start()
+        self.addCleanup(self.server.stop)
+
+    def _parser(self, ttl: float) -> KrishaParser:
+        cache = FileResponseCache(self.cache_dir, ttl=ttl)
+        return KrishaParser(timeout=5, base_url=self.server.base_url, cache=cache)
+
+    def test_fresh_entries_are_served_without_request(self):
+        url = f"{self.server.base_url}/a/show/1000681101"
+        details = self._parser(ttl=3600).fetch_property_details(url)
+        self.assertEqual(details.price, 38500000)
+        self.assertEqual(details.description, "Светлая квартира с ремонтом, рядом парк и школа.")
+        self.assertEqual(len(details.photo_urls), 2)
+
+        # a new parser (another job, another worker) reuses the parsed data
+        self.assertEqual(self._parser(ttl=3600).fetch_property_details(url), details)
+        self.assertEqual(self.server.requests, ["/a/show/1000681101"])
+
+    def test_details_of_an_older_version_are_parsed_again(self):
+        url = f"{self.server.base_url}/a/show/1000681101"
+        details = self._parser(ttl=3600).fetch_property_details(url)
+
+        parser = self._parser(ttl=3600)
+        parse_detail_page = KrishaParser._parse_detail_page
+        with (
+            patch.object(krisha_parser, "DETAILS_VERSION", krisha_parser.DETAILS_VERSION + 1),
+            patch.object(
+                KrishaParser, "_parse_detail_page", autospec=True, side_effect=parse_detail_page
+            ) as parse,
+        ):
+            self.assertEqual(parser.fetch_property_details(url), details)
+            self.assertEqual(parser.fetch_property_details(url), details)
+        # parsed again once, from the cached page
+        parse.assert_called_once()
+        self.assertEqual(self.server.requests, ["/a/show/1000681101"])
+
+    def test_stale_entries_are_revalidated(self):
+        url = f"{self.server.base_url}/a/show/1000681101"
+        details = self._parser(ttl=0).fetch_property_details(url)
+
+        parser = self._parser(ttl=0)
+        with patch.object(KrishaParser, "_parse_detail_page") as parse:
+            self.assertEqual(parser.fetch_property_details(url), details)
+        # 304 Not Modified: the parsed details are reused as they are
+        parse.assert_not_called()
+        self.assertEqual(self.server.not_modified, ["/a/show/1000681101"])
+
+        photo_url = f"{self.server.base_url}/photos/1.jpg"
+        self.assertEqual(parser.download_image(photo_url), b"photo-1")
+        self.assertEqual(parser.download_image(photo_url), b"photo-1")
+        self.assertEqual(self.server.not_modified[-1], "/photos/1.jpg")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = FileResponseCache(self.cache_dir, max_size=250)
+        cache.set("https://a.example/1", CachedResponse(content=b"1" * 100))
+        cache.set("https://a.example/2", CachedResponse(content=b"2" * 100))
+        # make the entries' order unambiguous despite the mtime resolution
+        os.utime(cache._path("https://a.example/1", "body"), (1, 1))
+        os.utime(cache._path("https://a.example/2", "body"), (2, 2))
+        self.assertIsNotNone(cache.get("https://a.example/1"))
+
+        cache.set("https://a.example/3", CachedResponse(content=b"3" * 100))
+        self.assertIsNotNone(cache.get("https://a.example/1"))
+        self.assertIsNone(cache.get("https://a.example/2"))
+        self.assertIsNotNone(cache.get("https://a.example/3"))
@@ -0,0 +1,88 @@
+import base64
+import io
+import random
+
+from PIL import Image
+
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.image_hash import (
+    MAX_DISTANCE,
+    hamming,
+    hash_bands,
+    image_dhash,
+    perceptual_overlap,
+)
+
+
+def make_photo(seed: int, size=(360, 320), quality=90) -> bytes:
+    """JPEG of a 9×8 grid of gray cells, neighbours differing by at least 28
+    levels so that the hash bits are stable."""
+    rng = random.Random(seed)
+    grid = Image.new("L", (9, 8))
+    for y in range(8):
+        for x, level in enumerate(rng.sample(range(0, 256, 28), 9)):
+            grid.putpixel((x, y), level)
+    buffer = io.BytesIO()
+    grid.resize(size, Image.Resampling.NEAREST).convert("RGB").save(
+        buffer, "JPEG", quality=quality
+    )
+    return buffer.getvalue()
+
+
+class TestImageHash(BaseCase):
+    def test_resized_copy(self):
+        original = image_dhash(make_photo(1))
+        copy = image_dhash(make_photo(1, size=(180, 160), quality=60))
+        other = image_dhash(make_photo(2))
+        self.assertLessEqual(hamming(original, copy), MAX_DISTANCE)
+        self.assertGreater(hamming(original, other), 10)
+
+    def test_not_an_image(self):
+        self.assertIsNone(image_dhash(b"<html></html>"))
+
+    def test_bands(self):
+        value = 0x0123_4567_89AB_CDEF
+        self.assertEqual(hash_bands(value), [0xCDEF, 0x89AB, 0x4567, 0x0123])
+        # flipping up to MAX_DISTANCE bits leaves at least one band unchanged
+        flipped = value ^ 1 ^ 1 << 20 ^ 1 << 40
+        self.assertEqual(
+            sum(a == b for a, b in zip(hash_bands(value), hash_bands(flipped))), 1
+        )
+
+    def test_perceptual_overlap(self):
+        self.assertEqual(perceptual_overlap(frozenset({0b1011}), frozenset({0b0011, 0xFF00})), 1.0)
+        self.assertEqual(perceptual_overlap(frozenset({0, 0xFFFF}), frozenset({0b111})), 1.0)
+        self.assertEqual(perceptual_overlap(frozenset({0, 0xFFFF}), frozenset({0xF0F0, 0})), 0.5)
+        self.assertIsNone(perceptual_overlap(frozenset(), frozenset({0})))
+
+
+class TestPropertyImageHash(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.prop = cls.env["estate.property"].create({"name": "Квартира с фото"})
+        cls.Image = cls.env["estate.property.image"]
+
+    def test_hash_on_create_and_write(self):
+        image = self.Image.create({
+            "property_id": self.prop.id,
+            "image": base64.b64encode(make_photo(1)),
+        })
+        self.assertEqual(len(image.phash), 16)
+        self.assertEqual(
+            [image.phash_band_0, image.phash_band_1, image.phash_band_2, image.phash_band_3],
+            hash_bands(int(image.phash, 16)),
+        )
+        image.image = False
+        self.assertFalse(image.phash)
+        self.assertFalse(image.phash_band_0)
+
+    def test_search_similar(self):
+        image = self.Image.create({
+            "property_id": self.prop.id,
+            "image": base64.b64encode(make_photo(1)),
+        })
+        copy = image_dhash(make_photo(1, size=(180, 160), quality=60))
+        other = image_dhash(make_photo(2))
+        self.assertEqual(self.Image._search_similar([copy, other]), {copy: image})
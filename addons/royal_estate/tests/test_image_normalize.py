@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.image_normalize import normalize_image
+from ..services.krisha_parser import PhotoFile
+from .test_image_hash import make_photo
+
+
+def rotated_photo(size=(400, 200)) -> bytes:
+    """JPEG stored sideways, as phones do: to be turned by 90° on display."""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation
+    exif[0x010F] = "Phone"  # make
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+class TestImageNormalize(BaseCase):
+    def test_orientation_and_metadata(self):
+        with Image.open(io.BytesIO(normalize_image(rotated_photo()))) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (200, 400))
+            self.assertFalse(image.getexif())
+
+    def test_longest_edge(self):
+        content = make_photo(1, size=(3000, 2000))
+        normalized = normalize_image(content, max_edge=1500)
+        with Image.open(io.BytesIO(normalized)) as image:
+            self.assertEqual(image.size, (1500, 1000))
+        with Image.open(io.BytesIO(normalize_image(make_photo(1)))) as image:
+            self.assertEqual(image.size, (360, 320))
+
+    def test_quality(self):
+        content = make_photo(1, size=(1200, 900), quality=98)
+        self.assertLess(len(normalize_image(content, quality=60)), len(content) / 2)
+
+    def test_not_an_image(self):
+        self.assertIsNone(normalize_image(b"<html></html>"))
+
+
+class TestPropertyImageNormalize(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.prop = cls.env["estate.property"].create({"name": "Квартира с фото"})
+        cls.env["ir.config_parameter"].set_param("royal_estate.photo_max_edge", 1000)
+
+    def create_image(self, content):
+        return self.env["estate.property.image"].create({
+            "property_id": self.prop.id,
+            "image": base64.b64encode(content),
+        })
+
+    def test_normalized_on_upload(self):
+        self.env["ir.config_parameter"].set_param("royal_estate.photo_keep_original", "False")
+        image = self.create_image(rotated_photo((2400, 1200)))
+        with Image.open(io.BytesIO(base64.b64decode(image.image))) as stored:
+            self.assertEqual(stored.size, (500, 1000))
+        self.assertFalse(image.image_original)
+
+    def test_create_in_chunks(self):
+        # chunks of 2 photos
+        self.env["ir.config_parameter"].set_param("royal_estate.photo_workers", 1)
+        vals_list = [
+            {
+                "property_id": self.prop.id,
+                "name": str(i),
+                "image": base64.b64encode(make_photo(i)) if i % 3 else False,
+            }
+            for i in range(7)
+        ]
+        images = self.env["estate.property.image"].create(vals_list)
+        self.assertEqual(images.mapped("name"), [str(i) for i in range(7)])
+        self.assertEqual([bool(image.image_thumb) for image in images], [bool(i % 3) for i in range(7)])
+        # the photos are not added to the vals of the caller
+        self.assertNotIn("phash", vals_list[1])
+
+    def test_keep_original(self):
+        self.env["ir.config_parameter"].set_param("royal_estate.photo_keep_original", "True")
+        content = rotated_photo((2400, 1200))
+        image = self.create_image(content)
+        self.assertEqual(base64.b64decode(image.image_original), content)
+        image.image = False
+        self.assertFalse(image.image_original)
+
+    def test_not_an_image(self):
+        image = self.create_image(b"<html></html>")
+        self.assertEqual(base64.b64decode(image.image), b"<html></html>")
+        self.assertEqual(image.phash, "")
+
+    def test_set_image_from_files(self):
+        self.env["ir.config_parameter"].set_param("royal_estate.photo_keep_original", "True")
+        photos = []
+        for content in (rotated_photo((2400, 1200)), b"<html></html>"):
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            self.addCleanup(os.unlink, path)
+            photos.append(PhotoFile(path, hashlib.sha1(content).hexdigest(), len(content)))
+        images = self.env["estate.property.image"].create([
+            {"property_id": self.prop.id},
+            {"property_id": self.prop.id},
+        ])
+        images._set_image_from_files(photos)
+        photo, not_an_image = images
+        with Image.open(io.BytesIO(base64.b64decode(photo.image))) as stored:
+            self.assertEqual(stored.size, (500, 1000))
+        self.assertEqual(base64.b64decode(photo.image_original), rotated_photo((2400, 1200)))
+        self.assertTrue(photo.image_thumb_webp)
+        self.assertEqual(len(photo.phash), 16)
+        self.assertEqual(base64.b64decode(not_an_image.image), b"<html></html>")
+        self.assertFalse(not_an_image.image_original)
+        self.assertFalse(not_an_image.image_thumb)
+        self.assertEqual(not_an_image.phash, "")
@@ -0,0 +1,54 @@
+import base64
+import io
+
+from PIL import Image
+
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.image_renditions import RENDITIONS, RENDITIONS_VERSION, image_renditions
+from .test_image_hash import make_photo
+
+
+def size_of(content: bytes) -> tuple[str, tuple[int, int]]:
+    with Image.open(io.BytesIO(content)) as image:
+        return image.format, image.size
+
+
+class TestImageRenditions(BaseCase):
+    def test_sizes_and_formats(self):
+        renditions = image_renditions(make_photo(1, size=(2400, 1600)))
+        self.assertEqual(set(renditions), set(RENDITIONS))
+        self.assertEqual(size_of(renditions["large"][0]), ("JPEG", (1920, 1280)))
+        self.assertEqual(size_of(renditions["large"][1]), ("WEBP", (1920, 1280)))
+        self.assertEqual(size_of(renditions["medium"][0]), ("JPEG", (1024, 683)))
+        self.assertEqual(size_of(renditions["thumb"][1]), ("WEBP", (300, 300)))
+
+    def test_never_enlarged(self):
+        renditions = image_renditions(make_photo(1, size=(200, 100)))
+        self.assertEqual(size_of(renditions["large"][0])[1], (200, 100))
+        self.assertEqual(size_of(renditions["thumb"][0])[1], (200, 100))
+
+    def test_transparency(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (40, 40), (0, 0, 0, 0)).save(buffer, "PNG")
+        jpeg, _webp = image_renditions(buffer.getvalue())["thumb"]
+        with Image.open(io.BytesIO(jpeg)) as image:
+            self.assertGreater(min(image.getpixel((20, 20))), 250)
+
+    def test_not_an_image(self):
+        self.assertIsNone(image_renditions(b"<html></html>"))
+
+
+class TestPropertyImageRenditions(TransactionCase):
+    def test_generated_on_upload(self):
+        prop = self.env["estate.property"].create({"name": "Квартира с фото"})
+        image = self.env["estate.property.image"].create({
+            "property_id": prop.id,
+            "image": base64.b64encode(make_photo(1)),
+        })
+        self.assertEqual(image.renditions_version, RENDITIONS_VERSION)
+        self.assertEqual(size_of(base64.b64decode(image.image_thumb_webp)), ("WEBP", (300, 300)))
+        self.assertEqual(size_of(base64.b64decode(image.image_large)), ("JPEG", (360, 320)))
+        image.image = False
+        self.assertFalse(image.image_thumb)
+        self.assertFalse(image.renditions_version)
@@ -0,0 +1,30 @@
+from odoo.tests.common import TransactionCase
+
+from ..services.krisha_parser import KrishaProperty, ParseParams
+
+
+class TestKrishaCrawlCheckpoint(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Checkpoint = cls.env["krisha.crawl.checkpoint"]
+        cls.params = ParseParams(city="almaty", rooms="2")
+
+    def _item(self, krisha_id):
+        return KrishaProperty(
+            krisha_id=krisha_id, url=f"https://krisha.kz/a/show/{krisha_id}"
+        )
+
+    def test_save_same_search(self):
+        self.Checkpoint._save(self.params, 1, [self._item(1)])
+        self.Checkpoint._save(self.params, 2, [self._item(2)])
+        checkpoints = self.Checkpoint.search([("signature", "=", self.params.signature())])
+        self.assertEqual(len(checkpoints), 1)
+        self.assertEqual(
+            self.Checkpoint._load(self.params), (2, [self._item(1), self._item(2)])
+        )
+
+    def test_discard(self):
+        self.Checkpoint._save(self.params, 1, [self._item(1)])
+        self.Checkpoint._discard(self.params)
+        self.assertEqual(self.Checkpoint._load(self.params), (0, []))
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+import time
+
+from odoo.tests.common import BaseCase
+
+from ..services.krisha_importer import ImportTask, KrishaImportPipeline
+from ..services.krisha_parser import KrishaParser
+from ..services.throttle import HostConnectionLimiter
+from .common import StubKrishaServer, read_fixture
+
+
+def read_photos(listing):
+    result = []
+    for i, url, photo in listing.photos:
+        with open(photo.path, "rb") as f:
+            content = f.read()
+        result.append((i, url, content))
+    return result
+
+
+class TestKrishaImportPipeline(BaseCase):
+    def setUp(self):
+        super().setUp()
+        routes = {
+            f"/photos/{n}.jpg": ("image/jpeg", f"photo-{n}".encode()) for n in range(1, 6)
+        }
+        routes["/a/show/1"] = ("text/html; charset=utf-8", read_fixture("listing_empty.html"))
+        self.server = StubKrishaServer(routes=routes).start()
+        self.addCleanup(self.server.stop)
+
+    def test_pipeline_downloads_details_and_photos(self):
+        base = self.server.base_url
+        parser = KrishaParser(timeout=5, base_url=base, max_per_host=2)
+        pipeline = KrishaImportPipeline(parser, max_workers=4, max_photos=3)
+        self.addCleanup(pipeline.close)
+        tasks = [
+            ImportTask(
+                key=key,
+                url=f"{base}/a/show/{key}",
+                photo_urls=[f"{base}/photos/{n}.jpg" for n in (1, 99, 2, 3, 4)],
+            )
+            for key in (1, 2, 3)
+        ]
+        listings = {listing.key: listing for listing in pipeline.run(tasks)}
+
+        self.assertEqual(set(listings), {1, 2, 3})
+        for listing in listings.values():
+            # no advert on the detail page: the listing page photos are used
+            self.assertIsNone(listing.details)
+            # the missing photo 99 is skipped, photos keep their position
+            self.assertEqual(
+                read_photos(listing),
+                [(0, f"{base}/photos/1.jpg", b"photo-1"), (2, f"{base}/photos/2.jpg", b"photo-2")],
+            )
+        self.assertGreater(pipeline.wall_time, 0)
+
+    def test_photos_are_streamed_to_spool_files(self):
+        base = self.server.base_url
+        task = ImportTask(key=2, url=f"{base}/a/show/2", photo_urls=[f"{base}/photos/3.jpg"])
+        with KrishaImportPipeline(KrishaParser(timeout=5, base_url=base)) as pipeline:
+            (listing,) = pipeline.run([task])
+            ((_i, _url, photo),) = listing.photos
+            self.assertEqual(photo.checksum, hashlib.sha1(b"photo-3").hexdigest())
+            self.assertEqual(photo.size, len(b"photo-3"))
+            self.assertTrue(photo.path.startswith(pipeline.spool_dir))
+            listing.release()
+            self.assertFalse(os.path.exists(photo.path))
+            spool_dir = pipeline.spool_dir
+        self.assertFalse(os.path.exists(spool_dir))
+
+    def test_known_photos_are_not_downloaded(self):
+        base = self.server.base_url
+        pipeline = KrishaImportPipeline(KrishaParser(timeout=5, base_url=base), max_workers=2)
+        self.addCleanup(pipeline.close)
+        task = ImportTask(
+            key=2,
+            url=f"{base}/a/show/2",
+            photo_urls=[f"{base}/photos/{n}.jpg" for n in (1, 2, 3)],
+            known_photo_urls={f"{base}/photos/1.jpg", f"{base}/photos/3.jpg"},
+        )
+        (listing,) = pipeline.run([task])
+        self.assertEqual(read_photos(listing), [(1, f"{base}/photos/2.jpg", b"photo-2")])
+        self.assertNotIn("/photos/1.jpg", self.server.requests)
+
+    def test_connection_limit_per_host(self):
+        limiter = HostConnectionLimiter(max_per_host=2)
+        active = {"a": 0}
+        peak = {"a": 0}
+        lock = threading.Lock()
+
+        def worker():
+            with limiter.slot("http://a.example/x"):
+                with lock:
+                    active["a"] += 1
+                    peak["a"] = max(peak["a"], active["a"])
+                time.sleep(0.02)
+                with lock:
+                    active["a"] -= 1
+
+        threads = [threading.Thread(target=worker) for _i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak["a"], 2)
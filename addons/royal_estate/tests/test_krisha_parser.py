@@ -0,0 +1,123 @@
+import json
+import re
+import time
+
+from odoo.tests.common import BaseCase
+
+from ..services.krisha_parser import (
+    KrishaCrawlError,
+    KrishaParser,
+    ParseParams,
+    extract_jsdata,
+)
+from ..services.throttle import HostRateLimiter
+from .common import StubKrishaServer, read_fixture
+
+
+class TestKrishaParserExtraction(BaseCase):
+    def test_jsdata_matches_regex_extraction(self):
+        for name in ("listing_page_1.html", "listing_empty.html", "advert_detail.html"):
+            html = read_fixture(name).decode()
+            match = re.search(r"window\.(?:__DATA__|data)\s*=\s*(\{.+\})", html)
+            self.assertEqual(extract_jsdata(html), json.loads(match.group(1).rstrip(";")), name)
+
+    def test_jsdata_after_data_layer(self):
+        html = (
+            '<script id="jsdata">window.dataLayer = [{"event": "page"}];'
+            'window.data = {"advert": {"id": 1}};</script>'
+        )
+        self.assertEqual(extract_jsdata(html), {"advert": {"id": 1}})
+
+    def test_html_fallback_without_jsdata(self):
+        html = re.sub(
+            r'<script id="jsdata">.*?</script>', "", read_fixture("listing_page_1.html").decode()
+        )
+        self.assertIsNone(extract_jsdata(html))
+        items = KrishaParser().parse_listing_page(html)
+        self.assertEqual(len(items), 20)
+        self.assertEqual(items[0].krisha_id, 1000681100)
+        self.assertEqual(items[0].rooms, 1)
+
+    def test_listing_pages(self):
+        parser = KrishaParser()
+        items = parser.parse_listing_page(read_fixture("listing_page_1.html").decode())
+        self.assertEqual(len(items), 20)
+        self.assertTrue(all(item.photo_urls for item in items))
+        # slot-based records, no per-item __dict__
+        self.assertFalse(hasattr(items[0], "__dict__"))
+        self.assertEqual(parser.parse_listing_page(read_fixture("listing_empty.html").decode()), [])
+
+
+class TestKrishaParserConcurrent(BaseCase):
+    def setUp(self):
+        super().setUp()
+        self.server = StubKrishaServer(
+            listing_pages={
+                1: "listing_page_1.html",
+                2: "listing_page_2.html",
+                3: "listing_page_3.html",
+                # page 4 is empty, page 5 must never reach the result
+                5: "listing_page_1.html",
+            }
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.params = ParseParams(city="almaty")
+
+    def _parser(self, **kwargs):
+        return KrishaParser(timeout=5, base_url=self.server.base_url, **kwargs)
+
+    def test_concurrent_matches_sequential(self):
+        sequential = self._parser().parse(self.params, max_pages=3)
+        concurrent = self._parser(max_workers=3).parse(self.params, max_pages=3)
+        self.assertEqual(len(sequential), 60)
+        self.assertEqual(
+            [item.krisha_id for item in concurrent],
+            [item.krisha_id for item in sequential],
+        )
+
+    def test_stop_on_first_empty_page(self):
+        items = self._parser(max_workers=4).parse(self.params, max_pages=8)
+        self.assertEqual(len(items), 60)
+        ids = [item.krisha_id for item in items]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(items[0].url.startswith(self.server.base_url))
+
+    def test_failed_page_is_a_cutoff(self):
+        self.server.listing_pages[2] = None
+        for max_workers in (1, 4):
+            parser = self._parser(max_workers=max_workers, retries=0)
+            pages = []
+            with self.assertRaises(KrishaCrawlError) as catcher:
+                for page, items in parser.iter_pages(self.params, 1, 5):
+                    pages.append((page, len(items)))
+            # the pages before the failed one are yielded, a rerun resumes on it
+            self.assertEqual(pages, [(1, 20)])
+            self.assertEqual(catcher.exception.page, 2)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        parser = self._parser(retries=2, backoff=0.05)
+        url = parser.build_search_url(self.params, 2)
+        self.server.failures[url[len(self.server.base_url):]] = 2
+        start = time.monotonic()
+        items = parser.parse(self.params, max_pages=2)
+        # 50ms, then 100ms before the third attempt succeeds
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(len(items), 40)
+
+        self.server.failures[url[len(self.server.base_url):]] = 3
+        with self.assertRaises(KrishaCrawlError):
+            parser.parse(self.params, max_pages=2)
+
+    def test_params_signature(self):
+        self.assertEqual(self.params.signature(), ParseParams(city="almaty").signature())
+        self.assertNotEqual(self.params.signature(), ParseParams(city="astana").signature())
+
+    def test_rate_limit_per_host(self):
+        limiter = HostRateLimiter(rate=20)
+        start = time.monotonic()
+        for _i in range(5):
+            limiter.wait("http://a.example/x")
+        limiter.wait("http://b.example/x")
+        # 4 intervals of 50ms for host a, host b is not delayed
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertLess(time.monotonic() - start, 0.4)
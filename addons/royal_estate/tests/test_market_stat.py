@@ -0,0 +1,88 @@
+from odoo.tests.common import TransactionCase
+
+
+class TestMarketStat(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.city = cls.env["estate.city"].create({"name": "Тестоград", "code": "testograd"})
+        District = cls.env["estate.district"]
+        cls.center = District.create({"name": "Центральный район", "city_id": cls.city.id})
+        cls.suburb = District.create({"name": "Пригородный район", "city_id": cls.city.id})
+        Property = cls.env["estate.property"]
+        cls.center_flats = Property.create([
+            {
+                "name": f"2-комн. квартира #{i}",
+                "city_id": cls.city.id,
+                "district_id": cls.center.id,
+                "rooms": 2,
+                "area_total": 50.0,
+                "price": price,
+                "state": "active",
+            }
+            for i, price in enumerate([20_000_000, 25_000_000, 30_000_000, 35_000_000, 40_000_000])
+        ])
+        cls.suburb_flat = Property.create({
+            "name": "2-комн. квартира в пригороде",
+            "city_id": cls.city.id,
+            "district_id": cls.suburb.id,
+            "rooms": 2,
+            "area_total": 50.0,
+            "price": 10_000_000,
+            "state": "active",
+        })
+        cls.Stat = cls.env["estate.market.stat"]
+        cls.Stat._refresh(batch_size=100_000)
+
+    def _stat(self, district=None, rooms=2):
+        return self.Stat.search([
+            ("city_id", "=", self.city.id),
+            ("district_id", "=", district.id if district else False),
+            ("property_type", "=", "apartment"),
+            ("deal_type", "=", "sale"),
+            ("rooms", "=", rooms),
+        ])
+
+    def test_price_per_sqm(self):
+        self.assertEqual(self.suburb_flat.price_per_sqm, 200_000)
+        self.suburb_flat.area_total = 0
+        self.assertEqual(self.suburb_flat.price_per_sqm, 0)
+
+    def test_statistics(self):
+        stat = self._stat(self.center)
+        self.assertEqual(stat.listing_count, 5)
+        self.assertEqual(stat.price_median, 30_000_000)
+        self.assertEqual(stat.price_p10, 22_000_000)
+        self.assertEqual(stat.price_p90, 38_000_000)
+        self.assertEqual(stat.price_per_sqm_median, 600_000)
+        city = self._stat()
+        self.assertEqual(city.listing_count, 6)
+        self.assertEqual(city.price_median, 27_500_000)
+        self.assertFalse(self.suburb_flat.market_dirty)
+        self.assertEqual(self.suburb_flat.market_stat_id, self._stat(self.suburb))
+
+    def test_incremental_refresh(self):
+        # the suburb segment is emptied, a 3-room one appears
+        self.suburb_flat.rooms = 3
+        self.assertTrue(self.suburb_flat.market_dirty)
+        self.assertEqual(self.Stat._refresh(), 1)
+        self.assertFalse(self._stat(self.suburb))
+        self.assertEqual(self._stat(self.suburb, rooms=3).listing_count, 1)
+        self.assertEqual(self._stat().listing_count, 5)
+
+        self.center_flats[0].state = "canceled"
+        self.center_flats[1].unlink()
+        self.Stat._refresh()
+        self.assertEqual(self._stat(self.center).listing_count, 3)
+
+    def test_price_per_sqm_medians(self):
+        keys = [
+            (self.city.id, self.center.id, "apartment", "sale", 2),
+            # too few listings in the suburb: the city median
+            (self.city.id, self.suburb.id, "apartment", "sale", 2),
+            (self.city.id, self.center.id, "apartment", "sale", 4),
+        ]
+        self.assertEqual(
+            self.Stat._get_price_per_sqm_medians(keys),
+            {keys[0]: 600_000, keys[1]: 550_000},
+        )
@@ -0,0 +1,69 @@
+from odoo.tests.common import BaseCase, TransactionCase
+
+from ..services.search_text import normalize_search_text, search_terms
+
+
+class TestNormalizeSearchText(BaseCase):
+    def test_normalize(self):
+        self.assertEqual(
+            normalize_search_text("  Қонаева, 12/3 — ЖК «Әлем» "), "конаева 12 3 жк алем"
+        )
+        self.assertEqual(normalize_search_text("Ёлки-Палки"), "елки палки")
+        self.assertEqual(normalize_search_text(None), "")
+
+    def test_search_terms(self):
+        self.assertEqual(search_terms("Абая, абая 2-комн"), ["абая", "2", "комн"])
+        self.assertEqual(search_terms(" , "), [])
+
+
+class TestSearchAnywhere(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        city = cls.env["estate.city"].search([("code", "=", "almaty")], limit=1)
+        street = cls.env["estate.street"].create({"name": "Қонаева", "city_id": city.id})
+        Property = cls.env["estate.property"]
+        cls.by_street = Property.create({
+            "name": "2-комн. квартира",
+            "city_id": city.id,
+            "street_id": street.id,
+            "house_number": "12",
+        })
+        cls.by_description = Property.create({
+            "name": "Квартира у парка",
+            "city_id": city.id,
+            "description": "Тихий двор, рядом улица Конаева и школа",
+        })
+        cls.other = Property.create({"name": "Дом в Талгаре", "city_id": city.id})
+
+    def test_search_across_fields(self):
+        Property = self.env["estate.property"]
+        self.assertEqual(
+            Property.search([("search_anywhere", "ilike", "конаева")]),
+            self.by_street | self.by_description,
+        )
+        # every word must match, in any field
+        self.assertEqual(
+            Property.search([("search_anywhere", "ilike", "Қонаева 12")]), self.by_street
+        )
+        self.assertNotIn(
+            self.other, Property.search([("search_anywhere", "not ilike", "конаева")])
+        )
+
+    def test_document_follows_the_address(self):
+        self.by_street.house_number = "77"
+        self.assertIn("77", self.by_street.search_document)
+
+    def test_ranking(self):
+        if not self.env.registry.has_trigram:
+            self.skipTest("pg_trgm is not installed")
+        Property = self.env["estate.property"]
+        domain = [("search_anywhere", "ilike", "квартира")]
+        query = Property._search(domain, order=Property._order)
+        self.assertIn("word_similarity", query.order.code)
+        # a column chosen by the user wins
+        query = Property._search(domain, order="price desc")
+        self.assertNotIn("word_similarity", query.order.code)
+        self.assertEqual(
+            Property.search(domain), self.by_street | self.by_description
+        )
@@ -1,10 +1,17 @@
-import base64
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
-from odoo import _, api, fields, models
+from odoo import Command, _, api, fields, models
 from odoo.exceptions import UserError
 
-from ..services.krisha_parser import KrishaParser, ParseParams
+from ..services.image_hash import image_dhash
+from ..services.krisha_parser import (
+    KRISHA_CITIES,
+    KrishaCrawlError,
+    KrishaParser,
+    ParseParams,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -14,27 +21,7 @@ class KrishaParserWizard(models.TransientModel):
     _description = "Параметры парсинга Krisha.kz"
 
     city = fields.Selection(
-        [
-            ("almaty", "Алматы"),
-            ("astana", "Астана"),
-            ("shymkent", "Шымкент"),
-            ("aktau", "Актау"),
-            ("aktobe", "Актобе"),
-            ("atyrau", "Атырау"),
-            ("karaganda", "Караганда"),
-            ("kokshetau", "Кокшетау"),
-            ("kostanay", "Костанай"),
-            ("kyzylorda", "Кызылорда"),
-            ("mangystau", "Мангистауская область"),
-            ("pavlodar", "Павлодар"),
-            ("petropavlovsk", "Петропавловск"),
-            ("semey", "Семей"),
-            ("taldykorgan", "Талдыкорган"),
-            ("taraz", "Тараз"),
-            ("turkestan", "Туркестан"),
-            ("uralsk", "Уральск"),
-            ("ust-kamenogorsk", "Усть-Каменогорск"),
-        ],
+        KRISHA_CITIES,
         string="Город",
         default="almaty",
         required=True,
@@ -49,11 +36,9 @@ class KrishaParserWizard(models.TransientModel):
     owner = fields.Boolean(string="От владельца")
     max_pages = fields.Integer(string="Страниц", default=1, required=True)
 
-    def action_parse(self):
+    def _get_parse_params(self) -> ParseParams:
         self.ensure_one()
-
-        parser = KrishaParser()
-        params = ParseParams(
+        return ParseParams(
             city=self.city,
             rooms=self.rooms or "",
             price_from=self.price_from or 0,
@@ -62,44 +47,58 @@ class KrishaParserWizard(models.TransientModel):
             owner=self.owner,
         )
 
+    def action_parse(self):
+        self.ensure_one()
+
+        parser = self.env["krisha.listing.mixin"]._get_parser()
+        params = self._get_parse_params()
+
+        # a crawl that failed on page N resumes there, pages before it are
+        # neither fetched nor lost again
+        Checkpoint = self.env["krisha.crawl.checkpoint"]
+        last_page, results = Checkpoint._load(params)
+        seen_ids = {item.krisha_id for item in results}
         try:
-            results = parser.parse(params, max_pages=self.max_pages)
+            for page, items in parser.iter_pages(params, last_page + 1, self.max_pages):
+                # adverts move to the next page when new ones are published
+                new_items = [item for item in items if item.krisha_id not in seen_ids]
+                seen_ids.update(item.krisha_id for item in new_items)
+                results.extend(new_items)
+                Checkpoint._save(params, page, new_items)
+        except KrishaCrawlError as e:
+            _logger.warning("Krisha crawl interrupted: %s", e)
+            raise UserError(_(
+                "Не удалось загрузить страницу %(page)s: %(error)s\n"
+                "Загруженные страницы сохранены, повторный запуск продолжит с этой страницы.",
+                page=e.page,
+                error=e.error,
+            )) from e
         except Exception as e:
             _logger.exception("Krisha parser error")
             raise UserError(_("Ошибка парсинга: %s") % str(e)) from e
+        Checkpoint._discard(params)
 
         if not results:
             raise UserError(_("Ничего не найдено по заданным параметрам"))
 
-        existing_urls = set(
-            self.env["estate.property"]
-            .search([("krisha_url", "!=", False)])
-            .mapped("krisha_url")
+        existing_ids = self.env["estate.property"]._get_existing_krisha_ids(
+            item.krisha_id for item in results
+        )
+
+        photo_matches = self._match_photos(
+            parser, [item for item in results if item.krisha_id not in existing_ids]
         )
 
         preview = self.env["krisha.parser.preview"].create({})
 
+        Result = self.env["krisha.parser.result"]
         for item in results:
-            url = item.get("url", "")
-            is_duplicate = url in existing_urls
-
-            self.env["krisha.parser.result"].create({
+            is_duplicate = item.krisha_id in existing_ids
+            Result.create({
+                **Result._prepare_listing_vals(item),
                 "wizard_id": preview.id,
-                "krisha_id": item.get("krisha_id"),
-                "krisha_url": url,
-                "title": item.get("title", ""),
-                "rooms": item.get("rooms", 0),
-                "area": item.get("area", 0.0),
-                "floor": item.get("floor"),
-                "floors_total": item.get("floors_total"),
-                "price": item.get("price", 0),
-                "city": item.get("city", ""),
-                "address": item.get("address", ""),
-                "latitude": item.get("latitude"),
-                "longitude": item.get("longitude"),
-                "photo_url": item.get("photo_urls", [""])[0] if item.get("photo_urls") else "",
-                "photo_urls_json": ",".join(item.get("photo_urls", [])),
                 "is_duplicate": is_duplicate,
+                "photo_match_id": photo_matches.get(item.krisha_id, False),
                 "selected": not is_duplicate,
             })
 
@@ -112,33 +111,87 @@ class KrishaParserWizard(models.TransientModel):
             "context": {"form_view_initial_mode": "edit"},
         }
 
+    def _match_photos(self, parser: KrishaParser, items) -> dict[int, int]:
+        """Map the ``krisha_id`` of the ``items`` whose main photo, or a
+        resized copy of it, is already in the base to the property having
+        it. Only the thumbnails are downloaded, enough for a perceptual
+        hash, and only those of the first ``royal_estate.krisha_photo_match_limit``
+        items: the preview waits for them."""
+        limit = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("royal_estate.krisha_photo_match_limit", 50)
+        )
+        urls = {
+            item.krisha_id: item.photo_urls[0].replace("-full", "-thumb")
+            for item in items
+            if item.photo_urls
+        }
+        urls = dict(islice(urls.items(), max(limit, 0)))
+        if not urls:
+            return {}
+
+        def fetch_hash(url):
+            content = parser.download_image(url)
+            return image_dhash(content) if content else None
+
+        with ThreadPoolExecutor(
+            max_workers=parser.max_workers, thread_name_prefix="krisha_photos"
+        ) as executor:
+            hashes = dict(zip(urls, executor.map(fetch_hash, urls.values())))
+        similar = self.env["estate.property.image"]._search_similar(
+            value for value in hashes.values() if value is not None
+        )
+        return {
+            krisha_id: similar[value][:1].property_id.id
+            for krisha_id, value in hashes.items()
+            if value in similar
+        }
+
+    def action_parse_in_background(self):
+        self.ensure_one()
+        job = self.env["krisha.import.job"].create({
+            "city": self.city,
+            "rooms": self.rooms,
+            "price_from": self.price_from,
+            "price_to": self.price_to,
+            "has_photo": self.has_photo,
+            "owner": self.owner,
+            "max_pages": self.max_pages,
+        })
+        job.action_start()
+        return job._get_form_action()
+
 
 class KrishaParserResult(models.TransientModel):
     _name = "krisha.parser.result"
+    _inherit = ["krisha.listing.mixin"]
     _description = "Результат парсинга"
 
     wizard_id = fields.Many2one("krisha.parser.preview", ondelete="cascade")
-    krisha_id = fields.Integer(string="ID на Krisha")
-    krisha_url = fields.Char(string="URL")
-    title = fields.Char(string="Заголовок")
-    rooms = fields.Integer(string="Комнат")
-    area = fields.Float(string="Площадь")
-    floor = fields.Integer(string="Этаж")
-    floors_total = fields.Integer(string="Этажность")
-    price = fields.Integer(string="Цена")
-    city = fields.Char(string="Город")
-    address = fields.Char(string="Адрес")
-    latitude = fields.Float(string="Широта")
-    longitude = fields.Float(string="Долгота")
-    photo_url = fields.Char(string="Фото URL")
-    photo_urls_json = fields.Text(string="Все фото URLs")
     is_duplicate = fields.Boolean(string="Дубликат")
+    photo_match_id = fields.Many2one(
+        "estate.property",
+        string="Фото уже в базе",
+        help="Объект, у которого уже есть главное фото этого объявления",
+    )
     selected = fields.Boolean(string="Импортировать", default=True)
 
     display_name_custom = fields.Char(
         compute="_compute_display_name_custom",
         string="Описание",
     )
+    market_price_per_sqm = fields.Float(
+        string="Рынок, ₸/м²",
+        digits=(16, 0),
+        compute="_compute_market_hint",
+        help="Медиана цены за м² похожих объектов в районе, или во всём городе",
+    )
+    price_vs_market = fields.Float(
+        string="Цена к рынку",
+        compute="_compute_market_hint",
+        help="На сколько цена за м² выше (или ниже) медианы рынка",
+    )
 
     @api.depends("rooms", "area", "price", "is_duplicate")
     def _compute_display_name_custom(self):
@@ -149,6 +202,26 @@ class KrishaParserResult(models.TransientModel):
                 f"{record.rooms}-комн, {record.area} м², {price_formatted} ₸{duplicate_mark}"
             )
 
+    @api.depends("city", "rooms", "area", "price", "latitude", "longitude")
+    def _compute_market_hint(self):
+        city_mapping = self._get_city_mapping()
+        District = self.env["estate.district"]
+        keys = {}
+        for record in self:
+            city_id = city_mapping.get(record.city.lower()) if record.city else False
+            district = District
+            if city_id and record.latitude and record.longitude:
+                district = District._find_by_location(record.longitude, record.latitude, city_id)
+            # the parser only searches apartments for sale
+            keys[record] = (city_id, district.id, "apartment", "sale", record.rooms)
+        medians = self.env["estate.market.stat"]._get_price_per_sqm_medians(keys.values())
+        for record in self:
+            median = medians.get(keys[record], 0.0)
+            record.market_price_per_sqm = median
+            record.price_vs_market = 0.0
+            if median and record.price and record.area:
+                record.price_vs_market = record.price / record.area / median - 1
+
 
 class KrishaParserPreview(models.TransientModel):
     _name = "krisha.parser.preview"
@@ -167,16 +240,23 @@ class KrishaParserPreview(models.TransientModel):
         string="Дубликатов",
         compute="_compute_stats",
     )
+    photo_matches_count = fields.Integer(
+        string="Фото в базе",
+        compute="_compute_stats",
+    )
     selected_count = fields.Integer(
         string="Выбрано",
         compute="_compute_stats",
     )
 
-    @api.depends("result_ids", "result_ids.is_duplicate", "result_ids.selected")
+    @api.depends(
+        "result_ids", "result_ids.is_duplicate", "result_ids.photo_match_id", "result_ids.selected"
+    )
     def _compute_stats(self):
         for record in self:
             record.total_found = len(record.result_ids)
             record.duplicates_count = len(record.result_ids.filtered("is_duplicate"))
+            record.photo_matches_count = len(record.result_ids.filtered("photo_match_id"))
             record.selected_count = len(record.result_ids.filtered("selected"))
 
     def action_import_selected(self):
@@ -185,83 +265,63 @@ class KrishaParserPreview(models.TransientModel):
         selected = self.result_ids.filtered("selected")
         if not selected:
             raise UserError(_("Не выбрано ни одного объекта для импорта"))
+        existing_ids = self.env["estate.property"]._get_existing_krisha_ids(
+            selected.mapped("krisha_id")
+        )
+        selected = selected.filtered(lambda r: r.krisha_id not in existing_ids)
+        if not selected:
+            raise UserError(_("Все выбранные объекты уже импортированы"))
 
-        parser = KrishaParser()
-        city_mapping = self._get_city_mapping()
+        pipeline = selected._get_import_pipeline()
+        city_mapping = selected._get_city_mapping()
         created_properties = self.env["estate.property"]
 
-        for result in selected:
-            try:
-                details = parser.fetch_property_details(result.krisha_url)
-            except Exception as e:
-                _logger.warning("Failed to fetch details for %s: %s", result.krisha_url, e)
-                details = {}
-
-            city_id = city_mapping.get(result.city.lower()) if result.city else False
-
-            property_vals = {
-                "name": result.title or f"{result.rooms}-комн. квартира, {result.area} м²",
-                "property_type": "apartment",
-                "deal_type": "sale",
-                "state": "new",
-                "rooms": result.rooms,
-                "area_total": result.area,
-                "floor": result.floor,
-                "floors_total": result.floors_total,
-                "price": result.price,
-                "krisha_url": result.krisha_url,
-                "latitude": result.latitude,
-                "longitude": result.longitude,
-                "description": details.get("description", ""),
-            }
-
-            if city_id:
-                property_vals["city_id"] = city_id
-
-            prop = self.env["estate.property"].create(property_vals)
-            created_properties |= prop
-
-            photo_urls = result.photo_urls_json.split(",") if result.photo_urls_json else []
-            _logger.info("Initial photo_urls from result: %d", len(photo_urls))
-            if details.get("photo_urls"):
-                photo_urls = details["photo_urls"]
-                _logger.info("Photo_urls from details: %d", len(photo_urls))
-
-            _logger.info("Processing %d photos for property %s", len(photo_urls[:10]), prop.id)
-            for i, photo_url in enumerate(photo_urls[:10]):
-                if not photo_url:
-                    continue
-                try:
-                    image_data = parser.download_image(photo_url)
-                    if image_data:
-                        self.env["estate.property.image"].create({
-                            "property_id": prop.id,
-                            "name": f"Фото {i + 1}",
-                            "image": base64.b64encode(image_data).decode("utf-8"),
-                            "sequence": i * 10,
-                            "is_main": i == 0,
-                        })
-                        _logger.info("Saved image %d for property %s", i + 1, prop.id)
-                except Exception as e:
-                    _logger.warning("Failed to download image %s: %s", photo_url, e)
+        for results, listings in selected._iter_import_batches(pipeline):
+            created_properties |= results._create_properties(listings, city_mapping)
+
+        _logger.info(
+            "Imported %d Krisha listings in %.1f s",
+            len(created_properties),
+            pipeline.wall_time,
+        )
 
         return {
-            "type": "ir.actions.act_window",
-            "res_model": "estate.property",
-            "view_mode": "list,form",
-            "domain": [("id", "in", created_properties.ids)],
-            "target": "current",
-            "name": _("Импортированные объекты"),
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "success",
+                "message": _(
+                    "Импортировано объектов: %(count)s за %(seconds).1f с",
+                    count=len(created_properties),
+                    seconds=pipeline.wall_time,
+                ),
+                "next": {
+                    "type": "ir.actions.act_window",
+                    "res_model": "estate.property",
+                    "view_mode": "list,form",
+                    "views": [(False, "list"), (False, "form")],
+                    "domain": [("id", "in", created_properties.ids)],
+                    "target": "current",
+                    "name": _("Импортированные объекты"),
+                },
+            },
         }
 
-    def _get_city_mapping(self) -> dict[str, int]:
-        cities = self.env["estate.city"].search([])
-        mapping: dict[str, int] = {}
-        for city in cities:
-            mapping[city.name.lower()] = city.id
-            if city.code:
-                mapping[city.code.lower()] = city.id
-        return mapping
+    def action_import_in_background(self):
+        self.ensure_one()
+
+        selected = self.result_ids.filtered("selected")
+        if not selected:
+            raise UserError(_("Не выбрано ни одного объекта для импорта"))
+
+        job = self.env["krisha.import.job"].create({
+            "parse_done": True,
+            "line_ids": [
+                Command.create(result._get_listing_vals()) for result in selected
+            ],
+        })
+        job.action_start()
+        return job._get_form_action()
 
     def action_select_all(self):
         self.ensure_one()